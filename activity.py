@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QEvent, QAbstractAnimation, Signal
+
+
+class ActivityManager(QObject):
+    """Переводит окно в экономный режим, когда оно свернуто или скрыто
+
+    В фоне таймеры переходят на длинный интервал, анимации сразу доводятся
+    до конца, а при возвращении окна выполняется немедленная проверка
+    (catch_up) и восстанавливаются обычные интервалы.
+    """
+    mode_changed = Signal(bool)  # True — фоновый режим
+
+    def __init__(self, window, catch_up=None):
+        super().__init__(window)
+        self.window = window
+        self.catch_up = catch_up
+        self.is_background = False
+        self._timers = []
+        self._animations = []
+        self._wakeups = {False: deque(maxlen=600), True: deque(maxlen=600)}
+        window.installEventFilter(self)
+
+    def add_timer(self, timer, background_interval, interval=None):
+        """Таймер, который в фоне срабатывает реже (интервалы в мс)
+
+        interval — обычный интервал, если таймер сейчас настроен иначе
+        (например, остался в фоновом режиме после прошлого окна).
+        """
+        interval = interval or timer.interval()
+        self._timers.append((timer, interval, background_interval))
+        current = background_interval if self.is_background else interval
+        if timer.isActive():
+            timer.start(current)
+        else:
+            timer.setInterval(current)
+        timer.timeout.connect(self._on_wakeup)
+
+    def add_animation(self, animation):
+        """Анимация, которую в фоне не нужно проигрывать покадрово"""
+        self._animations.append(animation)
+
+    def eventFilter(self, obj, event):
+        if obj is self.window and event.type() in (QEvent.Type.Show, QEvent.Type.Hide,
+                                                   QEvent.Type.WindowStateChange):
+            self.refresh()
+        return False
+
+    def refresh(self):
+        background = not self.window.isVisible() or self.window.isMinimized()
+        if background != self.is_background:
+            if background:
+                self.enter_background()
+            else:
+                self.enter_foreground()
+
+    def enter_background(self):
+        self.is_background = True
+        for timer, _, background_interval in self._timers:
+            if timer.isActive():
+                timer.start(background_interval)
+            else:
+                timer.setInterval(background_interval)
+        for animation in self._animations:
+            if animation.state() == QAbstractAnimation.State.Running:
+                animation.setCurrentTime(animation.totalDuration())
+                animation.stop()
+        print(f"Фоновый режим (пробуждений в минуту до этого: {self.wakeups_per_minute(False):.0f})")
+        self.mode_changed.emit(True)
+
+    def enter_foreground(self):
+        self.is_background = False
+        for timer, interval, _ in self._timers:
+            if timer.isActive():
+                timer.start(interval)
+            else:
+                timer.setInterval(interval)
+        # Догоняем состояние сразу, не дожидаясь следующего тика таймера
+        if self.catch_up is not None:
+            self.catch_up()
+        print(f"Активный режим (пробуждений в минуту в фоне: {self.wakeups_per_minute(True):.0f})")
+        self.mode_changed.emit(False)
+
+    def _on_wakeup(self):
+        self._wakeups[self.is_background].append(time.monotonic())
+
+    def wakeups_per_minute(self, background=None):
+        """Сколько раз таймеры будили приложение за последнюю минуту в указанном режиме"""
+        background = self.is_background if background is None else background
+        now = time.monotonic()
+        return sum(1 for t in self._wakeups[background] if now - t <= 60)
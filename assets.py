@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""Изображения интерфейса одним файлом
+
+Картинки из img/ заранее приводятся к размерам, в которых их рисует
+интерфейс (варианты для светлой и темной темы — отдельными записями), и
+хранятся в img/assets.bundle готовыми пикселями RGBA. Файл читается целиком
+один раз при первом обращении, каждая картинка превращается в QPixmap при
+первом запросе и дальше берется из кэша. Путь строится от расположения
+модуля, поэтому текущий каталог не важен.
+
+    python assets.py build   # пересобрать img/assets.bundle после изменения img/
+    python assets.py check   # набор соответствует img/
+    python assets.py bench   # чтения с диска и декодирование: файлы против набора
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+import argparse
+import psutil
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage, QPixmap, QIcon, QPixmapCache
+
+from storage import atomic_write_bytes
+
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "img")
+BUNDLE_PATH = os.path.join(IMG_DIR, "assets.bundle")
+
+MAGIC = b"AETHIMG\0"
+FORMAT_VERSION = 1
+# Сигнатура, версия формата, длина оглавления (JSON); за ним пиксели картинок
+HEADER = struct.Struct("<8sHI")
+
+PIXEL_FORMAT = QImage.Format.Format_RGBA8888_Premultiplied
+
+# Имя -> (файл в img/, размер квадрата для вписывания или None, инвертировать цвета)
+ASSETS = {
+    "switch_running": ("logo_main_g.png", 40, False),
+    "switch_dark": ("logo_main_w.png", 40, False),
+    "switch_light": ("logo_main_n.png", 40, False),
+    "logo_dark": ("logo_w.png", 120, False),
+    "logo_light": ("logo_n.png", 120, False),
+    "sun": ("sun.png", 20, False),
+    "moon_dark": ("moon.png", 20, True),
+    "moon_light": ("moon.png", 20, False),
+    "telegram": ("telegram.png", 28, False),
+    "github": ("github.png", None, False),
+    "app": ("aether.ico", None, False),
+}
+
+
+def themed(name, is_dark):
+    """Имя варианта картинки для темы: logo -> logo_dark / logo_light"""
+    return f"{name}_{'dark' if is_dark else 'light'}"
+
+
+def sources_digest(img_dir=IMG_DIR):
+    """Хэш исходных картинок и описания набора (для проверки актуальности)"""
+    digest = hashlib.sha1(str(FORMAT_VERSION).encode("ascii"))
+    for name, spec in sorted(ASSETS.items()):
+        digest.update(json.dumps([name, *spec]).encode("utf-8"))
+        with open(os.path.join(img_dir, spec[0]), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def render_asset(path, size, invert):
+    """Картинка в формате набора: вписана в квадрат size, при необходимости инвертирована"""
+    image = QImage(path)
+    if image.isNull():
+        raise ValueError(f"не удалось прочитать {path}")
+    if size is not None:
+        image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+    if invert:
+        # Как прежняя отрисовка: инверсия масштабированной картинки в формате экрана
+        image = image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+        image.invertPixels()
+    return image.convertToFormat(PIXEL_FORMAT)
+
+
+def build_bundle(img_dir=IMG_DIR):
+    """Содержимое файла набора из картинок img_dir"""
+    index, blobs, offset = {}, [], 0
+    for name, (filename, size, invert) in ASSETS.items():
+        image = render_asset(os.path.join(img_dir, filename), size, invert)
+        # Строки RGBA без выравнивания: 4 байта на пиксель
+        blob = bytes(image.constBits())[:image.width() * image.height() * 4]
+        index[name] = [offset, len(blob), image.width(), image.height()]
+        blobs.append(blob)
+        offset += len(blob)
+    table = json.dumps({"sources": sources_digest(img_dir), "assets": index}).encode("utf-8")
+    return HEADER.pack(MAGIC, FORMAT_VERSION, len(table)) + table + b"".join(blobs)
+
+
+def parse_bundle(data):
+    """(оглавление, память с пикселями) из содержимого файла набора"""
+    if len(data) < HEADER.size:
+        raise ValueError("файл слишком короткий")
+    magic, version, table_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("не набор изображений Aether")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"версия формата {version}, поддерживается {FORMAT_VERSION}")
+    start = HEADER.size + table_size
+    index = json.loads(bytes(data[HEADER.size:start]).decode("utf-8"))
+    pixels = memoryview(data)[start:]
+    for name, (offset, size, width, height) in index["assets"].items():
+        if offset + size > len(pixels) or size != width * height * 4:
+            raise ValueError(f"повреждена картинка {name}")
+    return index, pixels
+
+
+class AssetBundle:
+    """Картинки набора: файл читается один раз, каждая картинка декодируется один раз"""
+
+    def __init__(self, path=BUNDLE_PATH):
+        self.path = path
+        self.index = None
+        self._pixels = None
+        self._pixmaps = {}
+        self._icons = {}
+        self.decoded = 0
+        self.decode_time = 0.0
+
+    def _load(self):
+        if self.index is not None:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            self.index, self._pixels = parse_bundle(data)
+        except (OSError, ValueError) as e:
+            # Набор не собран или поврежден: собираем его в памяти из img/
+            print(f"Набор изображений недоступен ({e}), картинки читаются из img/ "
+                  f"(пересобрать: python assets.py build)")
+            self.index, self._pixels = parse_bundle(build_bundle())
+
+    def names(self):
+        self._load()
+        return list(self.index["assets"])
+
+    def pixmap(self, name):
+        """QPixmap картинки name (KeyError, если такой нет в наборе)"""
+        pixmap = self._pixmaps.get(name)
+        if pixmap is not None:
+            return pixmap
+        self._load()
+        offset, size, width, height = self.index["assets"][name]
+        started = time.perf_counter()
+        image = QImage(bytes(self._pixels[offset:offset + size]), width, height, width * 4, PIXEL_FORMAT)
+        # fromImage копирует пиксели, так что буфер QImage дальше не нужен
+        pixmap = QPixmap.fromImage(image)
+        self.decode_time += time.perf_counter() - started
+        self.decoded += 1
+        self._pixmaps[name] = pixmap
+        return pixmap
+
+    def icon(self, name):
+        icon = self._icons.get(name)
+        if icon is None:
+            icon = self._icons[name] = QIcon(self.pixmap(name))
+        return icon
+
+
+_bundle = None
+
+
+def bundle():
+    """Общий набор изображений приложения"""
+    global _bundle
+    if _bundle is None:
+        _bundle = AssetBundle()
+    return _bundle
+
+
+def pixmap(name):
+    return bundle().pixmap(name)
+
+
+def icon(name):
+    return bundle().icon(name)
+
+
+def io_counters():
+    """(операций чтения, прочитано байт) текущего процесса"""
+    counters = psutil.Process().io_counters()
+    return counters.read_count, getattr(counters, "read_chars", counters.read_bytes)
+
+
+def measure(load, repeats):
+    """Операции чтения, байты и время загрузки картинок функцией load"""
+    # Само чтение счетчиков тоже операция чтения: вычитаем ее
+    first_reads, first_chars = io_counters()
+    reads, chars = io_counters()
+    own_reads, own_chars = reads - first_reads, chars - first_chars
+    started = time.perf_counter()
+    for _ in range(repeats):
+        load()
+    elapsed = time.perf_counter() - started
+    after_reads, after_chars = io_counters()
+    return {"reads": after_reads - reads - own_reads, "read_bytes": after_chars - chars - own_chars,
+            "ms": round(elapsed * 1000, 2)}
+
+
+def scaled_file(filename, size):
+    pixmap = QPixmap(os.path.join(IMG_DIR, filename))
+    return pixmap.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+
+def legacy_startup():
+    """Загрузки картинок прежним способом: файл и декодирование PNG на каждое использование"""
+    # Значок окна и трея, иконка переключателя, логотип и кнопки
+    QIcon(os.path.join(IMG_DIR, "aether.ico")).pixmap(32, 32)
+    scaled_file("logo_main_n.png", 40)
+    scaled_file("logo_n.png", 120)
+    scaled_file("telegram.png", 28)
+    scaled_file("github.png", 28)
+    QIcon(os.path.join(IMG_DIR, "github.png")).pixmap(64, 32)
+    theme_switch_paint_legacy()
+
+
+def theme_switch_paint_legacy():
+    # Солнце и луна читались заново при каждой перерисовке переключателя темы
+    scaled_file("sun.png", 20)
+    image = scaled_file("moon.png", 20).toImage()
+    image.invertPixels()
+    QPixmap.fromImage(image)
+
+
+def bundle_startup(assets):
+    assets.icon("app").pixmap(32, 32)
+    for name in ("switch_light", "logo_light", "telegram"):
+        assets.pixmap(name)
+    assets.icon("github").pixmap(64, 32)
+    theme_switch_paint_bundle(assets)
+
+
+def theme_switch_paint_bundle(assets):
+    for name in ("sun", "moon_dark"):
+        assets.pixmap(name)
+
+
+def bench(paints=100):
+    """Запуск окна и перерисовки переключателя темы: файлы img/ против набора"""
+    # Первый проход прогревает кэш ОС и загрузку модулей изображений Qt
+    legacy_startup()
+    bundle_startup(AssetBundle())
+    # QPixmap(путь) кэширует файлы в QPixmapCache: запуск считаем с пустым кэшем
+    QPixmapCache.clear()
+
+    result = {
+        "legacy_startup": measure(legacy_startup, 1),
+        "legacy_theme_paints": measure(theme_switch_paint_legacy, paints),
+    }
+    assets = AssetBundle()
+    result["bundle_startup"] = measure(lambda: bundle_startup(assets), 1)
+    result["bundle_theme_paints"] = measure(lambda: theme_switch_paint_bundle(assets), paints)
+    result["bundle_decoded"] = assets.decoded
+    result["bundle_decode_ms"] = round(assets.decode_time * 1000, 3)
+    result["bundle_bytes"] = os.path.getsize(BUNDLE_PATH) if os.path.exists(BUNDLE_PATH) else None
+    result["paints"] = paints
+    return result
+
+
+def check(path=BUNDLE_PATH):
+    """Набор читается и собран из текущих картинок img/"""
+    with open(path, "rb") as f:
+        index, _ = parse_bundle(f.read())
+    missing = sorted(set(ASSETS) - set(index["assets"]))
+    if missing:
+        raise ValueError(f"в наборе нет картинок: {', '.join(missing)}")
+    if index["sources"] != sources_digest():
+        raise ValueError("картинки в img/ изменились, нужно пересобрать набор")
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Набор изображений интерфейса")
+    parser.add_argument("command", choices=("build", "check", "bench"))
+    parser.add_argument("--paints", type=int, default=100, help="перерисовок переключателя темы для bench")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    from PySide6.QtGui import QGuiApplication
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv)
+
+    if args.command == "build":
+        data = build_bundle()
+        atomic_write_bytes(BUNDLE_PATH, data)
+        print(f"{BUNDLE_PATH}: картинок {len(ASSETS)}, {len(data)} байт")
+        return 0
+    if args.command == "check":
+        try:
+            index = check()
+        except (OSError, ValueError) as e:
+            print(f"Набор изображений не актуален: {e}")
+            return 1
+        print(f"Набор изображений актуален: картинок {len(index['assets'])}")
+        return 0
+
+    result = bench(args.paints)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+    for label, prefix in (("файлы img/", "legacy"), ("набор", "bundle")):
+        startup, paints = result[f"{prefix}_startup"], result[f"{prefix}_theme_paints"]
+        print(f"{label}: запуск — чтений {startup['reads']}, {startup['read_bytes']} байт, {startup['ms']} мс; "
+              f"{result['paints']} перерисовок темы — чтений {paints['reads']}, {paints['ms']} мс")
+    print(f"Декодировано картинок из набора: {result['bundle_decoded']} за {result['bundle_decode_ms']} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""Управляемый автоматический hostlist
+
+Домены, которые winws добавил в свой auto-hostlist (--hostlist-auto) или
+которые найдены в логах, накапливаются в компактном хранилище со
+счетчиком попаданий и временем последнего появления. Хранилище
+ограничено по размеру (вытесняются давно не встречавшиеся домены) и по
+возрасту записей. Периодически из него и статического списка
+general/lists/list-general.txt (он не изменяется) собирается list-general.txt
+в папке данных Aether; при запуске стратегии --hostlist на статический список
+заменяется собранным (replace_hostlist), а секции с ним получают
+--hostlist-auto на lists/list-auto.txt в папке данных (add_hostlist_auto),
+куда winws дописывает домены с неудачными соединениями.
+
+    python autohostlist.py ingest list-auto.txt
+    python autohostlist.py merge
+    python autohostlist.py stats
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+from collections import OrderedDict
+
+from storage import app_data_path, load_json, atomic_write_json, atomic_write_text
+from strategy import Section, Strategy, split_option
+
+DOMAIN_RE = re.compile(r"^(?=.{1,253}$)([a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{0,62}$")
+
+STORE_VERSION = 1
+
+STATIC_LIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "general", "lists", "list-general.txt")
+
+
+def merged_list_path():
+    """Собранный список в папке данных Aether (general/ не изменяется)"""
+    return os.path.join(app_data_path("lists"), "list-general.txt")
+
+
+def auto_list_path():
+    """Файл --hostlist-auto, в который winws дописывает найденные домены"""
+    # Папку winws сам не создает
+    os.makedirs(app_data_path("lists"), exist_ok=True)
+    return os.path.join(app_data_path("lists"), "list-auto.txt")
+
+
+def normalize_domain(value):
+    """Домен в нижнем регистре без точки на конце или None, если это не домен"""
+    domain = value.strip().lower().rstrip(".")
+    if domain.startswith("*."):
+        domain = domain[2:]
+    return domain if DOMAIN_RE.match(domain) else None
+
+
+def read_hostlist(path):
+    """Домены из hostlist файла (пустые строки и комментарии пропускаются)"""
+    domains = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                domain = normalize_domain(line) if line else None
+                if domain:
+                    domains.append(domain)
+    except OSError:
+        pass
+    return domains
+
+
+def covered_by(domain, domains):
+    """Покрывает ли список domains этот домен (winws сравнивает и поддомены)"""
+    parts = domain.split(".")
+    return any(".".join(parts[i:]) in domains for i in range(len(parts) - 1))
+
+
+def file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class AutoHostlist:
+    """Выученные домены: счетчик попаданий и время последнего появления
+
+    Записи хранятся в OrderedDict в порядке последнего появления, поэтому
+    вытеснение по LRU — это удаление с начала, без сортировки.
+    """
+
+    def __init__(self, store_path=None, max_entries=1000, max_age=30 * 86400):
+        self.store_path = store_path or app_data_path("autohostlist.json")
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries = OrderedDict()  # домен -> [попадания, последнее появление]
+        self.sources = {}             # путь -> смещение уже прочитанной части
+        self.evicted = 0
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        data = load_json(self.store_path)
+        if not isinstance(data, dict) or data.get("version") != STORE_VERSION:
+            return
+        for domain, hits, last_seen in data.get("domains", []):
+            self.entries[domain] = [hits, last_seen]
+        self.sources = dict(data.get("sources", {}))
+
+    def save(self):
+        if not self.dirty:
+            return
+        atomic_write_json(self.store_path, {
+            "version": STORE_VERSION,
+            "domains": [[domain, hits, last_seen] for domain, (hits, last_seen) in self.entries.items()],
+            "sources": self.sources,
+        })
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, domain):
+        return domain in self.entries
+
+    def record(self, domain, now=None):
+        """Отмечает появление домена; True если домен корректный"""
+        domain = normalize_domain(domain)
+        if domain is None:
+            return False
+        now = time.time() if now is None else now
+        entry = self.entries.get(domain)
+        if entry is None:
+            self.entries[domain] = [1, now]
+        else:
+            entry[0] += 1
+            entry[1] = max(entry[1], now)
+            self.entries.move_to_end(domain)
+        self.dirty = True
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+        return True
+
+    def ingest_lines(self, lines, now=None):
+        """Добавляет домены по одному на строку; возвращает число принятых"""
+        return sum(1 for line in lines if line.strip() and not line.startswith("#")
+                   and self.record(line.split()[0], now))
+
+    def ingest_file(self, path, now=None):
+        """Читает только новую часть файла (auto-hostlist winws дописывается в конец)"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        offset = self.sources.get(path, 0)
+        if size < offset:
+            offset = 0  # файл пересоздан
+        if size == offset:
+            return 0
+        with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+            f.seek(offset)
+            text = f.read()
+        # Незавершенную последнюю строку дочитаем в следующий раз
+        complete = text.rfind("\n") + 1
+        if complete == 0:
+            return 0
+        self.sources[path] = offset + len(text[:complete].encode("utf-8"))
+        self.dirty = True
+        return self.ingest_lines(text[:complete].splitlines(), now)
+
+    def expire(self, now=None):
+        """Удаляет домены, которые не появлялись дольше max_age"""
+        now = time.time() if now is None else now
+        removed = 0
+        while self.entries:
+            domain, (hits, last_seen) = next(iter(self.entries.items()))
+            if now - last_seen <= self.max_age:
+                break
+            del self.entries[domain]
+            removed += 1
+        if removed:
+            self.dirty = True
+        return removed
+
+    def learned(self, static_domains=()):
+        """Выученные домены, которых еще нет в статическом списке (сначала самые частые)"""
+        static_domains = set(static_domains)
+        ranked = sorted(self.entries.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        return [domain for domain, _ in ranked if not covered_by(domain, static_domains)]
+
+    def merge(self, static_path, output_path):
+        """Записывает в output_path статический список вместе с выученными доменами
+
+        Статический список только читается: обновления service.bat
+        попадают в собранный список при следующем merge. output_path
+        перезаписывается только если его содержимое изменилось.
+        Возвращает число выученных доменов в списке.
+        """
+        static_domains = read_hostlist(static_path)
+        learned = self.learned(static_domains)
+        text = "".join(f"{domain}\n" for domain in static_domains + sorted(learned))
+        digest = hashlib.sha256(text.replace("\n", "\r\n").encode("utf-8")).hexdigest()
+        if digest != file_digest(output_path):
+            atomic_write_text(output_path, text, newline="\r\n")
+        return len(learned)
+
+    def refresh(self, static_path, output_path, sources=(), now=None):
+        """Полный цикл: прочитать источники, убрать устаревшее, собрать список, сохранить"""
+        added = sum(self.ingest_file(path, now) for path in sources)
+        expired = self.expire(now)
+        learned = self.merge(static_path, output_path)
+        self.save()
+        print(f"Auto-hostlist: новых записей {added}, устарело {expired}, "
+              f"вытеснено {self.evicted}, в списке выученных {learned} из {len(self.entries)}")
+        return learned
+
+
+def replace_hostlist(strategy, static_path, merged_path):
+    """Стратегия, в которой --hostlist=static_path заменен на собранный список merged_path"""
+    target = os.path.normcase(os.path.abspath(static_path))
+    changed = False
+    sections = []
+    for section in strategy.sections:
+        args = []
+        for arg in section.args:
+            name, value = split_option(arg)
+            if name == "--hostlist" and os.path.normcase(os.path.abspath(value.strip('"'))) == target:
+                arg = f"--hostlist={merged_path}"
+                changed = True
+            args.append(arg)
+        sections.append(Section(section.index, args))
+    if not changed:
+        return strategy
+    return Strategy(strategy.name, strategy.global_args, sections, path=strategy.path)
+
+
+def add_hostlist_auto(strategy, hostlist_path, auto_path, fail_threshold=3, fail_time=60):
+    """Стратегия, в которой секции с --hostlist=hostlist_path получают --hostlist-auto=auto_path
+
+    winws дописывает в auto_path домены, соединения с которыми в этих
+    секциях fail_threshold раз за fail_time секунд не удались.
+    """
+    target = os.path.normcase(os.path.abspath(hostlist_path))
+    changed = False
+    sections = []
+    for section in strategy.sections:
+        args = list(section.args)
+        hostlists = [os.path.normcase(os.path.abspath(value.strip('"'))) for value in section.options("--hostlist")]
+        if target in hostlists and not section.options("--hostlist-auto"):
+            args += [f"--hostlist-auto={auto_path}",
+                     f"--hostlist-auto-fail-threshold={fail_threshold}",
+                     f"--hostlist-auto-fail-time={fail_time}"]
+            changed = True
+        sections.append(Section(section.index, args))
+    if not changed:
+        return strategy
+    return Strategy(strategy.name, strategy.global_args, sections, path=strategy.path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Управляемый auto-hostlist для list-general.txt")
+    parser.add_argument("command", choices=("ingest", "merge", "stats"))
+    parser.add_argument("files", nargs="*", help="файлы с доменами (для ingest)")
+    parser.add_argument("--list", default=STATIC_LIST, help="статический список (только читается)")
+    parser.add_argument("--output", help="собранный список (по умолчанию в папке данных Aether)")
+    parser.add_argument("--store", help="файл хранилища (по умолчанию в папке данных Aether)")
+    parser.add_argument("--max-entries", type=int, default=1000)
+    parser.add_argument("--max-age-days", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    hostlist = AutoHostlist(args.store, args.max_entries, args.max_age_days * 86400)
+    output = args.output or merged_list_path()
+    if args.command in ("ingest", "merge"):
+        hostlist.refresh(args.list, output, args.files)
+        print(f"Собранный список: {output}")
+    else:
+        for domain in hostlist.learned(read_hostlist(args.list))[:50]:
+            hits, last_seen = hostlist.entries[domain]
+            print(f"{hits:6d}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(last_seen))}  {domain}")
+        print(f"Всего: {len(hostlist)} (лимит {hostlist.max_entries})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""Замеры задержек главного переключателя на fake winws (Linux, offscreen Qt)
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.2
+
+Кроме переключения обхода замеряется отрисовка анимации главного
+переключателя: среднее время кадра и площадь перерисовки на кадр, а также
+перерисовка с готовой тенью окна и с прежним QGraphicsDropShadowEffect.
+С --idle-seconds дополнительно считаются пробуждения таймеров в минуту
+для открытого и скрытого окна. Смена стратегии при запущенном обходе
+замеряется отдельно: разрыв обхода (от остановки старого winws до
+готовности нового) и полное время операции.
+
+С --baseline скрипт завершается с кодом 1, если какая-то метрика стала
+хуже базовой больше чем на tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+# Изолируем настройки и служебные файлы, чтобы замеры не трогали профиль пользователя
+_sandbox = tempfile.mkdtemp(prefix="aether-bench-")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ["XDG_CONFIG_HOME"] = os.path.join(_sandbox, "config")
+os.environ["XDG_STATE_HOME"] = os.path.join(_sandbox, "state")
+
+from PySide6.QtWidgets import QApplication, QGraphicsDropShadowEffect
+from PySide6.QtGui import QColor
+from PySide6.QtCore import QAbstractAnimation
+
+from main import MainWindow
+from platform_backend import FakeWinwsBackend
+
+
+def wait_until(app, predicate, timeout=10.0):
+    """Крутит цикл событий Qt, пока predicate не станет истинным. Возвращает секунды или None"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        app.processEvents()
+        if predicate():
+            return time.perf_counter() - start
+        time.sleep(0.001)
+    return None
+
+
+def worker_done(window, previous):
+    thread = window.worker_thread
+    return thread is not None and thread is not previous and thread.isFinished()
+
+
+class Bench:
+    def __init__(self, app, window):
+        self.app = app
+        self.window = window
+        self.samples = {}
+        self.units = {}
+        self.threads = []
+
+    def record(self, name, seconds):
+        if seconds is None:
+            raise RuntimeError(f"Таймаут при замере {name}")
+        self.samples.setdefault(name, []).append(seconds * 1000)
+    
+    def record_value(self, name, value, unit):
+        self.samples.setdefault(name, []).append(value)
+        self.units[name] = unit
+    
+    def repaint_time(self, widget, runs):
+        start = time.perf_counter()
+        for _ in range(runs):
+            widget.repaint()
+        return (time.perf_counter() - start) / runs
+    
+    def shadow_compare(self, runs=50):
+        """Перерисовка переключателя с готовой тенью и с прежним QGraphicsDropShadowEffect"""
+        container = self.window.main_container
+        switch = self.window.main_switch
+        self.record("switch_repaint", self.repaint_time(switch, runs))
+        
+        legacy = QGraphicsDropShadowEffect()
+        legacy.setBlurRadius(20)
+        legacy.setColor(QColor(0, 0, 0, 60))
+        legacy.setOffset(0, 5)
+        container.setGraphicsEffect(legacy)
+        try:
+            self.app.processEvents()
+            self.record("switch_repaint_legacy_shadow", self.repaint_time(switch, runs))
+        finally:
+            container.setGraphicsEffect(None)
+            self.app.processEvents()
+    
+    def idle_wakeups(self, seconds):
+        """Пробуждения таймеров в минуту для открытого и скрытого окна"""
+        window = self.window
+        counter = {"n": 0}
+        
+        def tick():
+            counter["n"] += 1
+        
+        window.process_check_timer.timeout.connect(tick)
+        try:
+            for name, hidden in (("idle_wakeups_foreground", False), ("idle_wakeups_background", True)):
+                window.hide() if hidden else window.show()
+                self.app.processEvents()
+                counter["n"] = 0
+                wait_until(self.app, lambda: False, timeout=seconds)
+                self.record_value(name, counter["n"] / seconds * 60, "1/min")
+        finally:
+            window.process_check_timer.timeout.disconnect(tick)
+            window.show()
+            self.app.processEvents()
+    
+    def switch_paint(self, runs=4):
+        """Время кадра и площадь перерисовки главного переключателя во время анимации"""
+        switch = self.window.main_switch
+        switch.blockSignals(True)
+        try:
+            for _ in range(runs):
+                switch.reset_paint_stats()
+                switch.set_checked(not switch.is_checked())
+                wait_until(self.app, lambda: switch.animation.state() == QAbstractAnimation.State.Stopped)
+                wait_until(self.app, lambda: False, timeout=0.05)
+                stats = switch.paint_stats
+                if stats["frames"]:
+                    self.record_value("switch_frame_time", stats["time"] / stats["frames"] * 1000, "ms")
+                    self.record_value("switch_paint_area", stats["area"] / stats["frames"], "px")
+        finally:
+            if switch.is_checked():
+                switch.set_checked(False)
+                wait_until(self.app, lambda: switch.animation.state() == QAbstractAnimation.State.Stopped)
+            switch.blockSignals(False)
+
+    def toggle(self, checked):
+        """Переключает и ждет завершения фоновой операции. Возвращает секунды"""
+        window = self.window
+        wait_until(self.app, lambda: not window.is_switch_locked)
+        # Ссылки на отработавшие потоки держим до конца замеров: Qt может еще доставлять их сигналы
+        previous = window.worker_thread
+        self.threads.append(previous)
+        start = time.perf_counter()
+        window.main_switch.set_checked(checked)
+        elapsed = wait_until(self.app, lambda: worker_done(window, previous), timeout=30)
+        return None if elapsed is None else time.perf_counter() - start
+
+    def cycle(self):
+        window = self.window
+        self.record("start_latency", self.toggle(True))
+        self.record("icon_on_delay", wait_until(self.app, lambda: window.main_switch.is_process_running))
+        self.record("stop_latency", self.toggle(False))
+        self.record("icon_off_delay", wait_until(self.app, lambda: not window.main_switch.is_process_running))
+
+    def storm(self, cycles):
+        """Максимальная частота включений/выключений (с учетом блокировки переключателя)"""
+        start = time.perf_counter()
+        for _ in range(cycles):
+            self.toggle(True)
+            self.toggle(False)
+        return cycles / (time.perf_counter() - start)
+
+    def swaps(self, count):
+        """Смена стратегии из списка при запущенном обходе"""
+        window = self.window
+        session = window.session
+        names = session.strategies.alternatives()
+        self.toggle(True)
+        try:
+            for i in range(count):
+                name = names[(i + 1) % len(names)]
+                previous = window.worker_thread
+                self.threads.append(previous)
+                start = time.perf_counter()
+                window.bat_dropdown.setCurrentText(name)
+                if session.is_alternative_mode:
+                    window.bat_dropdown.textActivated.emit(name)
+                else:
+                    window.alt_button.click()
+                elapsed = wait_until(self.app, lambda: worker_done(window, previous), timeout=30)
+                self.record("swap_latency", None if elapsed is None else time.perf_counter() - start)
+                if session.last_swap is None or session.active_strategy != name:
+                    raise RuntimeError(f"Стратегия {name} не запущена после смены")
+                self.record("swap_gap", session.last_swap["gap"])
+        finally:
+            self.toggle(False)
+
+
+def summarize(samples, units):
+    metrics = {}
+    for name, values in samples.items():
+        metrics[name] = {
+            "value": round(statistics.median(values), 3),
+            "min": round(min(values), 3),
+            "max": round(max(values), 3),
+            "unit": units.get(name, "ms"),
+            "better": "lower",
+        }
+    return metrics
+
+
+def compare(metrics, baseline, tolerance):
+    """Список регрессий относительно baseline"""
+    regressions = []
+    for name, base in baseline.get("metrics", {}).items():
+        current = metrics.get(name)
+        if current is None:
+            continue
+        if base["better"] == "lower":
+            limit = base["value"] * (1 + tolerance)
+            if current["value"] > limit:
+                regressions.append(f"{name}: {current['value']} > {limit:.1f} {base['unit']}")
+        else:
+            limit = base["value"] * (1 - tolerance)
+            if current["value"] < limit:
+                regressions.append(f"{name}: {current['value']} < {limit:.2f} {base['unit']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк переключения обхода на fake winws")
+    parser.add_argument("--cycles", type=int, default=3, help="циклов включения/выключения")
+    parser.add_argument("--storm-cycles", type=int, default=3)
+    parser.add_argument("--swaps", type=int, default=3, help="смен стратегии при запущенном обходе")
+    parser.add_argument("--startup-delay", type=float, default=0.1, help="задержка готовности fake winws")
+    parser.add_argument("--idle-seconds", type=float, default=0,
+                        help="замерить пробуждения таймеров в простое (секунд на режим, 0 — пропустить)")
+    parser.add_argument("--output", help="куда сохранить результаты (JSON)")
+    parser.add_argument("--baseline", help="JSON с базовыми результатами")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение (доля)")
+    args = parser.parse_args(argv)
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = MainWindow(backend=FakeWinwsBackend(startup_delay=args.startup_delay))
+    window.show()
+
+    bench = Bench(app, window)
+    try:
+        bench.switch_paint()
+        bench.shadow_compare()
+        if args.idle_seconds:
+            bench.idle_wakeups(args.idle_seconds)
+        for _ in range(args.cycles):
+            bench.cycle()
+        throughput = bench.storm(args.storm_cycles)
+        if args.swaps:
+            bench.swaps(args.swaps)
+    finally:
+        window.kill_all_processes()
+
+    metrics = summarize(bench.samples, bench.units)
+    metrics["toggle_storm"] = {"value": round(throughput, 3), "unit": "cycles/s", "better": "higher"}
+    result = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": sys.platform,
+        "startup_delay": args.startup_delay,
+        "metrics": metrics,
+    }
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(metrics, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,756 @@
+# -*- coding: utf-8 -*-
+"""Привилегированный брокер процессов
+
+Права администратора нужны только для запуска и завершения winws и для
+настроек системы (служба zapret, TCP timestamps). Брокер — небольшой
+процесс без Qt, который запускается с правами администратора один раз и
+выполняет только эти операции. GUI работает без повышения прав и
+обращается к брокеру по локальному соединению (127.0.0.1, ключ HMAC из
+файла состояния в папке данных Aether). Брокер завершается через
+IDLE_TIMEOUT секунд после отключения последнего клиента: перезапуск GUI
+успевает подключиться к нему же, а запущенные winws продолжают работать.
+
+Ключ лежит в файле, который может прочитать любой процесс пользователя,
+поэтому запросы не доверяются: сообщения — JSON (не pickle), каждая
+команда сверяется со схемой аргументов. Папку general тоже может изменить
+любой процесс пользователя, поэтому bat файлы брокер не выполняет: он сам
+разбирает стратегию из своей папки general и запускает winws.exe напрямую,
+только если winws и его библиотеки совпадают с известными версиями
+(PINNED_BINARIES). Разрешены только опции стратегий (пути к спискам и
+фейкам — только внутри general и папки списков Aether),
+завершение winws и Discord по имени, завершение только тех процессов,
+которые брокер запустил сам, и запрос состояния служб zapret и WinDivert
+(sc вызывается без shell).
+
+    python broker.py --fake          # непривилегированная замена на fake winws (Linux)
+    python broker.py --selftest      # проверка протокола: брокер на fake winws + клиент
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import ctypes
+import hashlib
+import secrets
+import argparse
+import threading
+import subprocess
+from collections import deque
+from multiprocessing.connection import Listener, Client
+
+from strategy import split_option, parse_bat
+from platform_backend import ProcessBackend, FakeWinwsBackend, default_backend
+from discord_control import DISCORD_VARIANTS
+from storage import app_data_path, load_json, atomic_write_json
+
+BROKER_SCRIPT = os.path.abspath(__file__)
+PROTOCOL_VERSION = 3
+
+# Переменные окружения, которые клиент может передать запускаемой стратегии
+ALLOWED_ENV = ("AETHER_LAUNCH", "GameFilter")
+# cmd подставляет %GameFilter% прямо в командную строку winws внутри bat файла
+GAME_FILTER_RE = re.compile(r"^[0-9,\-]+$")
+
+# SHA-256 файлов general/bin, которые загружает winws; обновляются вместе с версией zapret
+PINNED_BINARIES = {
+    "winws.exe": "5ccdf86fa3c11322e1dc49be9c47a177ff6a4456bc2ef225a7bc4f23ea40f7de",
+    "cygwin1.dll": "103104a52e5293ce418944725df19e2bf81ad9269b9a120d71d39028e821499b",
+    "WinDivert.dll": "c1e060ee19444a259b2162f8af0f3fe8c4428a1c6f694dce20de194ac8d7d9a2",
+    "WinDivert64.sys": "8da085332782708d8767bcace5327a6ec7283c17cfb85e40b03cd2323a90ddc2",
+}
+
+# Службы, состояние которых клиент может запросить
+SERVICE_NAMES = ("zapret", "WinDivert")
+
+# Завершение брокера через столько секунд без клиентов
+IDLE_TIMEOUT = 15
+MAX_MESSAGE = 1 << 20
+OUTPUT_LINES = 1000
+
+# Команды и типы их аргументов (или кортеж допустимых значений); другие запросы
+# отклоняются до выполнения
+REQUEST_SCHEMA = {
+    "ping": {},
+    "is_running": {"name": str},
+    "describe": {"pid": int},
+    "running_winws": {},
+    "kill_by_name": {"name": str},
+    "kill_tree": {"pid": int},
+    "kill_launchers": {},
+    "spawn_strategy": {"bat_path": str, "env": dict},
+    "spawn_winws": {"argv": list},
+    "poll": {"pid": int},
+    "read_output": {"pid": int, "since": int},
+    "query_service": {"name": SERVICE_NAMES},
+    "tcp_timestamps": {},
+    "enable_tcp_timestamps": {},
+    "shutdown": {},
+}
+
+# Опции winws, которые используют стратегии; кроме них разрешены параметры --dpi-desync*
+WINWS_OPTIONS = {"--wf-tcp", "--wf-udp", "--filter-tcp", "--filter-udp", "--filter-l3", "--filter-l7",
+                 "--hostlist", "--hostlist-exclude", "--hostlist-domains", "--ipset", "--ipset-exclude",
+                 "--hostlist-auto", "--hostlist-auto-fail-threshold", "--hostlist-auto-fail-time",
+                 "--hostlist-auto-retrans-threshold", "--new", "--debug"}
+PATH_OPTIONS = {"--hostlist", "--hostlist-exclude", "--ipset", "--ipset-exclude", "--hostlist-auto"}
+# Опции с числовым значением
+NUMERIC_OPTIONS = {"--hostlist-auto-fail-threshold", "--hostlist-auto-fail-time", "--hostlist-auto-retrans-threshold"}
+# --debug только в консоль: --debug=@файл писал бы файл с правами администратора
+DEBUG_VALUES = {"0", "1"}
+
+
+def default_state_path():
+    return app_data_path("broker.json")
+
+
+class BrokerError(Exception):
+    """Ошибка, которую брокер вернул на запрос"""
+
+
+def send_message(connection, message):
+    connection.send_bytes(json.dumps(message).encode("utf-8"))
+
+
+def recv_message(connection):
+    return json.loads(connection.recv_bytes(MAX_MESSAGE).decode("utf-8"))
+
+
+def validate_request(request):
+    """(команда, аргументы) запроса, соответствующего REQUEST_SCHEMA, иначе BrokerError"""
+    if not isinstance(request, dict) or not isinstance(request.get("op"), str):
+        raise BrokerError("Некорректный запрос")
+    op = request["op"]
+    schema = REQUEST_SCHEMA.get(op)
+    if schema is None:
+        raise BrokerError(f"Неизвестная команда {op!r}")
+    args = request.get("args", {})
+    if not isinstance(args, dict) or set(args) != set(schema):
+        raise BrokerError(f"Неверные аргументы команды {op}")
+    for name, kind in schema.items():
+        if isinstance(kind, tuple):
+            if args[name] not in kind:
+                raise BrokerError(f"Аргумент {name} команды {op} должен быть одним из: {', '.join(kind)}")
+            continue
+        # type(), а не isinstance: True не должен проходить как PID
+        if type(args[name]) is not kind:
+            raise BrokerError(f"Аргумент {name} команды {op} должен быть {kind.__name__}")
+    return op, args
+
+
+def open_pinned(path):
+    """Открывает файл для чтения; на Windows другие процессы не могут его изменить или удалить,
+    пока файл открыт"""
+    if os.name != "nt":
+        return open(path, "rb")
+    import msvcrt
+    from ctypes import wintypes
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateFileW.restype = wintypes.HANDLE
+    kernel32.CreateFileW.argtypes = (wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                                     wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE)
+    # GENERIC_READ, только FILE_SHARE_READ, OPEN_EXISTING
+    handle = kernel32.CreateFileW(path, 0x80000000, 0x1, None, 3, 0x80, None)
+    if handle is None or handle == wintypes.HANDLE(-1).value:
+        raise ctypes.WinError(ctypes.get_last_error())
+    return os.fdopen(msvcrt.open_osfhandle(handle, os.O_RDONLY | os.O_BINARY), "rb")
+
+
+def is_path_option(name):
+    """Опция winws, значение которой — путь к файлу"""
+    if name in PATH_OPTIONS or name.endswith("-pattern"):
+        return True
+    return name.startswith("--dpi-desync-fake-") and not name.endswith("-mod")
+
+
+class SpawnedProcess:
+    """Процесс, запущенный брокером, и его вывод с абсолютной нумерацией строк"""
+
+    def __init__(self, process, pins=()):
+        self.process = process
+        # Проверенные файлы winws остаются открытыми, пока процесс работает
+        self.pins = list(pins)
+        self.lines = deque(maxlen=OUTPUT_LINES)
+        self.first = 0  # номер первой строки в lines
+        self.drained = False
+        self.reported = False
+        self.exited_at = None
+        self.closed = threading.Event()
+        threading.Thread(target=self._read, name=f"broker-output-{process.pid}", daemon=True).start()
+
+    def _read(self):
+        try:
+            for raw in iter(self.process.stdout.readline, b""):
+                if len(self.lines) == self.lines.maxlen:
+                    self.first += 1
+                self.lines.append(raw)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.closed.set()
+
+    def read(self, since):
+        since = max(since, self.first)
+        lines = list(self.lines)[since - self.first:]
+        self.drained = self.closed.is_set() and since + len(lines) >= self.first + len(self.lines)
+        return lines, since + len(lines)
+
+    def is_stale(self, now, keep=600):
+        """Процесс завершился, клиент узнал код и дочитал вывод (или давно перестал спрашивать)"""
+        if self.process.poll() is None or not self.closed.is_set():
+            return False
+        if self.exited_at is None:
+            self.exited_at = now
+        return (self.drained and self.reported) or now - self.exited_at > keep
+
+    def release(self):
+        for pin in self.pins:
+            pin.close()
+        self.pins = []
+
+
+class BrokerServer:
+    """Обрабатывает запросы клиентов поверх локального backend"""
+
+    def __init__(self, backend, general_dir, state_path, idle_timeout=IDLE_TIMEOUT, lists_dir=None,
+                 pinned=PINNED_BINARIES):
+        self.backend = backend
+        self.general_dir = os.path.realpath(general_dir)
+        # Списки, которые Aether собирает сам, лежат в папке данных, а не в general
+        self.path_roots = (self.general_dir, os.path.realpath(lists_dir or app_data_path("lists")))
+        self.winws_path = os.path.join(self.general_dir, "bin", "winws.exe")
+        self.pinned = pinned
+        self.state_path = state_path
+        self.idle_timeout = idle_timeout
+        self.spawned = {}
+        self.clients = 0
+        self.last_activity = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.allowed_kill = {backend.winws_name.lower()} | set(DISCORD_VARIANTS)
+
+    # --- проверки
+
+    def _check_bat(self, bat_path):
+        path = os.path.realpath(bat_path)
+        name = os.path.basename(path).lower()
+        if (os.path.dirname(path) != self.general_dir or not name.endswith(".bat")
+                or name.startswith("service")):
+            raise BrokerError(f"Запуск разрешен только для стратегий из {self.general_dir}")
+        return path
+
+    def _check_game_filter(self, env):
+        game_filter = env.get("GameFilter", "12")
+        if not isinstance(game_filter, str) or not GAME_FILTER_RE.match(game_filter):
+            raise BrokerError(f"Недопустимое значение GameFilter: {game_filter!r}")
+        return game_filter
+
+    def _pin_binaries(self):
+        """Открывает winws и его библиотеки и сверяет их SHA-256 с PINNED_BINARIES
+
+        Файлы остаются открытыми до завершения процесса: на Windows их нельзя
+        подменить между проверкой и загрузкой.
+        """
+        bin_dir = os.path.dirname(self.winws_path)
+        pins = []
+        try:
+            for name, expected in self.pinned.items():
+                try:
+                    pin = open_pinned(os.path.join(bin_dir, name))
+                except OSError as e:
+                    raise BrokerError(f"Не удалось открыть {name}: {e}")
+                pins.append(pin)
+                digest = hashlib.sha256(pin.read()).hexdigest()
+                if digest != expected:
+                    raise BrokerError(f"{name} не совпадает с известной версией (SHA-256 {digest[:16]}...)")
+        except BaseException:
+            for pin in pins:
+                pin.close()
+            raise
+        return pins
+
+    def _check_path(self, value):
+        path = os.path.realpath(value)
+        for root in self.path_roots:
+            try:
+                if os.path.commonpath([path, root]) == root:
+                    return
+            except ValueError:
+                continue  # другой диск на Windows
+        raise BrokerError(f"Файл {value} вне папок {', '.join(self.path_roots)}")
+
+    def _check_winws_args(self, argv):
+        for arg in argv:
+            if not isinstance(arg, str):
+                raise BrokerError("Аргументы winws должны быть строками")
+            name, value = split_option(arg)
+            if name not in WINWS_OPTIONS and not name.startswith("--dpi-desync"):
+                raise BrokerError(f"Опция winws {name} не разрешена")
+            if name == "--debug" and value not in DEBUG_VALUES:
+                raise BrokerError("--debug разрешен только с выводом в консоль")
+            if name in NUMERIC_OPTIONS and not (value or "").isdigit():
+                raise BrokerError(f"{name} должен быть числом")
+            # Встроенные фейки winws: 0x... и !
+            if value and is_path_option(name) and not value.startswith(("0x", "!")):
+                self._check_path(value)
+
+    def _register(self, process, pins=()):
+        self.spawned[process.pid] = SpawnedProcess(process, pins)
+        return process.pid
+
+    def _spawned(self, pid):
+        spawned = self.spawned.get(pid)
+        if spawned is None:
+            raise BrokerError(f"Процесс {pid} запущен не брокером")
+        return spawned
+
+    # --- команды
+
+    def op_ping(self):
+        return {"version": PROTOCOL_VERSION, "pid": os.getpid(), "admin": is_admin()}
+
+    def op_is_running(self, name):
+        return self.backend.is_running(name)
+
+    def op_describe(self, pid):
+        return self.backend.describe(pid)
+
+    def op_running_winws(self):
+        return self.backend.running_winws()
+
+    def op_kill_by_name(self, name):
+        if name.lower() not in self.allowed_kill:
+            raise BrokerError(f"Завершение {name} не разрешено")
+        return self.backend.kill_by_name(name)
+
+    def op_kill_tree(self, pid):
+        self._spawned(pid)
+        return self.backend.kill_tree(pid)
+
+    def op_kill_launchers(self):
+        self.backend.kill_launchers()
+
+    def op_spawn_strategy(self, bat_path, env):
+        # bat файл не выполняется: из него берутся только аргументы winws, и те проверяются
+        strategy = parse_bat(self._check_bat(bat_path), game_filter=self._check_game_filter(env))
+        return self.op_spawn_winws(strategy.argv())
+
+    def op_spawn_winws(self, argv):
+        self._check_winws_args(argv)
+        pins = self._pin_binaries()
+        try:
+            process = self.backend.spawn_winws(self.winws_path, argv)
+        except BaseException:
+            for pin in pins:
+                pin.close()
+            raise
+        return self._register(process, pins)
+
+    def op_poll(self, pid):
+        spawned = self._spawned(pid)
+        code = spawned.process.poll()
+        spawned.reported = code is not None
+        return code
+
+    def op_read_output(self, pid, since):
+        spawned = self._spawned(pid)
+        lines, next_line = spawned.read(since)
+        # latin-1 переводит байты в строку JSON и обратно без потерь
+        return {"lines": [line.decode("latin-1") for line in lines], "next": next_line, "eof": spawned.drained}
+
+    def op_query_service(self, name):
+        return self.backend.query_service(name)
+
+    def op_tcp_timestamps(self):
+        return self.backend.tcp_timestamps()
+
+    def op_enable_tcp_timestamps(self):
+        self.backend.enable_tcp_timestamps()
+
+    def op_shutdown(self):
+        self._stop.set()
+
+    # --- сервер
+
+    def handle(self, request):
+        try:
+            op, args = validate_request(request)
+            with self._lock:
+                self.last_activity = time.monotonic()
+                self._reap()
+                return {"ok": True, "result": getattr(self, f"op_{op}")(**args)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def _reap(self):
+        now = time.monotonic()
+        for pid, spawned in list(self.spawned.items()):
+            if spawned.is_stale(now):
+                spawned.release()
+                del self.spawned[pid]
+
+    def _serve_connection(self, connection):
+        self.clients += 1
+        try:
+            while not self._stop.is_set():
+                try:
+                    request = recv_message(connection)
+                except (EOFError, OSError):
+                    break
+                except ValueError:
+                    request = None  # не JSON: отклоняется как некорректный запрос
+                send_message(connection, self.handle(request))
+        finally:
+            self.clients -= 1
+            self.last_activity = time.monotonic()
+            connection.close()
+
+    def _is_idle(self):
+        if not self.idle_timeout or self.clients:
+            return False
+        return time.monotonic() - self.last_activity > self.idle_timeout
+
+    def serve(self):
+        key = secrets.token_bytes(32)
+        listener = Listener(("127.0.0.1", 0), authkey=key)
+        atomic_write_json(self.state_path, {
+            "port": listener.address[1],
+            "key": key.hex(),
+            "pid": os.getpid(),
+            "version": PROTOCOL_VERSION,
+        })
+        print(f"Брокер слушает 127.0.0.1:{listener.address[1]} (PID {os.getpid()}, admin={is_admin()})")
+
+        def accept():
+            while not self._stop.is_set():
+                try:
+                    connection = listener.accept()
+                except Exception:
+                    # Неверный ключ или оборванное соединение — ждем следующего клиента
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+        threading.Thread(target=accept, name="broker-accept", daemon=True).start()
+        while not self._stop.wait(1.0):
+            if self._is_idle():
+                print("Брокер простаивает, завершение")
+                break
+        listener.close()
+        for spawned in self.spawned.values():
+            spawned.release()
+        state = load_json(self.state_path, {})
+        if state.get("pid") == os.getpid():
+            os.unlink(self.state_path)
+
+
+class BrokerClient:
+    """Соединение с брокером; безопасно для вызова из нескольких потоков"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, state_path=None, timeout=0):
+        """Подключается к запущенному брокеру, ожидая до timeout секунд его готовности"""
+        state_path = state_path or default_state_path()
+        deadline = time.monotonic() + timeout
+        while True:
+            state = load_json(state_path)
+            if state and state.get("version") == PROTOCOL_VERSION:
+                try:
+                    client = cls(Client(("127.0.0.1", state["port"]), authkey=bytes.fromhex(state["key"])))
+                    client.call("ping")
+                    return client
+                except Exception:
+                    pass
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
+
+    def call(self, op, **args):
+        with self._lock:
+            send_message(self.connection, {"op": op, "args": args})
+            response = recv_message(self.connection)
+        if not response["ok"]:
+            raise BrokerError(response["error"])
+        return response["result"]
+
+    def close(self):
+        self.connection.close()
+
+
+class RemoteStream:
+    """stdout процесса в брокере для OutputReader (readline до конца вывода)"""
+
+    def __init__(self, client, pid, poll_interval=0.05):
+        self.client = client
+        self.pid = pid
+        self.poll_interval = poll_interval
+        self.next = 0
+        self.buffer = deque()
+
+    def readline(self):
+        while not self.buffer:
+            try:
+                chunk = self.client.call("read_output", pid=self.pid, since=self.next)
+            except (BrokerError, EOFError, OSError):
+                return b""
+            self.buffer.extend(line.encode("latin-1") for line in chunk["lines"])
+            self.next = chunk["next"]
+            if not self.buffer:
+                if chunk["eof"]:
+                    return b""
+                time.sleep(self.poll_interval)
+        return self.buffer.popleft()
+
+
+class RemoteProcess:
+    """Процесс в брокере с интерфейсом subprocess.Popen, нужным Aether"""
+
+    def __init__(self, client, pid):
+        self.client = client
+        self.pid = pid
+        self.stdout = RemoteStream(client, pid)
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                self.returncode = self.client.call("poll", pid=self.pid)
+            except BrokerError:
+                self.returncode = -1  # брокер уже забыл процесс
+        return self.returncode
+
+    def kill(self):
+        try:
+            self.client.call("kill_tree", pid=self.pid)
+        except BrokerError:
+            pass
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(f"broker:{self.pid}", timeout)
+            time.sleep(0.05)
+        return self.returncode
+
+
+class BrokerBackend(ProcessBackend):
+    """ProcessBackend, который выполняет операции через брокер"""
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    @classmethod
+    def connect_or_start(cls, state_path=None, fake=False, timeout=30):
+        """Подключается к брокеру, при необходимости запуская его (с запросом прав на Windows)"""
+        state_path = state_path or default_state_path()
+        started = time.perf_counter()
+        client = BrokerClient.connect(state_path)
+        if client is None:
+            if not start_broker(state_path, fake):
+                return None
+            client = BrokerClient.connect(state_path, timeout=timeout)
+            if client is None:
+                return None
+            print(f"Брокер запущен за {(time.perf_counter() - started) * 1000:.0f} мс")
+        else:
+            print(f"Подключение к брокеру: {(time.perf_counter() - started) * 1000:.1f} мс")
+        return cls(client)
+
+    def is_running(self, name):
+        return self.client.call("is_running", name=name)
+
+    def describe(self, pid):
+        return self.client.call("describe", pid=pid)
+
+    def running_winws(self):
+        return self.client.call("running_winws")
+
+    def kill_by_name(self, name):
+        return self.client.call("kill_by_name", name=name)
+
+    def kill_tree(self, pid):
+        try:
+            return self.client.call("kill_tree", pid=pid)
+        except BrokerError:
+            return False
+
+    def kill_launchers(self):
+        self.client.call("kill_launchers")
+
+    def spawn_strategy(self, bat_path, env):
+        env = {k: v for k, v in env.items() if k in ALLOWED_ENV}
+        return RemoteProcess(self.client, self.client.call("spawn_strategy", bat_path=bat_path, env=env))
+
+    def spawn_winws(self, winws_path, argv):
+        return RemoteProcess(self.client, self.client.call("spawn_winws", argv=list(argv)))
+
+    def query_service(self, name):
+        return self.client.call("query_service", name=name)
+
+    def tcp_timestamps(self):
+        return self.client.call("tcp_timestamps")
+
+    def enable_tcp_timestamps(self):
+        self.client.call("enable_tcp_timestamps")
+
+
+def is_admin():
+    try:
+        return bool(ctypes.windll.shell32.IsUserAnAdmin())
+    except Exception:
+        return os.name != "nt" and os.geteuid() == 0
+
+
+def start_broker(state_path, fake=False):
+    """Запускает брокер: на Windows с повышением прав (UAC), иначе обычным процессом"""
+    args = [BROKER_SCRIPT, "--state", state_path] + (["--fake"] if fake else [])
+    if os.name == "nt" and not fake:
+        python = sys.executable
+        if python.lower().endswith("python.exe"):
+            python = python[:-len("python.exe")] + "pythonw.exe"
+        params = subprocess.list2cmdline(args)
+        result = ctypes.windll.shell32.ShellExecuteW(None, "runas", python, params,
+                                                     os.path.dirname(BROKER_SCRIPT), 0)
+        return result > 32
+    subprocess.Popen([sys.executable] + args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, cwd=os.path.dirname(BROKER_SCRIPT),
+                     start_new_session=True)
+    return True
+
+
+def selftest():
+    """Проверка протокола на непривилегированном брокере с fake winws"""
+    from readiness import OutputReader, ReadinessDetector
+    from sharding import ShardGroup
+    from strategy import parse_bat
+
+    state_path = app_data_path(f"broker-selftest-{os.getpid()}.json")
+    started = time.perf_counter()
+    backend = BrokerBackend.connect_or_start(state_path, fake=True, timeout=10)
+    if backend is None:
+        print("Брокер не запустился")
+        return 1
+    print(f"Брокер готов: {(time.perf_counter() - started) * 1000:.0f} мс, {backend.client.call('ping')}")
+    try:
+        calls = 200
+        start = time.perf_counter()
+        for _ in range(calls):
+            backend.is_running(backend.winws_name)
+        print(f"Запрос is_running: {(time.perf_counter() - start) / calls * 1e6:.0f} мкс")
+
+        bat = os.path.join(os.path.dirname(BROKER_SCRIPT), "general", "general (ALT).bat")
+        process = backend.spawn_strategy(bat, dict(os.environ, AETHER_LAUNCH="1", GameFilter="12"))
+        readiness = ReadinessDetector(OutputReader(process.stdout), lambda: process.poll() is None).wait()
+        print(f"Стратегия через брокер: {readiness}, is_running={backend.is_running(backend.winws_name)}")
+
+        group = ShardGroup([parse_bat(bat)], os.path.join(os.path.dirname(bat), "bin", "winws.exe"), backend)
+        group.start()
+        print(f"winws через брокер: {group.wait_ready()}")
+        group.stop()
+
+        winws = os.path.join(os.path.dirname(bat), "bin", "winws.exe")
+        for forbidden in (lambda: backend.kill_by_name("explorer.exe"),
+                          lambda: backend.client.call("kill_tree", pid=1),
+                          lambda: backend.client.call("kill_tree", pid=True),
+                          lambda: backend.client.call("poll", pid=process.pid, extra=1),
+                          lambda: backend.client.call("__init__"),
+                          lambda: backend.query_service('zapret" & calc & "'),
+                          lambda: backend.query_service(["zapret"]),
+                          lambda: backend.spawn_strategy("/etc/passwd.bat", {}),
+                          lambda: backend.spawn_strategy(bat, {"GameFilter": "12 & calc.exe"}),
+                          lambda: backend.spawn_winws(winws, ["--debug=@/tmp/aether-broker.log"]),
+                          lambda: backend.spawn_winws(winws, ["--hostlist=/etc/passwd"]),
+                          lambda: backend.spawn_winws(winws, ["--hostlist-auto=/etc/cron.d/aether"]),
+                          lambda: backend.spawn_winws(winws, ["--hostlist-auto-fail-time=1 --debug=@x"]),
+                          lambda: backend.spawn_winws(winws, ["--dpi-desync-fake-tls=../../etc/passwd"]),
+                          lambda: backend.spawn_winws(winws, ["@/tmp/winws-config.txt"])):
+            try:
+                forbidden()
+                print("ОШИБКА: запрещенная команда выполнена")
+                return 1
+            except BrokerError as e:
+                print(f"Отклонено: {e}")
+
+        # pickle на стороне брокера не разбирается: такое сообщение — просто некорректный запрос
+        import pickle
+        with backend.client._lock:
+            backend.client.connection.send_bytes(pickle.dumps({"op": "ping", "args": {}}))
+            response = recv_message(backend.client.connection)
+        if response["ok"]:
+            print("ОШИБКА: брокер принял pickle")
+            return 1
+        print(f"Отклонено: {response['error']}")
+
+        backend.kill_tree(process.pid)
+        process.wait(timeout=5)
+        print(f"Процесс завершен, код {process.returncode}")
+    finally:
+        backend.client.call("shutdown")
+        backend.client.close()
+
+    # Подмененный winws и команды, дописанные в bat файл, не выполняются
+    import tempfile
+    with tempfile.TemporaryDirectory(prefix="aether-broker-") as general_dir:
+        os.makedirs(os.path.join(general_dir, "bin"))
+        with open(os.path.join(general_dir, "bin", "winws.exe"), "wb") as f:
+            f.write(b"MZ not winws")
+        bat = os.path.join(general_dir, "general (EDITED).bat")
+        with open(bat, "w", encoding="utf-8") as f:
+            f.write('start "zapret" /min "%BIN%winws.exe" --wf-tcp=443 --dpi-desync=fake & calc.exe\n')
+        server = BrokerServer(FakeWinwsBackend(), general_dir, app_data_path("unused.json"),
+                              pinned={"winws.exe": PINNED_BINARIES["winws.exe"]})
+        for request in ({"op": "spawn_strategy", "args": {"bat_path": bat, "env": {}}},
+                        {"op": "spawn_winws", "args": {"argv": ["--wf-tcp=443", "--dpi-desync=fake"]}}):
+            response = server.handle(request)
+            if response["ok"] or server.spawned:
+                print("ОШИБКА: брокер запустил непроверенный winws")
+                return 1
+            print(f"Отклонено: {response['error']}")
+
+    # Без клиентов брокер завершается сам
+    idle_state = app_data_path(f"broker-selftest-idle-{os.getpid()}.json")
+    server = BrokerServer(FakeWinwsBackend(), os.path.join(os.path.dirname(BROKER_SCRIPT), "general"),
+                          idle_state, idle_timeout=0.5)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    client = BrokerClient.connect(idle_state, timeout=5)
+    client.close()
+    thread.join(timeout=5)
+    if thread.is_alive():
+        print("ОШИБКА: брокер не завершился после отключения клиента")
+        return 1
+    print("Брокер без клиентов завершился")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Привилегированный брокер процессов Aether")
+    parser.add_argument("--state", default=None, help="файл с портом и ключом брокера")
+    parser.add_argument("--fake", action="store_true", help="fake_winws.py вместо winws.exe")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="завершиться после N секунд без клиентов (0 — работать всегда)")
+    parser.add_argument("--selftest", action="store_true", help="проверить протокол на fake брокере")
+    args = parser.parse_args(argv)
+
+    if args.selftest:
+        return selftest()
+
+    try:
+        backend = FakeWinwsBackend() if args.fake else default_backend()
+    except RuntimeError as e:
+        print(e)
+        return 1
+    general_dir = os.path.join(os.path.dirname(BROKER_SCRIPT), "general")
+    server = BrokerServer(backend, general_dir, args.state or default_state_path(), args.idle_timeout)
+    server.serve()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,632 @@
+# -*- coding: utf-8 -*-
+"""Скомпилированные списки ipset и hostlist
+
+Текстовые списки каждый потребитель разбирает построчно. Скомпилированный
+файл (.alist) хранит то же содержимое в виде, по которому можно искать
+прямо в отображенной в память копии (mmap), ничего не разбирая:
+
+- ipset: объединенные диапазоны адресов, отсортированные массивы начал и
+  концов (IPv4 — uint32 little-endian, IPv6 — 16 байт big-endian);
+- hostlist: домены с обратным порядком меток (com.discord.cdn),
+  отсортированные: первые 8 байт каждого числом (по ним двоичный поиск
+  идет без разбора строк), таблица смещений и блок строк.
+
+Заголовок содержит сигнатуру, версию формата, тип списка, CRC32 данных и
+размеры секций. winws по-прежнему читает только текст: export
+восстанавливает его из скомпилированного файла (ipset — минимальным
+набором подсетей).
+
+    python compiled_list.py compile general/lists/list-general.txt
+    python compiled_list.py lookup general/lists/list-general.alist cdn.discordapp.com
+    python compiled_list.py export general/lists/list-general.alist list.txt
+    python compiled_list.py bench --entries 1000000
+    python compiled_list.py selftest
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import bisect
+import random
+import struct
+import socket
+import argparse
+import tempfile
+import ipaddress
+from array import array
+
+from storage import atomic_write_bytes, atomic_write_text
+
+MAGIC = b"AETHLIST"
+FORMAT_VERSION = 1
+EXTENSION = ".alist"
+
+KIND_IPSET = 1
+KIND_HOSTLIST = 2
+KINDS = {"ipset": KIND_IPSET, "hostlist": KIND_HOSTLIST}
+
+# Сигнатура, версия, тип, CRC32 данных и размеры двух секций; данные начинаются с 32 байта
+HEADER = struct.Struct("<8sHHIII8x")
+
+IPV6_SIZE = 16
+PREFIX_SIZE = 8
+
+
+def read_lines(path):
+    """Значимые строки текстового списка (без комментариев и пустых строк)"""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                yield line
+
+
+def parse_ip_entry(line):
+    """(версия, первый, последний адрес) записи ipset: адрес, подсеть или диапазон a-b"""
+    if "-" in line:
+        first, last = (ipaddress.ip_address(part.strip()) for part in line.split("-", 1))
+        if first.version != last.version or first > last:
+            raise ValueError(f"неверный диапазон: {line}")
+        return first.version, int(first), int(last)
+    network = ipaddress.ip_network(line, strict=False)
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+def merge_ranges(ranges):
+    """Сортирует диапазоны и объединяет пересекающиеся и соседние"""
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1][1] = last
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def parse_address(value):
+    """(версия, первый, последний адрес) для адреса или подсети; IPv4 адрес разбирается без ipaddress"""
+    if "/" not in value:
+        try:
+            address = struct.unpack("!I", socket.inet_pton(socket.AF_INET, value))[0]
+            return 4, address, address
+        except OSError:
+            pass
+    network = ipaddress.ip_network(value, strict=False)
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+def normalize_host(line):
+    return line.lower().rstrip(".")
+
+
+def reverse_domain(domain):
+    return ".".join(reversed(domain.split(".")))
+
+
+def prefix_key(key):
+    """Первые 8 байт ключа числом: порядок чисел совпадает с порядком ключей"""
+    return int.from_bytes(key[:PREFIX_SIZE].ljust(PREFIX_SIZE, b"\0"), "big")
+
+
+def pack(fmt, values):
+    packed = array(fmt, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def compile_ipset(lines):
+    """Данные ipset и число пропущенных строк"""
+    ranges = {4: [], 6: []}
+    skipped = 0
+    for line in lines:
+        try:
+            version, first, last = parse_ip_entry(line)
+        except ValueError:
+            skipped += 1
+            continue
+        ranges[version].append((first, last))
+    v4, v6 = merge_ranges(ranges[4]), merge_ranges(ranges[6])
+    payload = b"".join((
+        pack("I", (first for first, _ in v4)),
+        pack("I", (last for _, last in v4)),
+        b"".join(first.to_bytes(IPV6_SIZE, "big") for first, _ in v6),
+        b"".join(last.to_bytes(IPV6_SIZE, "big") for _, last in v6),
+    ))
+    return KIND_IPSET, len(v4), len(v6), payload, skipped
+
+
+def compile_hostlist(lines):
+    """Данные hostlist и число пропущенных строк"""
+    keys = sorted({reverse_domain(normalize_host(line)).encode("utf-8") for line in lines})
+    offsets = [0]
+    for key in keys:
+        offsets.append(offsets[-1] + len(key))
+    payload = pack("Q", map(prefix_key, keys)) + pack("I", offsets) + b"".join(keys)
+    return KIND_HOSTLIST, len(keys), offsets[-1], payload, 0
+
+
+def guess_kind(path):
+    return "ipset" if os.path.basename(path).lower().startswith("ipset") else "hostlist"
+
+
+def compiled_path(path):
+    base = path[:-len(".txt")] if path.lower().endswith(".txt") else path
+    return base + EXTENSION
+
+
+def compile_file(source, target=None, kind=None):
+    """Компилирует текстовый список; возвращает (путь, записей, пропущено строк)"""
+    kind = kind or guess_kind(source)
+    target = target or compiled_path(source)
+    compiler = compile_ipset if kind == "ipset" else compile_hostlist
+    kind_id, first, second, payload, skipped = compiler(read_lines(source))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, kind_id, zlib.crc32(payload), first, second)
+    atomic_write_bytes(target, header + payload)
+    entries = first + second if kind_id == KIND_IPSET else first
+    return target, entries, skipped
+
+
+class _Records:
+    """Последовательность записей фиксированного размера поверх mmap (для bisect)"""
+
+    def __init__(self, data, start, size, count):
+        self.data = data
+        self.start = start
+        self.size = size
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        # bisect сравнивает записи как bytes; срез mmap копирует только эти 16 байт
+        start = self.start + index * self.size
+        return self.data[start:start + self.size]
+
+
+class _Strings:
+    """Последовательность строк по таблице смещений (для bisect)"""
+
+    def __init__(self, offsets, data, base):
+        self.offsets = offsets
+        self.data = data
+        self.base = base
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return bytes(self.view(index))
+
+    def view(self, index):
+        """Строка без копирования: срез memoryview поверх mmap"""
+        return self.data[self.base + self.offsets[index]:self.base + self.offsets[index + 1]]
+
+
+class CompiledList:
+    """Скомпилированный список, открытый через mmap
+
+    Поиск — двоичный по данным в отображенной памяти; файл не разбирается
+    и не копируется. Открытие почти мгновенное и не расходует память на
+    разобранные записи, но сам поиск не быстрее текста: адрес ищется
+    примерно с той же скоростью, а поиск домена делает двоичный поиск на
+    каждую метку и заметно медленнее множества в памяти.
+    verify=False пропускает проверку CRC32 при открытии.
+    """
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        self._views = []
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path}: не скомпилированный список")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open(verify)
+        except BaseException:
+            self.close()
+            raise
+
+    def _view(self, start, length, fmt=None):
+        view = memoryview(self._mmap)[start:start + length]
+        self._views.append(view)
+        if fmt is None:
+            return view
+        if sys.byteorder == "big":
+            # Данные записаны в little-endian: на big-endian машине нужна копия
+            values = array(fmt, view)
+            values.byteswap()
+            return values
+        cast = view.cast(fmt)
+        self._views.append(cast)
+        return cast
+
+    def _open(self, verify):
+        magic, version, kind, checksum, first, second = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: не скомпилированный список")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: версия формата {version}, поддерживается {FORMAT_VERSION}")
+        if kind not in KINDS.values():
+            raise ValueError(f"{self.path}: неизвестный тип списка {kind}")
+        payload = self._view(HEADER.size, len(self._mmap) - HEADER.size)
+        if verify and zlib.crc32(payload) != checksum:
+            raise ValueError(f"{self.path}: контрольная сумма не совпадает")
+        self.kind = kind
+        self.checksum = checksum
+
+        offset = HEADER.size
+        if kind == KIND_IPSET:
+            expected = first * 8 + second * IPV6_SIZE * 2
+            if len(payload) != expected:
+                raise ValueError(f"{self.path}: размер данных {len(payload)}, ожидалось {expected}")
+            self._v4_starts = self._view(offset, first * 4, "I")
+            self._v4_ends = self._view(offset + first * 4, first * 4, "I")
+            offset += first * 8
+            self._v6_starts = _Records(self._mmap, offset, IPV6_SIZE, second)
+            self._v6_ends = _Records(self._mmap, offset + second * IPV6_SIZE, IPV6_SIZE, second)
+            self.count = first + second
+        else:
+            if len(payload) != first * PREFIX_SIZE + (first + 1) * 4 + second:
+                raise ValueError(f"{self.path}: размер данных не совпадает с заголовком")
+            self._prefixes = self._view(offset, first * PREFIX_SIZE, "Q")
+            offset += first * PREFIX_SIZE
+            offsets = self._view(offset, (first + 1) * 4, "I")
+            self._domains = _Strings(offsets, self._view(0, len(self._mmap)), offset + (first + 1) * 4)
+            self.count = first
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, value):
+        if self.kind == KIND_IPSET:
+            return self._find_range(value) is not None
+        return self._find_domain(value) is not None
+
+    def match(self, value):
+        """Запись списка, которая покрывает value, или None
+
+        ipset: value — адрес или подсеть (строкой или из ipaddress), возвращается
+        диапазон (первый, последний). hostlist: value — домен, возвращается
+        домен списка, который совпадает с ним или является его родителем (как
+        сравнивает winws).
+        """
+        if self.kind == KIND_HOSTLIST:
+            key = self._find_domain(value)
+            return reverse_domain(key.decode("utf-8")) if key is not None else None
+        found = self._find_range(value)
+        if found is None:
+            return None
+        version, index = found
+        if version == 4:
+            return ipaddress.IPv4Address(self._v4_starts[index]), ipaddress.IPv4Address(self._v4_ends[index])
+        return ipaddress.IPv6Address(self._v6_starts[index]), ipaddress.IPv6Address(self._v6_ends[index])
+
+    def _find_range(self, value):
+        """(версия, номер диапазона), который целиком содержит value, или None"""
+        if isinstance(value, str):
+            version, first, last = parse_address(value)
+        elif isinstance(value, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+            version, first, last = value.version, int(value), int(value)
+        else:
+            version, first, last = value.version, int(value.network_address), int(value.broadcast_address)
+        if version == 4:
+            index = bisect.bisect_right(self._v4_starts, first) - 1
+            found = index >= 0 and self._v4_ends[index] >= last
+        else:
+            index = bisect.bisect_right(self._v6_starts, first.to_bytes(IPV6_SIZE, "big")) - 1
+            found = index >= 0 and self._v6_ends[index] >= last.to_bytes(IPV6_SIZE, "big")
+        return (version, index) if found else None
+
+    def _find_domain(self, domain):
+        """Ключ (обратный домен) записи, которая покрывает домен, или None"""
+        labels = normalize_host(domain).split(".")
+        labels.reverse()
+        prefixes = self._prefixes
+        count = self.count
+        # Сначала самый общий родитель: com, com.discord, com.discord.cdn
+        for length in range(1, len(labels) + 1):
+            key = ".".join(labels[:length]).encode("utf-8")
+            prefix = prefix_key(key)
+            low = bisect.bisect_left(prefixes, prefix)
+            # Обычно начало ключа не встречается вовсе: хватает одного двоичного поиска
+            if low == count or prefixes[low] != prefix:
+                continue
+            if low + 1 < count and prefixes[low + 1] == prefix:
+                # Общее начало у нескольких ключей: уточняем по самим строкам
+                high = bisect.bisect_right(prefixes, prefix, low + 1)
+                low = bisect.bisect_left(self._domains, key, low, high)
+                if low == high:
+                    continue
+            if self._domains.view(low) == key:
+                return key
+        return None
+
+    def entries(self):
+        """Строки текстового списка: подсети ipset или домены hostlist"""
+        if self.kind == KIND_HOSTLIST:
+            for index in range(len(self._domains)):
+                yield reverse_domain(self._domains[index].decode("utf-8"))
+            return
+        for index in range(len(self._v4_starts)):
+            first, last = ipaddress.IPv4Address(self._v4_starts[index]), ipaddress.IPv4Address(self._v4_ends[index])
+            for network in ipaddress.summarize_address_range(first, last):
+                yield str(network)
+        for index in range(len(self._v6_starts)):
+            first = ipaddress.IPv6Address(self._v6_starts[index])
+            last = ipaddress.IPv6Address(self._v6_ends[index])
+            for network in ipaddress.summarize_address_range(first, last):
+                yield str(network)
+
+
+def export_text(path, target):
+    """Восстанавливает текстовый список для winws; возвращает число строк"""
+    with CompiledList(path) as compiled:
+        lines = list(compiled.entries())
+    atomic_write_text(target, "".join(f"{line}\n" for line in lines), newline="\r\n")
+    return len(lines)
+
+
+class TextIpset:
+    """Текстовый ipset, разобранный в память: так его читал бы любой скрипт без компиляции"""
+
+    def __init__(self, path):
+        ranges = {4: [], 6: []}
+        for line in read_lines(path):
+            try:
+                version, first, last = parse_ip_entry(line)
+            except ValueError:
+                continue
+            ranges[version].append((first, last))
+        self.ranges = {version: merge_ranges(items) for version, items in ranges.items()}
+        self.starts = {version: [first for first, _ in items] for version, items in self.ranges.items()}
+
+    def __contains__(self, value):
+        version, first, last = parse_address(value)
+        index = bisect.bisect_right(self.starts[version], first) - 1
+        return index >= 0 and self.ranges[version][index][1] >= last
+
+
+class TextHostlist:
+    """Текстовый hostlist, разобранный в множество доменов"""
+
+    def __init__(self, path):
+        self.domains = {normalize_host(line) for line in read_lines(path)}
+
+    def __contains__(self, domain):
+        parts = normalize_host(domain).split(".")
+        return any(".".join(parts[i:]) in self.domains for i in range(len(parts)))
+
+
+def generate_lists(directory, entries, seed=1):
+    """Синтетические ipset и hostlist по entries строк; возвращает пути и примеры записей"""
+    rng = random.Random(seed)
+    ipset_path = os.path.join(directory, "ipset-bench.txt")
+    hostlist_path = os.path.join(directory, "list-bench.txt")
+    addresses, domains = [], []
+    with open(ipset_path, "w", encoding="utf-8", newline="\r\n") as f:
+        for i in range(entries):
+            if i % 20 == 0:
+                network = ipaddress.IPv6Network((rng.getrandbits(48) << 80, 48))
+                f.write(f"{network}\n")
+                continue
+            prefix = rng.choice((16, 20, 22, 24, 24, 24, 28, 32))
+            base = rng.getrandbits(32) >> (32 - prefix) << (32 - prefix)
+            address = socket.inet_ntoa(struct.pack("!I", base))
+            addresses.append(address)
+            f.write(f"{address}/{prefix}\n")
+    letters = "abcdefghijklmnopqrstuvwxyz0123456789"
+    tlds = ("com", "net", "org", "ru", "gg", "io")
+    with open(hostlist_path, "w", encoding="utf-8", newline="\r\n") as f:
+        for _ in range(entries):
+            domain = "".join(rng.choices(letters, k=rng.randint(5, 14))) + "." + rng.choice(tlds)
+            if rng.random() < 0.3:
+                domain = rng.choice(("cdn", "media", "api", "gateway")) + "." + domain
+            domains.append(domain)
+            f.write(f"{domain}\n")
+    return ipset_path, hostlist_path, addresses, domains
+
+
+def queries(rng, known, count, make_miss):
+    """Половина запросов — записи из списка, половина — случайные"""
+    return [rng.choice(known) if i % 2 == 0 else make_miss() for i in range(count)]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def lookups_per_second(container, values):
+    started = time.perf_counter()
+    hits = sum(1 for value in values if value in container)
+    return hits, len(values) / (time.perf_counter() - started)
+
+
+def bench(entries, lookups=100000):
+    """Загрузка и поиск: текст против скомпилированного списка"""
+    with tempfile.TemporaryDirectory(prefix="aether-lists-") as workdir:
+        rng = random.Random(2)
+        (ipset_text, hostlist_text, addresses, domains), generate_ms = timed(generate_lists, workdir, entries)
+        print(f"Сгенерировано по {entries} строк за {generate_ms:.0f} мс")
+
+        ip_queries = queries(rng, addresses, lookups,
+                             lambda: socket.inet_ntoa(struct.pack("!I", rng.getrandbits(32))))
+        domain_queries = queries(rng, domains, lookups,
+                                 lambda: "".join(rng.choices("abcdefghij", k=9)) + ".example")
+        result = {"entries": entries, "lookups": lookups}
+        for kind, text_path, text_class, values in (("ipset", ipset_text, TextIpset, ip_queries),
+                                                    ("hostlist", hostlist_text, TextHostlist, domain_queries)):
+            (target, count, _), compile_ms = timed(compile_file, text_path, None, kind)
+            text_list, text_load_ms = timed(text_class, text_path)
+            compiled, load_ms = timed(CompiledList, target)
+            unverified, unverified_ms = timed(CompiledList, target, False)
+            text_hits, text_rate = lookups_per_second(text_list, values)
+            compiled_hits, compiled_rate = lookups_per_second(compiled, values)
+            assert text_hits == compiled_hits, (kind, text_hits, compiled_hits)
+            compiled.close()
+            unverified.close()
+            result[kind] = {
+                "records": count,
+                "text_bytes": os.path.getsize(text_path),
+                "compiled_bytes": os.path.getsize(target),
+                "compile_ms": round(compile_ms, 1),
+                "text_load_ms": round(text_load_ms, 1),
+                "compiled_load_ms": round(load_ms, 3),
+                "compiled_load_unverified_ms": round(unverified_ms, 3),
+                "text_lookups_per_s": round(text_rate),
+                "compiled_lookups_per_s": round(compiled_rate),
+                "hits": compiled_hits,
+            }
+            del text_list
+        return result
+
+
+def print_bench(result):
+    for kind in ("ipset", "hostlist"):
+        r = result[kind]
+        print(f"{kind}: записей {r['records']}, текст {r['text_bytes'] / 1048576:.1f} МБ, "
+              f"скомпилирован {r['compiled_bytes'] / 1048576:.1f} МБ за {r['compile_ms']:.0f} мс")
+        print(f"  загрузка: текст {r['text_load_ms']:.0f} мс, mmap {r['compiled_load_ms']:.2f} мс "
+              f"(без CRC {r['compiled_load_unverified_ms']:.2f} мс)")
+        print(f"  поиск: текст {r['text_lookups_per_s']:,} в сек, mmap {r['compiled_lookups_per_s']:,} в сек "
+              f"(совпадений {r['hits']} из {result['lookups']})")
+
+
+def selftest():
+    """Компиляция, поиск, экспорт и проверка заголовка на небольших списках"""
+    with tempfile.TemporaryDirectory(prefix="aether-lists-") as workdir:
+        ipset = os.path.join(workdir, "ipset-test.txt")
+        with open(ipset, "w", encoding="utf-8", newline="\r\n") as f:
+            f.write("# Discord\n162.159.128.0/24\n162.159.129.0/24\n10.0.0.5\n10.0.0.6-10.0.0.9\n"
+                    "2606:4700::/32\nnot an address\n\n")
+        target, count, skipped = compile_file(ipset)
+        assert target.endswith("ipset-test.alist") and skipped == 1
+        with CompiledList(target) as compiled:
+            # Соседние подсети и диапазоны объединены
+            assert count == len(compiled) == 3, count
+            assert "162.159.129.77" in compiled and "162.159.128.0/23" in compiled
+            assert "162.159.130.1" not in compiled and "162.159.127.0/23" not in compiled
+            assert "10.0.0.4" not in compiled and "10.0.0.9" in compiled and "10.0.0.10" not in compiled
+            assert "2606:4700:10::6816:1" in compiled and "2606:4701::1" not in compiled
+            assert list(compiled.entries()) == ["10.0.0.5/32", "10.0.0.6/31", "10.0.0.8/31",
+                                                "162.159.128.0/23", "2606:4700::/32"]
+
+        hostlist = os.path.join(workdir, "list-test.txt")
+        with open(hostlist, "w", encoding="utf-8", newline="\r\n") as f:
+            f.write("discord.com\nDiscord.GG.\ncdn.discordapp.com\ndiscord.com\n# комментарий\n")
+        target, count, _ = compile_file(hostlist)
+        with CompiledList(target) as compiled:
+            assert count == len(compiled) == 3
+            assert compiled.match("gateway.discord.gg") == "discord.gg"
+            assert "media.cdn.discordapp.com" in compiled and "discordapp.com" not in compiled
+            assert "notdiscord.com" not in compiled and "com" not in compiled
+            assert sorted(compiled.entries()) == ["cdn.discordapp.com", "discord.com", "discord.gg"]
+
+        exported = os.path.join(workdir, "list-export.txt")
+        assert export_text(target, exported) == 3
+        with open(exported, "rb") as f:
+            assert f.read().count(b"\r\n") == 3
+
+        # Порча данных и чужой формат обнаруживаются при открытии
+        with open(target, "r+b") as f:
+            f.seek(HEADER.size + 5)
+            f.write(b"X")
+        for path, message in ((target, "контрольная сумма"), (hostlist, "не скомпилированный")):
+            try:
+                CompiledList(path).close()
+            except ValueError as e:
+                assert message in str(e), e
+            else:
+                raise AssertionError(path)
+
+        # Настоящие списки из general/lists
+        lists_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "general", "lists")
+        for name, kind in (("list-general.txt", "hostlist"), ("ipset-all.txt.backup", "ipset")):
+            source = os.path.join(lists_dir, name)
+            if not os.path.exists(source):
+                continue
+            target, count, skipped = compile_file(source, os.path.join(workdir, name + EXTENSION), kind)
+            text_list = (TextIpset if kind == "ipset" else TextHostlist)(source)
+            with CompiledList(target) as compiled:
+                probes = list(read_lines(source))[:200]
+                for line in probes:
+                    probe = line.split("/")[0] if kind == "ipset" else line
+                    assert (probe in compiled) == (probe in text_list), probe
+            print(f"{name}: записей {count}, пропущено {skipped}, {os.path.getsize(target)} байт")
+
+        result = bench(20000, lookups=20000)
+        print_bench(result)
+        print("Самопроверка пройдена")
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Скомпилированные списки ipset и hostlist")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser("compile", help="текстовый список в .alist")
+    compile_parser.add_argument("source")
+    compile_parser.add_argument("--output")
+    compile_parser.add_argument("--kind", choices=tuple(KINDS), help="по умолчанию по имени файла")
+
+    export_parser = commands.add_parser("export", help=".alist обратно в текст для winws")
+    export_parser.add_argument("source")
+    export_parser.add_argument("output")
+
+    lookup_parser = commands.add_parser("lookup", help="проверить адреса или домены")
+    lookup_parser.add_argument("source")
+    lookup_parser.add_argument("values", nargs="+")
+
+    bench_parser = commands.add_parser("bench", help="загрузка и поиск: текст против .alist")
+    bench_parser.add_argument("--entries", type=int, default=1000000)
+    bench_parser.add_argument("--lookups", type=int, default=100000)
+    bench_parser.add_argument("--json", action="store_true")
+
+    commands.add_parser("selftest")
+    args = parser.parse_args(argv)
+
+    if args.command == "selftest":
+        return selftest()
+    if args.command == "compile":
+        target, count, skipped = compile_file(args.source, args.output, args.kind)
+        print(f"{target}: записей {count}, пропущено строк {skipped}, {os.path.getsize(target)} байт")
+    elif args.command == "export":
+        print(f"{args.output}: строк {export_text(args.source, args.output)}")
+    elif args.command == "lookup":
+        with CompiledList(args.source) as compiled:
+            for value in args.values:
+                found = compiled.match(value)
+                print(f"{value}: {found if found is not None else 'нет'}")
+    else:
+        result = bench(args.entries, args.lookups)
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            print_bench(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
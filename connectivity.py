@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Проверка доступности Discord и отпечаток сети
+
+Общие для проверки обхода после смены сети (network_monitor, session) и
+поиска стратегий (strategy_search) части: адреса Discord для HTTPS
+запросов, разовая проверка, проба кандидата с winws и отпечаток текущей
+сети. Модуль не зависит от Qt и поиска стратегий.
+"""
+
+import time
+import socket
+import hashlib
+import ipaddress
+import urllib.request
+import psutil
+
+DISCORD_URLS = ("https://discord.com/api/v9/gateway", "https://cdn.discordapp.com/")
+
+
+def check_connectivity(urls=DISCORD_URLS, timeout=5):
+    """True если хотя бы один адрес Discord отвечает по HTTPS"""
+    for url in urls:
+        try:
+            urllib.request.urlopen(url, timeout=timeout).close()
+            return True
+        except Exception:
+            continue
+    return False
+
+
+class ConnectivityProbe:
+    """Проверка на реальной сети: winws с кандидатом и HTTPS запрос
+
+    Процесс winws переиспользуется между попытками одного кандидата.
+    Обход Aether на время поиска должен быть остановлен.
+    """
+
+    DEFAULT_URLS = DISCORD_URLS
+
+    def __init__(self, backend, winws_path, urls=DEFAULT_URLS, timeout=5, settle=1.0):
+        self.backend = backend
+        self.winws_path = winws_path
+        self.urls = urls
+        self.timeout = timeout
+        self.settle = settle
+        self.process = None
+        self.argv = None
+
+    def _ensure(self, strategy):
+        argv = strategy.argv()
+        if self.process is not None and self.argv == argv and self.process.poll() is None:
+            return
+        self.close()
+        self.process = self.backend.spawn_winws(self.winws_path, argv)
+        self.argv = argv
+        time.sleep(self.settle)
+
+    def run(self, strategy, trial):
+        self._ensure(strategy)
+        try:
+            urllib.request.urlopen(self.urls[trial % len(self.urls)], timeout=self.timeout).close()
+            return 1.0
+        except Exception:
+            return 0.0
+
+    def close(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+def network_id():
+    """Отпечаток текущей сети: подсети активных интерфейсов (без loopback)"""
+    stats = psutil.net_if_stats()
+    networks = []
+    for name, addresses in psutil.net_if_addrs().items():
+        if not stats.get(name) or not stats[name].isup:
+            continue
+        for address in addresses:
+            if address.family != socket.AF_INET or not address.netmask:
+                continue
+            interface = ipaddress.ip_interface(f"{address.address}/{address.netmask}")
+            if not interface.is_loopback:
+                networks.append(str(interface.network))
+    return hashlib.sha1(",".join(sorted(networks)).encode("utf-8")).hexdigest()[:12]
@@ -1,15 +1,24 @@
 # -*- coding: utf-8 -*-
 
+import time
+
 from PySide6.QtCore import (Qt, QRect, QPropertyAnimation, QEasingCurve, 
                            QPoint, Signal, QSize, Property, QSettings)
 from PySide6.QtGui import (QPainter, QColor, QBrush, QPen, QPixmap, 
                           QMouseEvent, QPaintEvent, QIcon)
 from PySide6.QtWidgets import (QApplication, QDialog, QFrame, QLabel,
-                              QPushButton, QWidget, QGraphicsDropShadowEffect, QComboBox)
+                              QPushButton, QWidget, QComboBox)
+
+from shadow import shadow_pixmap
+import assets
 
 
 class AnimatedSwitch(QWidget):
-    """Анимированный переключатель с поддержкой перетаскивания"""
+    """Анимированный переключатель с поддержкой перетаскивания
+
+    Иконка рисуется в paintEvent вместе с ползунком, а при движении
+    перерисовывается только объединение старого и нового положения ползунка.
+    """
     toggled = Signal(bool)
     
     def __init__(self, parent=None, width=351, height=121, handle_radius=55):
@@ -37,9 +46,11 @@ class AnimatedSwitch(QWidget):
         self.animation.setEasingCurve(QEasingCurve.Type.InOutCubic)
         
         # Иконка в центре ползунка
-        self.icon_label = QLabel(self)
-        self.icon_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.icon_label.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self._icon_name = None
+        self._icon_pixmap = None
+        
+        # Счетчики отрисовки (для замеров в benchmark.py)
+        self.reset_paint_stats()
         
         # Тема по умолчанию
         self.is_dark_theme = False
@@ -47,10 +58,15 @@ class AnimatedSwitch(QWidget):
         
         self.setMouseTracking(True)
         self.setCursor(Qt.CursorShape.PointingHandCursor)
-        self.update_icon_position()
+    
+    def reset_paint_stats(self):
+        """Сбрасывает счетчики: кадры, суммарная площадь и время отрисовки"""
+        self.paint_stats = {"frames": 0, "area": 0, "time": 0.0}
     
     def set_process_running(self, is_running):
         """Устанавливает статус запущенного процесса (для зеленой иконки)"""
+        if self.is_process_running == is_running:
+            return
         self.is_process_running = is_running
         self.update_icon()
     
@@ -58,37 +74,42 @@ class AnimatedSwitch(QWidget):
         return self._handle_position
     
     def set_handle_position(self, pos):
+        old_rect = self.handle_rect()
         self._handle_position = pos
-        self.update()
-        self.update_icon_position()
+        self.update_icon_position(old_rect)
     
     handle_position = Property(float, get_handle_position, set_handle_position)
     
-    def update_icon_position(self):
-        """Обновляет позицию иконки в центре ползунка"""
-        icon_size = 40
-        x = int(self._handle_position + (self.handle_radius * 2 - icon_size) / 2)
-        y = int((self.height - icon_size) / 2)
-        self.icon_label.setGeometry(x, y, icon_size, icon_size)
+    def handle_rect(self):
+        """Прямоугольник ползунка (с запасом в 1 px на сглаживание)"""
+        handle_y = int((self.height - self.handle_radius * 2) / 2)
+        return QRect(int(self._handle_position), handle_y,
+                     self.handle_radius * 2, self.handle_radius * 2).adjusted(-1, -1, 1, 1)
+    
+    def update_icon_position(self, old_rect=None):
+        """Перерисовывает область ползунка (и его прошлое положение, если передано)"""
+        rect = self.handle_rect()
+        if old_rect is not None:
+            rect = rect.united(old_rect)
+        self.update(rect)
     
     def update_icon(self):
         """Обновляет иконку в зависимости от состояния и темы"""
         # Если процесс запущен - всегда зеленая иконка
         if self.is_process_running:
-            icon_path = "img/logo_main_g.png"
-        elif self._checked:
-            # Переключатель включен, но процесс еще не запущен
-            # Используем белую или черную в зависимости от темы
-            icon_path = "img/logo_main_w.png" if self.is_dark_theme else "img/logo_main_n.png"
+            icon_name = "switch_running"
         else:
-            # Переключатель выключен
-            icon_path = "img/logo_main_w.png" if self.is_dark_theme else "img/logo_main_n.png"
+            # Переключатель выключен или процесс еще не запущен:
+            # белая или черная иконка в зависимости от темы
+            icon_name = assets.themed("switch", self.is_dark_theme)
         
-        pixmap = QPixmap(icon_path)
-        if not pixmap.isNull():
-            scaled_pixmap = pixmap.scaled(40, 40, Qt.AspectRatioMode.KeepAspectRatio, 
-                                         Qt.TransformationMode.SmoothTransformation)
-            self.icon_label.setPixmap(scaled_pixmap)
+        if icon_name == self._icon_name:
+            return
+        self._icon_name = icon_name
+        # Иконки в наборе уже вписаны в 40x40 и декодируются один раз на все окна
+        pixmap = assets.pixmap(icon_name)
+        self._icon_pixmap = None if pixmap.isNull() else pixmap
+        self.update_icon_position()
     
     def set_theme(self, is_dark):
         """Устанавливает тему"""
@@ -97,6 +118,7 @@ class AnimatedSwitch(QWidget):
         self.update()
     
     def paintEvent(self, event):
+        started = time.perf_counter()
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
@@ -115,6 +137,18 @@ class AnimatedSwitch(QWidget):
         handle_y = (self.height - self.handle_radius * 2) / 2
         painter.drawEllipse(int(self._handle_position), int(handle_y),
                         self.handle_radius * 2, self.handle_radius * 2)
+        
+        # Иконка по центру ползунка
+        if self._icon_pixmap is not None:
+            x = int(self._handle_position + (self.handle_radius * 2 - self._icon_pixmap.width()) / 2)
+            y = int((self.height - self._icon_pixmap.height()) / 2)
+            painter.drawPixmap(x, y, self._icon_pixmap)
+        painter.end()
+        
+        rect = event.rect()
+        self.paint_stats["frames"] += 1
+        self.paint_stats["area"] += rect.width() * rect.height()
+        self.paint_stats["time"] += time.perf_counter() - started
     
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -138,9 +172,9 @@ class AnimatedSwitch(QWidget):
             min_pos = self.handle_margin
             max_pos = self.width - self.handle_radius * 2 - self.handle_margin
             
+            old_rect = self.handle_rect()
             self._handle_position = max(min_pos, min(new_pos, max_pos))
-            self.update()
-            self.update_icon_position()
+            self.update_icon_position(old_rect)
 
     def mouseReleaseEvent(self, event):
         if self.is_dragging:
@@ -225,32 +259,13 @@ class SmallSwitch(QWidget):
             painter.setBrush(QBrush(QColor(255, 255, 255)))  # белый в светлой теме
         painter.drawRoundedRect(int(self._handle_position), 0, 30, 30, 15, 15)
         
-        sun_pixmap = QPixmap("img/sun.png")
-        if not sun_pixmap.isNull():
-            scaled_sun = sun_pixmap.scaled(20, 20, Qt.AspectRatioMode.KeepAspectRatio,
-                                          Qt.TransformationMode.SmoothTransformation)
-            # Если темная тема - полупрозрачное, если светлая - полностью видимое
-            if not self.is_dark_theme:
-                painter.setOpacity(1.0)
-            else:
-                painter.setOpacity(0.3)
-            painter.drawPixmap(5, 5, scaled_sun)
+        # Если темная тема - полупрозрачное, если светлая - полностью видимое
+        painter.setOpacity(0.3 if self.is_dark_theme else 1.0)
+        painter.drawPixmap(5, 5, assets.pixmap("sun"))
         
-        # Луна справа (белая при темной теме)
-        painter.setOpacity(1.0)
-        moon_pixmap = QPixmap("img/moon.png")
-        if not moon_pixmap.isNull():
-            scaled_moon = moon_pixmap.scaled(20, 20, Qt.AspectRatioMode.KeepAspectRatio,
-                                            Qt.TransformationMode.SmoothTransformation)
-            # Инвертируем цвета луны для белого цвета в темной теме
-            if self.is_dark_theme:
-                from PySide6.QtGui import QImage
-                img = scaled_moon.toImage()
-                img.invertPixels()
-                scaled_moon = QPixmap.fromImage(img)
-            else:
-                painter.setOpacity(0.3)
-            painter.drawPixmap(35, 5, scaled_moon)
+        # Луна справа: в темной теме — вариант с инвертированными цветами (белая)
+        painter.setOpacity(1.0 if self.is_dark_theme else 0.3)
+        painter.drawPixmap(35, 5, assets.pixmap(assets.themed("moon", self.is_dark_theme)))
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -295,7 +310,7 @@ class CustomWindow(QDialog):
         self.setObjectName("Dialog")
         self.setFixedSize(380, 400)  # Фиксированный размер + отступы для тени
         
-        # Главный контейнер с тенью
+        # Главный контейнер (тень под ним рисует само окно)
         self.main_container = QWidget(self)
         self.main_container.setGeometry(5, 5, 372, 362)
         # Устанавливаем стиль в зависимости от сохраненной темы
@@ -307,12 +322,8 @@ class CustomWindow(QDialog):
             }}
         """)
         
-        # Добавляем эффект тени
-        shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(20)
-        shadow.setColor(QColor(0, 0, 0, 60))
-        shadow.setOffset(0, 5)
-        self.main_container.setGraphicsEffect(shadow)
+        # Тень рисуется окном в paintEvent из готового изображения (см. shadow.py):
+        # QGraphicsDropShadowEffect размывал бы контейнер при каждой перерисовке любого дочернего виджета
         
         # Главный переключатель
         self.main_switch = AnimatedSwitch(self.main_container, 351, 121, 55)
@@ -448,7 +459,7 @@ class CustomWindow(QDialog):
                 background: rgb(142, 142, 142);
             }
         """)
-        self.set_button_icon(self.telegram_button, "img/telegram.png", shift_left=1)
+        self.set_button_icon(self.telegram_button, "telegram", shift_left=1)
         
         # Кнопка GitHub
         self.github_button = QPushButton(self.main_container)
@@ -465,9 +476,7 @@ class CustomWindow(QDialog):
                 background: rgb(142, 142, 142);
             }
         """)
-        self.set_button_icon(self.github_button, "img/github.png")
-        github_icon = QIcon("img/github.png")
-        self.github_button.setIcon(github_icon)
+        self.github_button.setIcon(assets.icon("github"))
         self.github_button.setIconSize(QSize(64, 32))
         self.github_button.setCursor(Qt.PointingHandCursor)
 
@@ -520,42 +529,20 @@ class CustomWindow(QDialog):
             }}
         """)
         
-        # Список bat файлов
-        self.bat_files = [
-            "general (ALT2).bat",
-            "general (ALT3).bat",
-            "general (ALT4).bat",
-            "general (ALT5).bat",
-            "general (ALT6).bat",
-            "general (ALT7).bat",
-            "general (ALT8).bat",
-            "general (FAKE TLS AUTO).bat",
-            "general (FAKE TLS AUTO ALT).bat",
-            "general (FAKE TLS AUTO ALT2).bat",
-            "general (FAKE TLS AUTO ALT3).bat",
-            "general (SIMPLE FAKE).bat",
-            "general (SIMPLE FAKE ALT).bat",
-            "general.bat"
-        ]
-        self.bat_dropdown.addItems(self.bat_files)
+        # Список bat файлов заполняется из найденных стратегий (set_bat_files)
+        self.bat_files = []
         self.selected_bat_file = "general (ALT).bat"  # По умолчанию
         self.bat_dropdown.setCurrentText(self.selected_bat_file)
         self.bat_dropdown.currentTextChanged.connect(self.on_bat_file_changed)
 
     def change_switch_icon(self, checked):
-        icon_path = "img/logo_main_g.png" if checked else "img/logo_main.png"
-        self.main_switch.setIcon(QIcon(icon_path))
-    def set_button_icon(self, button, icon_path, shift_left=0):
-        """Устанавливает иконку и смещает её влево на shift_left пикселей"""
-        pixmap = QPixmap(icon_path)
-        if pixmap.isNull():
-            button.setIcon(QIcon())
-            return
-
-        # Масштабируем иконку до нужного размера (например, 24x24)
+        # Иконку рисует сам переключатель, здесь достаточно обновить ее состояние
+        self.main_switch.update_icon()
+    def set_button_icon(self, button, icon_name, shift_left=0):
+        """Устанавливает иконку из набора и смещает её влево на shift_left пикселей"""
+        # В наборе иконка уже вписана в 28x28
         icon_size = QSize(28, 28)
-        scaled_pixmap = pixmap.scaled(icon_size, Qt.AspectRatioMode.KeepAspectRatio, 
-                                    Qt.TransformationMode.SmoothTransformation)
+        scaled_pixmap = assets.pixmap(icon_name)
 
         button_size = QSize(40, 40)
         shifted_pixmap = QPixmap(button_size)
@@ -574,17 +561,37 @@ class CustomWindow(QDialog):
     
     def update_logo(self):
         """Обновляет логотип в зависимости от темы"""
-        logo_path = "img/logo_w.png" if self.is_dark_theme else "img/logo_n.png"
-        pixmap = QPixmap(logo_path)
-        if not pixmap.isNull():
-            scaled_pixmap = pixmap.scaled(120, 120, Qt.AspectRatioMode.KeepAspectRatio,
-                                         Qt.TransformationMode.SmoothTransformation)
-            self.logo_label.setPixmap(scaled_pixmap)
+        self.logo_label.setPixmap(assets.pixmap(assets.themed("logo", self.is_dark_theme)))
     
     def toggle_bat_dropdown(self):
         """Показывает/скрывает dropdown с bat файлами"""
         self.bat_dropdown.setVisible(not self.bat_dropdown.isVisible())
     
+    def set_bat_files(self, bat_files):
+        """Заполняет dropdown списком bat файлов, сохраняя выбранный"""
+        self.bat_dropdown.blockSignals(True)
+        self.bat_dropdown.clear()
+        self.bat_files = list(bat_files)
+        self.bat_dropdown.addItems(self.bat_files)
+        self.bat_dropdown.setCurrentText(self.selected_bat_file)
+        self.bat_dropdown.blockSignals(False)
+    
+    def insert_bat_file(self, filename, index):
+        """Добавляет bat файл в dropdown (остальные элементы не трогаются)"""
+        if filename in self.bat_files:
+            return
+        index = len(self.bat_files) if index < 0 else min(index, len(self.bat_files))
+        self.bat_files.insert(index, filename)
+        self.bat_dropdown.insertItem(index, filename)
+    
+    def remove_bat_file(self, filename):
+        """Убирает bat файл из dropdown"""
+        if filename not in self.bat_files:
+            return
+        index = self.bat_files.index(filename)
+        self.bat_files.pop(index)
+        self.bat_dropdown.removeItem(index)
+    
     def on_bat_file_changed(self, filename):
         """Обработчик изменения выбранного bat файла"""
         self.selected_bat_file = filename
@@ -712,13 +719,6 @@ class CustomWindow(QDialog):
         self.main_switch.set_theme(is_dark)
         self.theme_switch.set_theme(is_dark)
         self.update_logo()
-
-        self.set_button_icon(self.telegram_button, "img/telegram.png", shift_left=1)
-        self.set_button_icon(self.github_button, "img/github.png")
-        github_icon = QIcon("img/github.png")
-        self.github_button.setIcon(github_icon)
-        self.github_button.setIconSize(QSize(64, 32))
-        self.github_button.setCursor(Qt.PointingHandCursor)
         
         # Изменяем цвет фона
         if is_dark:
@@ -992,6 +992,12 @@ class CustomWindow(QDialog):
                     font-weight: bold;
                 }
             """)
+    def paintEvent(self, event):
+        """Рисует заранее размытую тень под main_container"""
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, shadow_pixmap(self.size(), self.main_container.geometry()))
+        painter.end()
+    
     def mousePressEvent(self, event):
         """Начало перетаскивания окна"""
         if event.button() == Qt.MouseButton.LeftButton:
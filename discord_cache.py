@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""Очистка кэша Discord (Cache, Code Cache, GPUCache всех вариантов клиента)
+
+    python discord_cache.py --max-age-days 7
+    python discord_cache.py --selftest   # синтетическое дерево во временной папке
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from discord_control import DISCORD_VARIANTS
+
+CACHE_SUBDIRS = ("Cache", "Code Cache", "GPUCache")
+
+
+class CacheFile:
+    __slots__ = ("path", "size", "last_used")
+
+    def __init__(self, path, size, last_used):
+        self.path = path
+        self.size = size
+        self.last_used = last_used
+
+
+class CleanReport:
+    """Итог очистки кэша"""
+
+    def __init__(self):
+        self.bytes_before = 0
+        self.files_before = 0
+        self.bytes_removed = 0
+        self.files_removed = 0
+        self.errors = []
+        self.duration = 0.0
+
+    def summary(self):
+        """Строка для уведомления"""
+        text = (f"освобождено {self.bytes_removed / 1024 / 1024:.1f} МБ "
+                f"(файлов {self.files_removed}) за {self.duration * 1000:.0f} мс")
+        if self.errors:
+            text += f", не удалось удалить {len(self.errors)} (Discord запущен?)"
+        return text
+
+    def __repr__(self):
+        return (f"CleanReport(removed={self.bytes_removed / 1024 / 1024:.1f} МБ в {self.files_removed} "
+                f"файлах из {self.bytes_before / 1024 / 1024:.1f} МБ, ошибок: {len(self.errors)}, "
+                f"время: {self.duration * 1000:.0f} мс)")
+
+
+def discord_cache_dirs(appdata=None):
+    """Существующие папки кэша всех вариантов Discord (обычный, PTB, Canary)"""
+    appdata = appdata or os.environ.get("APPDATA") or os.path.expanduser("~/.config")
+    dirs = []
+    for variant in DISCORD_VARIANTS.values():
+        for subdir in CACHE_SUBDIRS:
+            path = os.path.join(appdata, variant, subdir)
+            if os.path.isdir(path):
+                dirs.append(path)
+    return dirs
+
+
+def scan_tree(root):
+    """Обходит дерево через os.scandir, возвращает (файлы, папки снизу вверх)"""
+    files = []
+    dirs = []
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        dirs.append(current)
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            st = entry.stat(follow_symlinks=False)
+                            files.append(CacheFile(entry.path, st.st_size,
+                                                   max(st.st_atime, st.st_mtime)))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    dirs.reverse()
+    return files, dirs
+
+
+def cache_size(dirs):
+    """Суммарный размер и количество файлов в папках кэша"""
+    total = count = 0
+    for root in dirs:
+        files, _ = scan_tree(root)
+        total += sum(f.size for f in files)
+        count += len(files)
+    return total, count
+
+
+def select_victims(files, max_age=None, max_bytes=None, now=None):
+    """Выбирает файлы для удаления
+
+    Без ограничений удаляется все. С max_age удаляются файлы, которые не
+    использовались дольше max_age секунд; с max_bytes — самые давно
+    использованные, пока остаток не уложится в лимит.
+    """
+    if max_age is None and max_bytes is None:
+        return list(files)
+
+    now = time.time() if now is None else now
+    ordered = sorted(files, key=lambda f: f.last_used)
+    victims = []
+    keep = []
+    for f in ordered:
+        if max_age is not None and now - f.last_used > max_age:
+            victims.append(f)
+        else:
+            keep.append(f)
+
+    if max_bytes is not None:
+        remaining = sum(f.size for f in keep)
+        for f in keep:
+            if remaining <= max_bytes:
+                break
+            victims.append(f)
+            remaining -= f.size
+    return victims
+
+
+def _remove_file(cache_file):
+    try:
+        os.remove(cache_file.path)
+        return cache_file, None
+    except FileNotFoundError:
+        return cache_file, None
+    except OSError as e:
+        return None, f"{cache_file.path}: {e}"
+
+
+def clean_cache(dirs=None, max_age=None, max_bytes=None, workers=8, dry_run=False):
+    """Очищает кэш Discord параллельно и возвращает CleanReport
+
+    max_bytes применяется к каждой папке кэша отдельно.
+    """
+    started = time.perf_counter()
+    report = CleanReport()
+    dirs = discord_cache_dirs() if dirs is None else dirs
+    wipe_all = max_age is None and max_bytes is None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for root in dirs:
+            files, subdirs = scan_tree(root)
+            report.bytes_before += sum(f.size for f in files)
+            report.files_before += len(files)
+            victims = select_victims(files, max_age, max_bytes)
+
+            if dry_run:
+                report.bytes_removed += sum(f.size for f in victims)
+                report.files_removed += len(victims)
+                continue
+
+            for removed, error in pool.map(_remove_file, victims):
+                if error:
+                    report.errors.append(error)
+                elif removed is not None:
+                    report.bytes_removed += removed.size
+                    report.files_removed += 1
+
+            if wipe_all:
+                # Папки удаляем снизу вверх, сам корень кэша Discord создаст заново
+                for directory in subdirs:
+                    try:
+                        os.rmdir(directory)
+                    except OSError:
+                        pass
+
+    report.duration = time.perf_counter() - started
+    return report
+
+
+def selftest():
+    """Выбор файлов по возрасту и лимиту размера и полная очистка на синтетическом дереве"""
+    import tempfile
+
+    now = time.time()
+    day = 86400
+    with tempfile.TemporaryDirectory(prefix="aether-discord-cache-") as appdata:
+        # discord/Cache: 10 файлов по 1000 байт, i-й не использовался i дней
+        for variant in DISCORD_VARIANTS.values():
+            for subdir in CACHE_SUBDIRS:
+                os.makedirs(os.path.join(appdata, variant, subdir, "index"))
+        cache = os.path.join(appdata, "discord", "Cache")
+        for i in range(10):
+            path = os.path.join(cache, "index" if i % 2 else "", f"f_{i}")
+            with open(path, "wb") as f:
+                f.write(bytes(1000))
+            os.utime(path, (now - i * day, now - i * day))
+        with open(os.path.join(appdata, "discordcanary", "GPUCache", "data_0"), "wb") as f:
+            f.write(bytes(500))
+        os.makedirs(os.path.join(appdata, "discord", "Local Storage"))
+
+        dirs = discord_cache_dirs(appdata)
+        assert len(dirs) == len(DISCORD_VARIANTS) * len(CACHE_SUBDIRS), dirs
+        assert cache_size(dirs) == (10 * 1000 + 500, 11)
+
+        files, _ = scan_tree(cache)
+        by_age = lambda victims: sorted(int(os.path.basename(f.path)[2:]) for f in victims)
+        assert by_age(select_victims(files, max_age=4.5 * day, now=now)) == [5, 6, 7, 8, 9]
+        # Лимит 3500 байт: остаются 3 самых свежих файла, удаляются самые старые
+        assert by_age(select_victims(files, max_bytes=3500, now=now)) == [3, 4, 5, 6, 7, 8, 9]
+        assert by_age(select_victims(files, max_age=8.5 * day, max_bytes=3500, now=now)) == [3, 4, 5, 6, 7, 8, 9]
+        assert len(select_victims(files)) == 10
+
+        report = clean_cache([cache], max_age=4.5 * day, dry_run=True)
+        assert (report.files_removed, report.bytes_removed, report.files_before) == (5, 5000, 10), report
+        assert cache_size([cache]) == (10000, 10)  # dry_run ничего не удалил
+
+        report = clean_cache([cache], max_bytes=3500)
+        assert (report.files_removed, report.bytes_removed) == (7, 7000), report
+        assert cache_size([cache]) == (3000, 3) and os.path.isdir(cache)
+        print(f"Лимит размера: {report.summary()}")
+
+        report = clean_cache(dirs)
+        assert (report.files_removed, report.bytes_removed, report.errors) == (4, 3500, []), report
+        assert not discord_cache_dirs(appdata)
+        assert os.path.isdir(os.path.join(appdata, "discord", "Local Storage"))
+        print(f"Полная очистка: {report.summary()}")
+    print("Самопроверка пройдена")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Очистка кэша Discord (Cache, Code Cache, GPUCache)")
+    parser.add_argument("--max-age-days", type=float, help="удалять файлы, не использованные N дней")
+    parser.add_argument("--max-mb", type=float, help="оставить не больше N МБ в каждой папке кэша")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать")
+    parser.add_argument("--selftest", action="store_true", help="проверка на синтетическом дереве")
+    args = parser.parse_args(argv)
+
+    if args.selftest:
+        return selftest()
+
+    dirs = discord_cache_dirs()
+    if not dirs:
+        print("Папки кэша Discord не найдены")
+        return 0
+
+    report = clean_cache(
+        dirs,
+        max_age=args.max_age_days * 86400 if args.max_age_days is not None else None,
+        max_bytes=int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None,
+        workers=args.workers,
+        dry_run=args.dry_run
+    )
+    for path in dirs:
+        print(path)
+    print(report)
+    for error in report.errors[:10]:
+        print(f"  {error}")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import psutil
+
+# Варианты клиента Discord: имя процесса -> папка в %APPDATA% / %LOCALAPPDATA%
+DISCORD_VARIANTS = {
+    "discord.exe": "discord",
+    "discordptb.exe": "discordptb",
+    "discordcanary.exe": "discordcanary",
+}
+
+DETACHED_PROCESS = 0x00000008
+
+
+class DiscordInstance:
+    """Запущенный клиент Discord, который нужно вернуть после перезапуска обхода"""
+
+    def __init__(self, name, exe):
+        self.name = name
+        self.exe = exe
+
+    @property
+    def variant(self):
+        return DISCORD_VARIANTS.get(self.name.lower(), self.name)
+
+    def launch_command(self):
+        """Команда запуска: через Update.exe (Squirrel), если он есть рядом
+
+        exe лежит в app-x.y.z, а Update.exe на уровень выше. Запуск через
+        Update.exe переживает обновление клиента, которое меняет app-x.y.z.
+        """
+        app_dir = os.path.dirname(self.exe)
+        update_exe = os.path.join(os.path.dirname(app_dir), "Update.exe")
+        if os.path.exists(update_exe):
+            return [update_exe, "--processStart", os.path.basename(self.exe)]
+        return [self.exe]
+
+    def __repr__(self):
+        return f"DiscordInstance({self.name!r}, {self.exe!r})"
+
+
+def capture_discord_instances():
+    """Запоминает какие варианты Discord запущены и откуда (до их завершения)"""
+    instances = {}
+    for proc in psutil.process_iter(["name", "exe"]):
+        try:
+            name = proc.info["name"] or ""
+            exe = proc.info["exe"]
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        if name.lower() in DISCORD_VARIANTS and exe:
+            # У Discord много процессов с одним exe — нужен один запуск на вариант
+            instances.setdefault(os.path.normcase(exe), DiscordInstance(name, exe))
+    return list(instances.values())
+
+
+def discord_processes():
+    """Запущенные процессы всех вариантов Discord"""
+    found = []
+    for proc in psutil.process_iter(["name"]):
+        try:
+            if (proc.info["name"] or "").lower() in DISCORD_VARIANTS:
+                found.append(proc)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return found
+
+
+def relaunch_discord(instances):
+    """Запускает сохраненные клиенты Discord отдельно от Aether"""
+    launched = []
+    for instance in instances:
+        command = instance.launch_command()
+        try:
+            subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                creationflags=DETACHED_PROCESS if os.name == "nt" else 0,
+                close_fds=True,
+                cwd=os.path.dirname(instance.exe)
+            )
+            launched.append(instance)
+            print(f"Discord перезапущен: {instance.variant} ({command[0]})")
+        except Exception as e:
+            print(f"Не удалось запустить {instance.exe}: {e}")
+    return launched
@@ -0,0 +1,819 @@
+# -*- coding: utf-8 -*-
+"""Фейковые пакеты для --dpi-desync-fake-tls и --dpi-desync-fake-quic
+
+winws отправляет фейк перед настоящим ClientHello --dpi-desync-repeats раз
+на каждое новое соединение, так что байты в сети растут вместе с размером
+файла. Модуль разбирает фейки (TLS ClientHello и QUIC Initial — последний
+расшифровывается открытыми ключами Initial из RFC 9001), строит варианты с
+другим SNI или минимального размера и хранит их в библиотеке
+general/bin/payloads с номерами ревизий: измененный фейк получает новый
+файл, старые остаются на месте для уже запущенных стратегий.
+
+Для QUIC нужны AES-128 и AES-GCM; чтобы не добавлять зависимость, они
+реализованы здесь же (пакет Initial — один блок данных на соединение).
+
+    python fake_payload.py info general/bin/quic_initial_www_google_com.bin
+    python fake_payload.py generate tls --minimal
+    python fake_payload.py generate quic --sni www.example.com
+    python fake_payload.py report
+    python fake_payload.py selftest
+"""
+
+import os
+import sys
+import hmac
+import hashlib
+import argparse
+
+from strategy import Strategy, Section, split_option
+from storage import load_json, atomic_write_json, atomic_write_bytes
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "general", "bin")
+LIBRARY_DIR = os.path.join(BIN_DIR, "payloads")
+LIBRARY_VERSION = 1
+
+TEMPLATES = {
+    "tls": os.path.join(BIN_DIR, "tls_clienthello_www_google_com.bin"),
+    "quic": os.path.join(BIN_DIR, "quic_initial_www_google_com.bin"),
+}
+FAKE_OPTIONS = {"tls": "--dpi-desync-fake-tls", "quic": "--dpi-desync-fake-quic"}
+
+# Заголовки вокруг фейка: IPv4 + TCP с метками времени (Aether их включает), IPv4 + UDP
+WIRE_OVERHEAD = {"tls": 20 + 20 + 12, "quic": 20 + 8}
+
+# Клиентская датаграмма с Initial должна быть не меньше 1200 байт (RFC 9000, 14.1)
+QUIC_MIN_DATAGRAM = 1200
+QUIC_V1 = 0x00000001
+QUIC_V1_SALT = bytes.fromhex("38762cf7f55934b34d179ae6a4c80cadccbb7f0a")
+TAG_SIZE = 16
+
+EXT_SERVER_NAME = 0
+EXT_ALPN = 16
+EXT_PADDING = 21
+EXT_QUIC_TRANSPORT_PARAMETERS = 0x39
+
+EXTENSION_NAMES = {
+    0: "server_name", 5: "status_request", 10: "supported_groups", 11: "ec_point_formats",
+    13: "signature_algorithms", 16: "alpn", 17: "status_request_v2", 18: "signed_certificate_timestamp",
+    21: "padding", 23: "extended_master_secret", 27: "compress_certificate", 28: "record_size_limit",
+    34: "delegated_credentials", 35: "session_ticket", 41: "pre_shared_key", 43: "supported_versions",
+    45: "psk_key_exchange_modes", 51: "key_share", 57: "quic_transport_parameters",
+    17513: "application_settings", 17613: "application_settings_new", 65037: "encrypted_client_hello",
+    65281: "renegotiation_info",
+}
+
+
+def extension_name(ext_type):
+    # GREASE (RFC 8701): 0x0a0a, 0x1a1a, ... 0xfafa
+    if ext_type & 0x0f0f == 0x0a0a and ext_type >> 8 == ext_type & 0xff:
+        return "grease"
+    return EXTENSION_NAMES.get(ext_type, f"0x{ext_type:04x}")
+
+
+class _Reader:
+    """Последовательное чтение полей с проверкой длины"""
+
+    def __init__(self, data, offset=0, end=None):
+        self.data = data
+        self.offset = offset
+        self.end = len(data) if end is None else end
+
+    def take(self, size):
+        if self.offset + size > self.end:
+            raise ValueError(f"данные обрываются на смещении {self.offset}")
+        chunk = bytes(self.data[self.offset:self.offset + size])
+        self.offset += size
+        return chunk
+
+    def uint(self, size):
+        return int.from_bytes(self.take(size), "big")
+
+    def vector(self, length_size):
+        return self.take(self.uint(length_size))
+
+    def varint(self):
+        first = self.uint(1)
+        size = 1 << (first >> 6)
+        value = first & 0x3f
+        for byte in self.take(size - 1):
+            value = (value << 8) | byte
+        return value
+
+    def remaining(self):
+        return self.end - self.offset
+
+
+def encode_varint(value):
+    for size, marker in ((1, 0x00), (2, 0x40), (4, 0x80), (8, 0xc0)):
+        if value < 1 << (size * 8 - 2):
+            return (value | marker << (size * 8 - 8)).to_bytes(size, "big")
+    raise ValueError(f"слишком большое число: {value}")
+
+
+def vector(data, length_size):
+    return len(data).to_bytes(length_size, "big") + data
+
+
+# --- TLS ClientHello ---
+
+class ClientHello:
+    """Разобранный ClientHello; record_version — версия записи TLS (None — без записи, как в QUIC)"""
+
+    def __init__(self, version, random, session_id, cipher_suites, compression, extensions,
+                 record_version=None):
+        self.version = version
+        self.random = random
+        self.session_id = session_id
+        self.cipher_suites = list(cipher_suites)
+        self.compression = compression
+        self.extensions = [(ext_type, data) for ext_type, data in extensions]
+        self.record_version = record_version
+
+    @classmethod
+    def parse(cls, data):
+        reader = _Reader(data)
+        record_version = None
+        if data[:1] == b"\x16":
+            reader.take(1)
+            record_version = reader.uint(2)
+            reader.end = min(reader.end, reader.offset + 2 + int.from_bytes(data[3:5], "big"))
+            reader.take(2)
+        if reader.uint(1) != 1:
+            raise ValueError("это не ClientHello")
+        length = reader.uint(3)
+        reader = _Reader(data, reader.offset, reader.offset + length)
+        version = reader.uint(2)
+        random = reader.take(32)
+        session_id = reader.vector(1)
+        suites = reader.vector(2)
+        cipher_suites = [int.from_bytes(suites[i:i + 2], "big") for i in range(0, len(suites), 2)]
+        compression = reader.vector(1)
+        extensions = []
+        if reader.remaining():
+            ext_reader = _Reader(reader.vector(2))
+            while ext_reader.remaining():
+                ext_type = ext_reader.uint(2)
+                extensions.append((ext_type, ext_reader.vector(2)))
+        return cls(version, random, session_id, cipher_suites, compression, extensions, record_version)
+
+    def extension(self, ext_type):
+        return next((data for t, data in self.extensions if t == ext_type), None)
+
+    @property
+    def sni(self):
+        data = self.extension(EXT_SERVER_NAME)
+        if not data:
+            return None
+        reader = _Reader(_Reader(data).vector(2))
+        while reader.remaining():
+            name_type, name = reader.uint(1), reader.vector(2)
+            if name_type == 0:
+                return name.decode("ascii", errors="replace")
+        return None
+
+    @property
+    def alpn(self):
+        data = self.extension(EXT_ALPN)
+        if not data:
+            return []
+        reader = _Reader(_Reader(data).vector(2))
+        protocols = []
+        while reader.remaining():
+            protocols.append(reader.vector(1).decode("ascii", errors="replace"))
+        return protocols
+
+    def handshake(self):
+        """Сообщение Handshake без записи TLS"""
+        extensions = b"".join(t.to_bytes(2, "big") + vector(data, 2) for t, data in self.extensions)
+        body = b"".join((
+            self.version.to_bytes(2, "big"),
+            self.random,
+            vector(self.session_id, 1),
+            vector(b"".join(s.to_bytes(2, "big") for s in self.cipher_suites), 2),
+            vector(self.compression, 1),
+            vector(extensions, 2) if self.extensions else b"",
+        ))
+        return b"\x01" + vector(body, 3)
+
+    def to_bytes(self):
+        handshake = self.handshake()
+        if self.record_version is None:
+            return handshake
+        return b"\x16" + self.record_version.to_bytes(2, "big") + vector(handshake, 2)
+
+    def with_sni(self, name, keep_size=True):
+        """Копия с другим SNI; keep_size подгоняет расширение padding, чтобы размер не менялся"""
+        old = self.extension(EXT_SERVER_NAME) or b""
+        new = server_name_extension(name)
+        delta = len(new) - len(old) + (0 if old else 4)
+        extensions = []
+        for ext_type, data in self.extensions:
+            if ext_type == EXT_SERVER_NAME:
+                data = new
+            elif ext_type == EXT_PADDING and keep_size and len(data) >= delta:
+                data = bytes(len(data) - delta)
+            extensions.append((ext_type, data))
+        if not old:
+            extensions.insert(0, (EXT_SERVER_NAME, new))
+        return ClientHello(self.version, self.random, self.session_id, self.cipher_suites,
+                           self.compression, extensions, self.record_version)
+
+    def describe(self):
+        return {
+            "size": len(self.to_bytes()),
+            "record": f"0x{self.record_version:04x}" if self.record_version is not None else None,
+            "version": f"0x{self.version:04x}",
+            "session_id": len(self.session_id),
+            "cipher_suites": len(self.cipher_suites),
+            "sni": self.sni,
+            "alpn": self.alpn,
+            "extensions": [[extension_name(t), len(data)] for t, data in self.extensions],
+        }
+
+
+def server_name_extension(name):
+    return vector(b"\x00" + vector(name.encode("ascii"), 2), 2)
+
+
+def minimal_client_hello(sni, alpn=(), quic_transport_parameters=None, record=True):
+    """Самый короткий корректный ClientHello TLS 1.3 с этим SNI
+
+    Поля, которые должны выглядеть случайными (random, ключ x25519), берутся
+    из хэша SNI: тот же SNI дает тот же файл, и ревизия в библиотеке не растет.
+    """
+    random = hashlib.sha256(b"aether-fake-random:" + sni.encode("ascii")).digest()
+    key_share = hashlib.sha256(b"aether-fake-x25519:" + sni.encode("ascii")).digest()
+    extensions = [
+        (EXT_SERVER_NAME, server_name_extension(sni)),
+        (10, vector(b"\x00\x1d", 2)),                                   # supported_groups: x25519
+        (13, vector(bytes.fromhex("040308040401"), 2)),                 # ecdsa_p256, rsa_pss, rsa_pkcs1
+        (43, vector(b"\x03\x04", 1)),                                   # supported_versions: TLS 1.3
+        (51, vector(b"\x00\x1d" + vector(key_share, 2), 2)),            # key_share: x25519
+    ]
+    if alpn:
+        extensions.append((EXT_ALPN, vector(b"".join(vector(p.encode("ascii"), 1) for p in alpn), 2)))
+    if quic_transport_parameters is not None:
+        extensions.append((EXT_QUIC_TRANSPORT_PARAMETERS, quic_transport_parameters))
+    return ClientHello(0x0303, random, b"", [0x1301, 0x1302, 0x1303], b"\x00", extensions,
+                       0x0301 if record else None)
+
+
+# --- AES-128, AES-GCM и HKDF для защиты пакетов QUIC Initial ---
+
+def _xtime(value):
+    value <<= 1
+    return (value ^ 0x11b) if value & 0x100 else value
+
+
+def _build_sbox():
+    sbox = [0] * 256
+    p = q = 1
+    while True:
+        # p умножается на 3, q делится на 3 в GF(2^8): q — обратный к p
+        p = p ^ _xtime(p)
+        q ^= (q << 1) & 0xff
+        q ^= (q << 2) & 0xff
+        q ^= (q << 4) & 0xff
+        if q & 0x80:
+            q ^= 0x09
+        rotl = lambda x, n: ((x << n) | (x >> (8 - n))) & 0xff
+        sbox[p] = q ^ rotl(q, 1) ^ rotl(q, 2) ^ rotl(q, 3) ^ rotl(q, 4) ^ 0x63
+        if p == 1:
+            break
+    sbox[0] = 0x63
+    return sbox
+
+
+SBOX = _build_sbox()
+XTIME = [_xtime(i) for i in range(256)]
+# Номер байта состояния после ShiftRows (состояние хранится по столбцам)
+SHIFT_ROWS = [(i + 4 * (i % 4)) % 16 for i in range(16)]
+
+
+class Aes128:
+    """Шифрование блоков AES-128 (расшифрование для GCM и защиты заголовка не нужно)"""
+
+    def __init__(self, key):
+        if len(key) != 16:
+            raise ValueError("ключ AES-128 должен быть 16 байт")
+        words = list(key)
+        rcon = 1
+        for i in range(16, 176, 4):
+            temp = words[i - 4:i]
+            if i % 16 == 0:
+                temp = [SBOX[temp[1]] ^ rcon, SBOX[temp[2]], SBOX[temp[3]], SBOX[temp[0]]]
+                rcon = XTIME[rcon]
+            words.extend(words[i - 16 + j] ^ temp[j] for j in range(4))
+        self.round_keys = [words[r * 16:(r + 1) * 16] for r in range(11)]
+
+    def encrypt_block(self, block):
+        state = [b ^ k for b, k in zip(block, self.round_keys[0])]
+        for round_number in range(1, 11):
+            state = [SBOX[state[i]] for i in SHIFT_ROWS]
+            if round_number != 10:
+                mixed = []
+                for c in range(0, 16, 4):
+                    a0, a1, a2, a3 = state[c:c + 4]
+                    total = a0 ^ a1 ^ a2 ^ a3
+                    mixed += [a0 ^ total ^ XTIME[a0 ^ a1], a1 ^ total ^ XTIME[a1 ^ a2],
+                              a2 ^ total ^ XTIME[a2 ^ a3], a3 ^ total ^ XTIME[a3 ^ a0]]
+                state = mixed
+            state = [b ^ k for b, k in zip(state, self.round_keys[round_number])]
+        return bytes(state)
+
+
+def _gf_multiply(x, y):
+    """Умножение в GF(2^128) с порядком бит GCM"""
+    result = 0
+    for i in range(127, -1, -1):
+        if (x >> i) & 1:
+            result ^= y
+        y = (y >> 1) ^ (0xe1 << 120) if y & 1 else y >> 1
+    return result
+
+
+def _ghash(h, aad, ciphertext):
+    y = 0
+    for data in (aad, ciphertext):
+        for i in range(0, len(data), 16):
+            y = _gf_multiply(y ^ int.from_bytes(data[i:i + 16].ljust(16, b"\x00"), "big"), h)
+    lengths = (len(aad) * 8).to_bytes(8, "big") + (len(ciphertext) * 8).to_bytes(8, "big")
+    return _gf_multiply(y ^ int.from_bytes(lengths, "big"), h)
+
+
+def _gcm(key, nonce, data, aad):
+    """(шифротекст/открытый текст, тег) для 12-байтного nonce"""
+    aes = Aes128(key)
+    h = int.from_bytes(aes.encrypt_block(bytes(16)), "big")
+    output = bytearray()
+    for index in range(0, len(data), 16):
+        stream = aes.encrypt_block(nonce + (index // 16 + 2).to_bytes(4, "big"))
+        output += bytes(a ^ b for a, b in zip(data[index:index + 16], stream))
+    return bytes(output), aes, h
+
+
+def aes_gcm_encrypt(key, nonce, plaintext, aad):
+    ciphertext, aes, h = _gcm(key, nonce, plaintext, aad)
+    tag = int.from_bytes(aes.encrypt_block(nonce + b"\x00\x00\x00\x01"), "big") ^ _ghash(h, aad, ciphertext)
+    return ciphertext + tag.to_bytes(16, "big")
+
+
+def aes_gcm_decrypt(key, nonce, data, aad):
+    ciphertext, tag = data[:-TAG_SIZE], data[-TAG_SIZE:]
+    plaintext, aes, h = _gcm(key, nonce, ciphertext, aad)
+    expected = int.from_bytes(aes.encrypt_block(nonce + b"\x00\x00\x00\x01"), "big") ^ _ghash(h, aad, ciphertext)
+    if not hmac.compare_digest(expected.to_bytes(16, "big"), tag):
+        raise ValueError("тег AES-GCM не совпадает")
+    return plaintext
+
+
+def hkdf_expand_label(secret, label, length):
+    info = length.to_bytes(2, "big") + vector(b"tls13 " + label.encode("ascii"), 1) + b"\x00"
+    output, block = b"", b""
+    counter = 1
+    while len(output) < length:
+        block = hmac.new(secret, block + info + bytes([counter]), hashlib.sha256).digest()
+        output += block
+        counter += 1
+    return output[:length]
+
+
+def initial_keys(dcid):
+    """(key, iv, hp) клиента для пакетов Initial QUIC v1 (RFC 9001, 5.2)"""
+    initial_secret = hmac.new(QUIC_V1_SALT, dcid, hashlib.sha256).digest()
+    client_secret = hkdf_expand_label(initial_secret, "client in", 32)
+    return (hkdf_expand_label(client_secret, "quic key", 16),
+            hkdf_expand_label(client_secret, "quic iv", 12),
+            hkdf_expand_label(client_secret, "quic hp", 16))
+
+
+# --- QUIC Initial ---
+
+class QuicInitial:
+    """Расшифрованный клиентский пакет Initial и ClientHello из его фреймов CRYPTO"""
+
+    def __init__(self, dcid, scid, token, packet_number, pn_length, client_hello, size,
+                 crypto_frames=1, padding=0, ping=0, trailing=0):
+        self.dcid = dcid
+        self.scid = scid
+        self.token = token
+        self.packet_number = packet_number
+        self.pn_length = pn_length
+        self.client_hello = client_hello
+        self.size = size
+        self.crypto_frames = crypto_frames
+        self.padding = padding
+        self.ping = ping
+        self.trailing = trailing
+
+    @classmethod
+    def parse(cls, data):
+        reader = _Reader(data)
+        first = reader.uint(1)
+        if not first & 0x80 or (first >> 4) & 0x03 != 0:
+            raise ValueError("это не пакет Initial с длинным заголовком")
+        version = reader.uint(4)
+        if version != QUIC_V1:
+            raise ValueError(f"поддерживается только QUIC v1, а не 0x{version:08x}")
+        dcid = reader.vector(1)
+        scid = reader.vector(1)
+        token = reader.take(reader.varint())
+        length = reader.varint()
+        pn_offset = reader.offset
+        if pn_offset + length > len(data) or pn_offset + 4 + 16 > len(data):
+            raise ValueError("пакет короче поля Length")
+
+        key, iv, hp = initial_keys(dcid)
+        mask = Aes128(hp).encrypt_block(data[pn_offset + 4:pn_offset + 20])
+        first ^= mask[0] & 0x0f
+        pn_length = (first & 0x03) + 1
+        pn_bytes = bytes(b ^ m for b, m in zip(data[pn_offset:pn_offset + pn_length], mask[1:]))
+        packet_number = int.from_bytes(pn_bytes, "big")
+        header = bytes([first]) + bytes(data[1:pn_offset]) + pn_bytes
+        nonce = (int.from_bytes(iv, "big") ^ packet_number).to_bytes(12, "big")
+        payload = aes_gcm_decrypt(key, nonce, bytes(data[pn_offset + pn_length:pn_offset + length]), header)
+
+        # Фреймы: CRYPTO может идти кусками и не по порядку, их собираем по смещениям
+        chunks, padding, ping = {}, 0, 0
+        frames = _Reader(payload)
+        while frames.remaining():
+            frame_type = frames.varint()
+            if frame_type == 0x00:
+                padding += 1
+            elif frame_type == 0x01:
+                ping += 1
+            elif frame_type == 0x06:
+                offset = frames.varint()
+                chunks[offset] = frames.take(frames.varint())
+            else:
+                raise ValueError(f"неожиданный фрейм 0x{frame_type:02x} в Initial")
+        crypto = b""
+        for offset in sorted(chunks):
+            if offset > len(crypto):
+                raise ValueError("ClientHello не целиком в этом пакете")
+            crypto = crypto[:offset] + chunks[offset] + crypto[offset + len(chunks[offset]):]
+        return cls(dcid, scid, token, packet_number, pn_length, ClientHello.parse(crypto), len(data),
+                   len(chunks), padding, ping, len(data) - pn_offset - length)
+
+    def describe(self):
+        return {
+            "size": self.size,
+            "dcid": self.dcid.hex(),
+            "scid": self.scid.hex(),
+            "token": len(self.token),
+            "packet_number": self.packet_number,
+            "crypto_frames": self.crypto_frames,
+            "padding": self.padding,
+            "ping": self.ping,
+            "trailing": self.trailing,
+            "client_hello": self.client_hello.describe(),
+        }
+
+
+def build_quic_initial(client_hello, dcid, scid=b"", packet_number=0, pn_length=2, pad_to=QUIC_MIN_DATAGRAM):
+    """Защищенный пакет Initial с ClientHello в одном фрейме CRYPTO, дополненный до pad_to"""
+    handshake = client_hello.handshake()
+    frames = b"\x06" + encode_varint(0) + encode_varint(len(handshake)) + handshake
+    # Для маски заголовка нужно 16 байт шифротекста начиная с 4-го байта номера пакета
+    frames += bytes(max(0, 4 - pn_length - len(frames)))
+    header = (bytes([0xc0 | (pn_length - 1)]) + QUIC_V1.to_bytes(4, "big") + vector(dcid, 1) +
+              vector(scid, 1) + encode_varint(0))
+    size = len(header) + 2 + pn_length + len(frames) + TAG_SIZE
+    if pad_to:
+        frames += bytes(max(0, pad_to - size))
+    length = pn_length + len(frames) + TAG_SIZE
+    if length >= 1 << 14:
+        raise ValueError("ClientHello не помещается в один пакет")
+    header += (0x4000 | length).to_bytes(2, "big") + packet_number.to_bytes(pn_length, "big")
+
+    key, iv, hp = initial_keys(dcid)
+    nonce = (int.from_bytes(iv, "big") ^ packet_number).to_bytes(12, "big")
+    packet = bytearray(header + aes_gcm_encrypt(key, nonce, frames, header))
+    pn_offset = len(header) - pn_length
+    mask = Aes128(hp).encrypt_block(bytes(packet[pn_offset + 4:pn_offset + 20]))
+    packet[0] ^= mask[0] & 0x0f
+    for i in range(pn_length):
+        packet[pn_offset + i] ^= mask[1 + i]
+    return bytes(packet)
+
+
+# --- Разбор файла, варианты, библиотека ---
+
+def detect_kind(data):
+    if data[:1] in (b"\x16", b"\x01"):
+        return "tls"
+    if data[:1] and data[0] & 0xc0 == 0xc0:
+        return "quic"
+    raise ValueError("не похоже ни на TLS ClientHello, ни на QUIC Initial")
+
+
+def parse_payload(data, kind=None):
+    """ClientHello (tls) или QuicInitial (quic)"""
+    kind = kind or detect_kind(data)
+    return ClientHello.parse(data) if kind == "tls" else QuicInitial.parse(data)
+
+
+def make_variant(kind, template, sni=None, minimal=False, pad=True):
+    """Байты нового фейка на основе разобранного шаблона
+
+    minimal — самый короткий ClientHello TLS 1.3 (для QUIC сохраняются ALPN и
+    транспортные параметры шаблона). pad=False не дополняет QUIC Initial до
+    1200 байт: так фейк короче, но настоящие клиенты такие пакеты не шлют.
+    """
+    hello = template if kind == "tls" else template.client_hello
+    sni = sni or hello.sni
+    if minimal:
+        hello = minimal_client_hello(
+            sni, alpn=hello.alpn if kind == "quic" else (),
+            quic_transport_parameters=hello.extension(EXT_QUIC_TRANSPORT_PARAMETERS) if kind == "quic" else None,
+            record=kind == "tls")
+    elif sni != hello.sni:
+        hello = hello.with_sni(sni)
+    if kind == "tls":
+        return hello.to_bytes()
+    # Новый DCID выводится из SNI, чтобы повторная генерация давала тот же файл
+    dcid = hashlib.sha256(b"aether-fake-dcid:" + sni.encode("ascii")).digest()[:len(template.dcid) or 8]
+    return build_quic_initial(hello, dcid, template.scid, pad_to=QUIC_MIN_DATAGRAM if pad else None)
+
+
+def variant_name(kind, sni, minimal, pad=True):
+    name = f"{kind}_{sni.replace('.', '_')}"
+    if minimal:
+        name += "_minimal"
+    if kind == "quic" and not pad:
+        name += "_unpadded"
+    return name
+
+
+class PayloadLibrary:
+    """Версионированные фейки в general/bin/payloads и их описание в payloads.json"""
+
+    def __init__(self, directory=LIBRARY_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "payloads.json")
+        data = load_json(self.manifest_path)
+        self.entries = data.get("payloads", {}) if isinstance(data, dict) and data.get("version") == LIBRARY_VERSION else {}
+
+    def path(self, name):
+        """Файл последней ревизии фейка или None"""
+        entry = self.entries.get(name)
+        return os.path.join(self.directory, entry["file"]) if entry else None
+
+    def add(self, name, kind, data, **details):
+        """Сохраняет фейк; новая ревизия создается только если содержимое изменилось"""
+        digest = hashlib.sha256(data).hexdigest()
+        entry = self.entries.get(name)
+        if entry and entry["sha256"] == digest and os.path.exists(self.path(name)):
+            return entry, False
+        revision = entry["revision"] + 1 if entry else 1
+        entry = {"kind": kind, "revision": revision, "file": f"{name}_v{revision}.bin",
+                 "size": len(data), "sha256": digest, **details}
+        atomic_write_bytes(os.path.join(self.directory, entry["file"]), data)
+        self.entries[name] = entry
+        atomic_write_json(self.manifest_path, {"version": LIBRARY_VERSION, "payloads": self.entries})
+        return entry, True
+
+
+def is_payload_file(value):
+    return bool(value) and not value.startswith(("0x", "!")) and os.path.isfile(value)
+
+
+def apply_payloads(strategy, payloads):
+    """Стратегия, в которой фейки-файлы заменены файлами payloads {"tls"/"quic": путь}
+
+    Встроенные фейки winws (0x..., !) не трогаются.
+    """
+    options = {FAKE_OPTIONS[kind]: path for kind, path in payloads.items() if path}
+    changed = False
+    sections = []
+    for section in strategy.sections:
+        args = []
+        for arg in section.args:
+            name, value = split_option(arg)
+            if name in options and is_payload_file(value):
+                arg = f"{name}={options[name]}"
+                changed = True
+            args.append(arg)
+        sections.append(Section(section.index, args))
+    if not changed:
+        return strategy
+    return Strategy(strategy.name, strategy.global_args, sections, path=strategy.path)
+
+
+def load_payloads(settings, library=None):
+    """Фейки из библиотеки по настройкам payload/tls и payload/quic: {вид: путь}"""
+    library = library or PayloadLibrary()
+    payloads = {}
+    for kind in FAKE_OPTIONS:
+        name = settings.value(f"payload/{kind}", "", type=str)
+        if not name:
+            continue
+        path = library.path(name)
+        if path is None or not os.path.exists(path):
+            print(f"Фейк {name} не найден в библиотеке, используется фейк из bat файла")
+            continue
+        payloads[kind] = path
+    return payloads
+
+
+def fake_sends(strategy):
+    """[(вид, путь, повторов)] — фейки-файлы, которые стратегия шлет на новое соединение"""
+    sends = []
+    for section in strategy.sections:
+        modes = (section.option("--dpi-desync") or "").split(",")
+        if "fake" not in modes:
+            continue
+        repeats = int(section.option("--dpi-desync-repeats", "1"))
+        for kind, option in FAKE_OPTIONS.items():
+            for value in section.options(option):
+                if is_payload_file(value):
+                    sends.append((kind, value, repeats))
+    return sends
+
+
+def wire_bytes(strategy, sizes=None):
+    """Байты фейков в сети на одно соединение по видам; sizes заменяет размеры файлов {вид: байт}"""
+    result = {kind: 0 for kind in FAKE_OPTIONS}
+    for kind, path, repeats in fake_sends(strategy):
+        size = (sizes or {}).get(kind) or os.path.getsize(path)
+        # Секции одного протокола взаимоисключающие: соединение попадает в первую подходящую
+        result[kind] = max(result[kind], repeats * (size + WIRE_OVERHEAD[kind]))
+    return result
+
+
+def report(registry, variants):
+    """Строки таблицы: стратегия, байты TLS и QUIC на соединение для исходных фейков и вариантов"""
+    rows = []
+    for name in registry.names():
+        strategy = registry.strategy(name, "12")
+        row = {"strategy": name, "current": wire_bytes(strategy)}
+        for label, sizes in variants.items():
+            row[label] = wire_bytes(strategy, sizes)
+        rows.append(row)
+    return rows
+
+
+def describe(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    kind = detect_kind(data)
+    return kind, parse_payload(data, kind).describe()
+
+
+def print_description(path, kind, info):
+    hello = info["client_hello"] if kind == "quic" else info
+    print(f"{os.path.basename(path)}: {kind}, {info['size']} байт")
+    if kind == "quic":
+        print(f"  Initial: DCID {info['dcid']}, SCID {info['scid'] or '-'}, номер пакета {info['packet_number']}, "
+              f"фреймов CRYPTO {info['crypto_frames']}, PADDING {info['padding']} байт, PING {info['ping']}")
+    print(f"  ClientHello: {hello['size']} байт, версия {hello['version']}, SNI {hello['sni']}, "
+          f"ALPN {','.join(hello['alpn']) or '-'}, шифров {hello['cipher_suites']}, session_id {hello['session_id']}")
+    print("  Расширения: " + ", ".join(f"{name} ({size})" for name, size in hello["extensions"]))
+
+
+def selftest():
+    """Векторы AES/GCM/RFC 9001, разбор фейков из general/bin, варианты и байты в сети"""
+    import tempfile
+    from strategy_registry import StrategyRegistry
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+    # FIPS-197 C.1 и тестовые векторы GCM (McGrew, Viega: случаи 1 и 2)
+    assert Aes128(bytes(range(16))).encrypt_block(bytes.fromhex("00112233445566778899aabbccddeeff")).hex() \
+        == "69c4e0d86a7b0430d8cdb78070b4c55a"
+    assert aes_gcm_encrypt(bytes(16), bytes(12), b"", b"").hex() == "58e2fccefa7e3061367f1d57a4e7455a"
+    assert aes_gcm_encrypt(bytes(16), bytes(12), bytes(16), b"").hex() \
+        == "0388dace60b6a392f328c2b971b2fe78ab6e47d42cec13bdf53a67b21257bddf"
+    # RFC 9001, приложение A: ключи Initial клиента и маска заголовка
+    key, iv, hp = initial_keys(bytes.fromhex("8394c8f03e515708"))
+    assert (key.hex(), iv.hex(), hp.hex()) == ("1f369613dd76d5467730efcbe3b1a22d", "fa044b2f42a3fd3b46fb255c",
+                                               "9f50449e04a0e810283a1e9933adedd2")
+    assert Aes128(hp).encrypt_block(bytes.fromhex("d1b1c98dd7689fb8ec11d242b123dc9b"))[:5].hex() == "437b9aec36"
+
+    templates = {}
+    for kind, path in TEMPLATES.items():
+        with open(path, "rb") as f:
+            data = f.read()
+        templates[kind] = parse_payload(data, kind)
+        hello = templates[kind] if kind == "tls" else templates[kind].client_hello
+        assert hello.sni == "www.google.com", (kind, hello.sni)
+        if kind == "tls":
+            assert hello.to_bytes() == data  # разбор и сборка без потерь
+        print_description(path, kind, templates[kind].describe())
+
+    sizes = {}
+    for kind in TEMPLATES:
+        for sni, minimal, pad in (("www.example.com", False, True), ("www.google.com", True, True),
+                                  ("www.google.com", True, False)):
+            if kind == "tls" and not pad:
+                continue
+            data = make_variant(kind, templates[kind], sni, minimal, pad)
+            parsed = parse_payload(data, kind)
+            hello = parsed if kind == "tls" else parsed.client_hello
+            assert hello.sni == sni, (kind, sni, hello.sni)
+            if kind == "quic":
+                assert (len(data) == QUIC_MIN_DATAGRAM) == pad, len(data)
+                assert hello.extension(EXT_QUIC_TRANSPORT_PARAMETERS) is not None
+            elif not minimal:
+                # Без расширения padding размер меняется ровно на разницу длин SNI
+                expected = templates["tls"].describe()["size"]
+                if templates["tls"].extension(EXT_PADDING) is None:
+                    expected += len(sni) - len(templates["tls"].sni)
+                assert len(data) == expected, (len(data), expected)
+            assert make_variant(kind, templates[kind], sni, minimal, pad) == data  # детерминированно
+            label = variant_name(kind, sni, minimal, pad)
+            sizes[label] = len(data)
+            print(f"  {label}: {len(data)} байт")
+
+    with tempfile.TemporaryDirectory(prefix="aether-payloads-") as workdir:
+        library = PayloadLibrary(workdir)
+        data = make_variant("tls", templates["tls"], "www.google.com", minimal=True)
+        entry, created = library.add("tls_test", "tls", data, sni="www.google.com")
+        assert created and entry["revision"] == 1
+        assert library.add("tls_test", "tls", data)[1] is False
+        entry, created = library.add("tls_test", "tls", make_variant("tls", templates["tls"], "a.example"))
+        assert created and entry["revision"] == 2 and os.path.exists(os.path.join(workdir, "tls_test_v1.bin"))
+        assert PayloadLibrary(workdir).path("tls_test").endswith("tls_test_v2.bin")
+
+        registry = StrategyRegistry(watch=False)
+        strategy = registry.strategy("general (ALT4).bat", "12")
+        replaced = apply_payloads(strategy, {"tls": library.path("tls_test")})
+        assert replaced is not strategy
+        assert all(path == library.path("tls_test") for kind, path, _ in fake_sends(replaced) if kind == "tls")
+
+    minimal = {"tls": sizes["tls_www_google_com_minimal"], "quic": sizes["quic_www_google_com_minimal_unpadded"]}
+    print("Байты фейков на соединение (TLS / QUIC): исходные -> минимальные")
+    for row in report(registry, {"minimal": minimal}):
+        current, smaller = row["current"], row["minimal"]
+        if current["tls"] or current["quic"]:
+            print(f"  {row['strategy']}: {current['tls']} / {current['quic']} -> {smaller['tls']} / {smaller['quic']}")
+    print("Самопроверка пройдена")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Фейковые TLS ClientHello и QUIC Initial для winws")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    info_parser = commands.add_parser("info", help="структура файла фейка")
+    info_parser.add_argument("paths", nargs="+")
+
+    generate_parser = commands.add_parser("generate", help="новый фейк в библиотеку")
+    generate_parser.add_argument("kind", choices=tuple(TEMPLATES))
+    generate_parser.add_argument("--sni", help="по умолчанию SNI шаблона")
+    generate_parser.add_argument("--minimal", action="store_true", help="самый короткий ClientHello")
+    generate_parser.add_argument("--no-pad", action="store_true", help="не дополнять QUIC Initial до 1200 байт")
+    generate_parser.add_argument("--template", help="файл шаблона (по умолчанию фейк из general/bin)")
+    generate_parser.add_argument("--name", help="имя в библиотеке")
+
+    commands.add_parser("list", help="фейки в библиотеке")
+
+    report_parser = commands.add_parser("report", help="байты фейков на соединение по стратегиям")
+    report_parser.add_argument("--tls", help="фейк TLS из библиотеки для сравнения")
+    report_parser.add_argument("--quic", help="фейк QUIC из библиотеки для сравнения")
+
+    commands.add_parser("selftest")
+    args = parser.parse_args(argv)
+
+    if args.command == "selftest":
+        return selftest()
+    if args.command == "info":
+        for path in args.paths:
+            print_description(path, *describe(path))
+        return 0
+
+    library = PayloadLibrary()
+    if args.command == "generate":
+        with open(args.template or TEMPLATES[args.kind], "rb") as f:
+            template = parse_payload(f.read(), args.kind)
+        sni = args.sni or (template if args.kind == "tls" else template.client_hello).sni
+        data = make_variant(args.kind, template, sni, args.minimal, not args.no_pad)
+        name = args.name or variant_name(args.kind, sni, args.minimal, not args.no_pad)
+        entry, created = library.add(name, args.kind, data, sni=sni, minimal=args.minimal,
+                                     template=os.path.basename(args.template or TEMPLATES[args.kind]))
+        state = "создан" if created else "не изменился"
+        print(f"{name}: ревизия {entry['revision']} ({state}), {entry['size']} байт, {entry['file']}")
+        print(f"Использовать: payload/{args.kind} = {name}")
+        return 0
+    if args.command == "list":
+        for name, entry in sorted(library.entries.items()):
+            print(f"{name}: {entry['kind']}, ревизия {entry['revision']}, {entry['size']} байт, SNI {entry.get('sni')}")
+        return 0
+
+    from strategy_registry import StrategyRegistry
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    sizes = {kind: library.entries[name]["size"] for kind, name in (("tls", args.tls), ("quic", args.quic))
+             if name in library.entries}
+    rows = report(StrategyRegistry(watch=False), {"variant": sizes} if sizes else {})
+    print("Стратегия: байт фейков на соединение TLS / QUIC" + (" -> с фейками из библиотеки" if sizes else ""))
+    for row in rows:
+        line = f"  {row['strategy']}: {row['current']['tls']} / {row['current']['quic']}"
+        if sizes:
+            line += f" -> {row['variant']['tls']} / {row['variant']['quic']}"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
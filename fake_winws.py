@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Имитация winws.exe для Linux: печатает тот же вывод при запуске и ждет завершения
+
+С --debug (как у winws) после запуска печатает строки о совпадении секций
+("desync profile N matches"). Как и у winws, секции нумеруются с 1, а
+соединения без подходящей секции попадают в профиль 0 по умолчанию.
+Секции считаются по --new в аргументах, доля каждой задается --hit-weights;
+порядок строк детерминирован.
+"""
+
+import sys
+import time
+import argparse
+
+
+def parse_weights(text, sections):
+    weights = [float(w) for w in text.split(",")] if text else [1.0] * sections
+    return (weights + [0.0] * sections)[:sections]
+
+
+def weighted_cycle(weights):
+    """Плавный взвешенный round-robin: индексы секций в пропорции весов
+
+    Если все веса нулевые, бесконечно отдает None (ни одна секция не совпала).
+    """
+    total = sum(weights)
+    current = [0.0] * len(weights)
+    while True:
+        if total <= 0:
+            yield None
+            continue
+        for i, weight in enumerate(weights):
+            current[i] += weight
+        best = max(range(len(weights)), key=lambda i: current[i])
+        current[best] -= total
+        yield best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Имитация winws.exe")
+    parser.add_argument("strategy", nargs="?", help="путь к bat файлу стратегии (только для вывода)")
+    parser.add_argument("--startup-delay", type=float, default=0.1,
+                        help="задержка до сообщения о готовности, сек")
+    parser.add_argument("--fail", action="store_true", help="завершиться с ошибкой вместо запуска")
+    parser.add_argument("--exit-after", type=float, default=None,
+                        help="завершиться через N секунд после готовности")
+    parser.add_argument("--hit-weights", default=None,
+                        help="веса совпадений секций через запятую (по умолчанию все по 1)")
+    parser.add_argument("--hit-rate", type=float, default=200, help="строк о совпадениях в секунду")
+    args, winws_args = parser.parse_known_args(argv)
+    debug = any(arg.startswith("--debug") for arg in winws_args)
+    sections = winws_args.count("--new") + 1
+
+    print(f"fake winws: strategy {args.strategy or '-'}")
+    time.sleep(args.startup_delay)
+
+    if args.fail:
+        print("error: could not open windivert device")
+        return 1
+
+    print(f"we have {sections} user defined desync profile(s) and default low priority profile 0")
+    print("windivert initialized. capture is started.")
+    started = time.monotonic()
+    hits = weighted_cycle(parse_weights(args.hit_weights, sections)) if debug else None
+    interval = 1 / args.hit_rate if hits else 0.1
+    try:
+        while args.exit_after is None or time.monotonic() - started < args.exit_after:
+            if hits:
+                index = next(hits)
+                print(f"desync profile {0 if index is None else index + 1} matches")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,9 @@ chcp 65001 > nul
 :: 65001 - UTF-8
 
 cd /d "%~dp0"
-call service.bat status_zapret
-call service.bat check_updates
-call service.bat load_game_filter
+if not defined AETHER_LAUNCH call service.bat status_zapret
+if not defined AETHER_LAUNCH call service.bat check_updates
+if not defined AETHER_LAUNCH call service.bat load_game_filter
 echo:
 
 set "BIN=%~dp0bin\"
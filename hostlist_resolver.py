@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""Адреса доменов из hostlist для сопоставления по IP
+
+Домены из list-general.txt разрешаются параллельно (asyncio). Ответы
+кэшируются с учетом TTL записей и ограничением размера, при обновлении
+запрашиваются только устаревшие домены. Все адреса сворачиваются в
+подсети и записываются в lists/ipset-hostlist.txt в папке данных Aether
+(general/ не изменяется). Секции стратегии с
+--hostlist получают перед собой копию с --ipset по этому файлу: такие
+соединения распознаются по адресу, без разбора SNI/Host.
+
+DNS запросы выполняет подключаемый backend: UdpDnsBackend (свой UDP
+клиент, TTL из ответа) или SystemDnsBackend (системный резолвер,
+фиксированный TTL).
+
+    python hostlist_resolver.py --dns-server 1.1.1.1
+    python hostlist_resolver.py --selftest
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import struct
+import asyncio
+import argparse
+import ipaddress
+import threading
+from collections import OrderedDict
+
+from autohostlist import STATIC_LIST, read_hostlist
+from storage import app_data_path, load_json, atomic_write_json, atomic_write_text
+from strategy import Section, Strategy, split_option
+
+CACHE_VERSION = 1
+
+DEFAULT_TTL = 30 * 60      # для системного резолвера, который не сообщает TTL
+MIN_TTL = 60
+MAX_TTL = 24 * 3600
+NEGATIVE_TTL = 5 * 60      # домен без адресов
+RETRY_TTL = 60             # ошибка запроса: прежние адреса остаются, повтор через минуту
+
+# Адрес из TEST-NET: пустой ipset winws считает совпадающим со всем, поэтому, как и service.bat,
+# пишем в пустой список заглушку
+EMPTY_IPSET_SENTINEL = "203.0.113.113/32"
+
+QTYPE_A = 1
+QTYPE_AAAA = 28
+
+
+def build_query(domain, qtype, query_id):
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)  # RD=1, один вопрос
+    name = b"".join(bytes([len(label)]) + label.encode("idna") for label in domain.split(".")) + b"\0"
+    return header + name + struct.pack("!HH", qtype, 1)
+
+
+def _skip_name(data, offset):
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:  # указатель сжатия
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+
+def parse_response(data, query_id):
+    """(код ответа, [(адрес, ttl)]) из DNS ответа; записи CNAME пропускаются
+
+    Обрезанный или испорченный ответ дает ValueError, как и чужой.
+    """
+    try:
+        return _parse_response(data, query_id)
+    except (IndexError, struct.error) as e:
+        raise ValueError("испорченный ответ DNS") from e
+
+
+def _parse_response(data, query_id):
+    if len(data) < 12:
+        raise ValueError("короткий ответ DNS")
+    response_id, flags, qdcount, ancount = struct.unpack("!HHHH", data[:8])
+    if response_id != query_id:
+        raise ValueError("чужой ответ DNS")
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+    records = []
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, _, ttl, length = struct.unpack("!HHIH", data[offset:offset + 10])
+        offset += 10
+        rdata = data[offset:offset + length]
+        offset += length
+        if rtype == QTYPE_A and length == 4:
+            records.append((socket.inet_ntop(socket.AF_INET, rdata), ttl))
+        elif rtype == QTYPE_AAAA and length == 16:
+            records.append((socket.inet_ntop(socket.AF_INET6, rdata), ttl))
+    return flags & 0xF, records
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class UdpDnsBackend:
+    """Запросы A и AAAA напрямую к DNS серверу по UDP; TTL берется из ответа"""
+
+    def __init__(self, server, port=53, timeout=2.0, retries=2, ipv6=True):
+        self.server = (server, port)
+        self.timeout = timeout
+        self.retries = retries
+        self.qtypes = (QTYPE_A, QTYPE_AAAA) if ipv6 else (QTYPE_A,)
+
+    async def _query(self, domain, qtype):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            query_id = random.randrange(1 << 16)
+            future = loop.create_future()
+            transport, _ = await loop.create_datagram_endpoint(lambda: _QueryProtocol(future),
+                                                               remote_addr=self.server)
+            try:
+                transport.sendto(build_query(domain, qtype, query_id))
+                data = await asyncio.wait_for(future, self.timeout)
+                return parse_response(data, query_id)[1]
+            except asyncio.TimeoutError:
+                if attempt == self.retries:
+                    raise
+            finally:
+                transport.close()
+
+    async def resolve(self, domain):
+        """[(адрес, ttl)] для домена (пустой список, если адресов нет)"""
+        answers = await asyncio.gather(*(self._query(domain, qtype) for qtype in self.qtypes))
+        return [record for records in answers for record in records]
+
+
+class SystemDnsBackend:
+    """Системный резолвер (getaddrinfo): TTL неизвестен, используется фиксированный"""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+
+    async def resolve(self, domain):
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(domain, None, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            return []
+        return sorted({(info[4][0], self.ttl) for info in infos})
+
+
+def dns_backend(server=""):
+    """UdpDnsBackend для указанного сервера, иначе системный резолвер"""
+    return UdpDnsBackend(server) if server else SystemDnsBackend()
+
+
+class DnsCache:
+    """Адреса доменов со временем истечения; вытесняются давно не обновлявшиеся"""
+
+    def __init__(self, path=None, max_entries=5000):
+        self.path = path or app_data_path("dns_cache.json")
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # домен -> [истекает, [адреса]]
+        self.dirty = False
+        data = load_json(self.path)
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            for domain, expires, addresses in data.get("entries", []):
+                self.entries[domain] = [expires, addresses]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self):
+        if not self.dirty:
+            return
+        atomic_write_json(self.path, {
+            "version": CACHE_VERSION,
+            "entries": [[domain, expires, addresses] for domain, (expires, addresses) in self.entries.items()],
+        })
+        self.dirty = False
+
+    def expired(self, domain, now):
+        entry = self.entries.get(domain)
+        return entry is None or entry[0] <= now
+
+    def addresses(self, domain):
+        entry = self.entries.get(domain)
+        return entry[1] if entry else []
+
+    def put(self, domain, addresses, ttl, now):
+        self.entries[domain] = [now + ttl, sorted(set(addresses))]
+        self.entries.move_to_end(domain)
+        self.dirty = True
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def postpone(self, domain, ttl, now):
+        """Ошибка запроса: прежние адреса сохраняются до следующей попытки"""
+        entry = self.entries.get(domain)
+        if entry is None:
+            self.put(domain, [], ttl, now)
+        else:
+            entry[0] = now + ttl
+            self.dirty = True
+
+
+def aggregate(addresses):
+    """Адреса, свернутые в минимальный набор подсетей (IPv4, затем IPv6)"""
+    networks = [ipaddress.ip_network(address) for address in addresses]
+    result = []
+    for version in (4, 6):
+        result.extend(ipaddress.collapse_addresses(n for n in networks if n.version == version))
+    return [str(network) for network in result]
+
+
+class HostlistResolver:
+    """Разрешение доменов hostlist с кэшем и запись сводного ipset"""
+
+    def __init__(self, backend, cache=None, concurrency=32, clock=time.time):
+        self.backend = backend
+        self.cache = cache if cache is not None else DnsCache()
+        self.concurrency = concurrency
+        self.clock = clock
+        self.queries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    async def _resolve_one(self, domain, semaphore, now):
+        async with semaphore:
+            self.queries += 1
+            try:
+                records = await self.backend.resolve(domain)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                self.failures += 1
+                self.cache.postpone(domain, RETRY_TTL, now)
+                return
+        if records:
+            ttl = min(max(min(ttl for _, ttl in records), MIN_TTL), MAX_TTL)
+            self.cache.put(domain, [address for address, _ in records], ttl, now)
+        else:
+            self.cache.put(domain, [], NEGATIVE_TTL, now)
+
+    async def refresh(self, domains):
+        """Разрешает домены без записи в кэше или с истекшей; возвращает их число"""
+        now = self.clock()
+        stale = [domain for domain in dict.fromkeys(domains) if self.cache.expired(domain, now)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._resolve_one(domain, semaphore, now) for domain in stale))
+        return len(stale)
+
+    def networks(self, domains):
+        return aggregate({address for domain in domains for address in self.cache.addresses(domain)})
+
+    def update(self, list_path, ipset_path):
+        """Полный цикл в текущем потоке: обновить устаревшее, записать ipset, сохранить кэш
+
+        Возвращает число подсетей в ipset или None, если обновление уже идет.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            started = time.perf_counter()
+            domains = read_hostlist(list_path)
+            queries, failures = self.queries, self.failures
+            stale = asyncio.run(self.refresh(domains))
+            networks = self.networks(domains)
+            text = "".join(f"{line}\n" for line in networks or [EMPTY_IPSET_SENTINEL])
+            try:
+                with open(ipset_path, "r", encoding="utf-8", newline="") as f:
+                    changed = f.read() != text.replace("\n", "\r\n")
+            except OSError:
+                changed = True
+            if changed:
+                atomic_write_text(ipset_path, text, newline="\r\n")
+            self.cache.save()
+            print(f"Адреса hostlist: доменов {len(domains)}, обновлено {stale} "
+                  f"(запросов {self.queries - queries}, ошибок {self.failures - failures}), "
+                  f"подсетей {len(networks)}{'' if changed else ', без изменений'}, "
+                  f"{(time.perf_counter() - started) * 1000:.0f} мс")
+            return len(networks)
+        finally:
+            self._lock.release()
+
+
+def has_addresses(ipset_path):
+    """Есть ли в ipset адреса, кроме заглушки"""
+    try:
+        with open(ipset_path, "r", encoding="utf-8") as f:
+            return any(line.strip() and line.strip() != EMPTY_IPSET_SENTINEL for line in f)
+    except OSError:
+        return False
+
+
+def resolved_ipset_path():
+    """ipset с адресами hostlist в папке данных Aether"""
+    return os.path.join(app_data_path("lists"), "ipset-hostlist.txt")
+
+
+def add_resolved_ipset(strategy, ipset_path, hostlist_path):
+    """Перед каждой секцией с --hostlist=hostlist_path вставляет ее копию с --ipset=ipset_path
+
+    winws применяет первую подходящую секцию, поэтому соединения на уже
+    известные адреса совпадают по IP, а остальные — как раньше, по имени.
+    """
+    if not has_addresses(ipset_path):
+        return strategy
+    target = os.path.normcase(os.path.abspath(hostlist_path))
+    sections = []
+    for section in strategy.sections:
+        hostlists = [os.path.normcase(os.path.abspath(value.strip('"'))) for value in section.options("--hostlist")]
+        if target in hostlists:
+            args = [f"--ipset={ipset_path}" if split_option(arg)[0] == "--hostlist" else arg for arg in section.args]
+            sections.append(args)
+        sections.append(section.args)
+    if len(sections) == len(strategy.sections):
+        return strategy
+    return Strategy(strategy.name, strategy.global_args, [Section(i, args) for i, args in enumerate(sections)],
+                    path=strategy.path)
+
+
+class LocalDnsServer(asyncio.DatagramProtocol):
+    """Подставной DNS сервер для проверок: отвечает из словаря домен -> [(адрес, ttl)]"""
+
+    def __init__(self, records, truncated=()):
+        self.records = records
+        self.truncated = truncated
+        self.queries = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.queries += 1
+        query_id = struct.unpack("!H", data[:2])[0]
+        offset, labels = 12, []
+        while data[offset]:
+            labels.append(data[offset + 1:offset + 1 + data[offset]].decode("ascii"))
+            offset += data[offset] + 1
+        question_end = offset + 5
+        qtype = struct.unpack("!H", data[offset + 1:offset + 3])[0]
+        domain = ".".join(labels)
+        family = socket.AF_INET if qtype == QTYPE_A else socket.AF_INET6
+        answers = [(address, ttl) for address, ttl in self.records.get(domain, [])
+                   if (":" in address) == (family == socket.AF_INET6)]
+        rcode = 0 if domain in self.records else 3
+        response = struct.pack("!HHHHHH", query_id, 0x8180 | rcode, 1, len(answers), 0, 0)
+        response += data[12:question_end]
+        for address, ttl in answers:
+            rdata = socket.inet_pton(family, address)
+            response += struct.pack("!HHHIH", 0xC00C, qtype, 1, ttl, len(rdata)) + rdata
+        if domain in self.truncated:
+            response = response[:question_end + 6]  # ответ обрывается посреди записи
+        self.transport.sendto(response, addr)
+
+
+def selftest():
+    """Разрешение через подставной DNS сервер: TTL, обновление только устаревшего, ipset"""
+    import tempfile
+
+    records = {
+        "discord.com": [("162.159.137.232", 300), ("162.159.136.232", 300), ("2606:4700::6810:1", 300)],
+        "discord.gg": [("162.159.135.232", 60)],
+        "gateway.discord.gg": [("162.159.134.233", 3600), ("162.159.134.232", 3600)],
+        "cdn.discordapp.com": [("162.159.133.233", 30)],
+    }
+    records["broken.discord.test"] = [("162.159.130.234", 300)]
+    domains = list(records) + ["missing.discord.test"]
+    clock = [1000.0]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, server = await loop.create_datagram_endpoint(lambda: LocalDnsServer(records, {"broken.discord.test"}),
+                                                                local_addr=("127.0.0.1", 0))
+        host, port = transport.get_extra_info("sockname")[:2]
+        try:
+            resolver = HostlistResolver(UdpDnsBackend(host, port, timeout=1.0),
+                                        DnsCache(os.path.join(workdir, "cache.json"), max_entries=10),
+                                        clock=lambda: clock[0])
+            assert await resolver.refresh(domains) == 6 and server.queries == 12
+            assert resolver.failures == 1 and not resolver.cache.addresses("broken.discord.test")
+            assert resolver.cache.addresses("discord.com") == ["162.159.136.232", "162.159.137.232", "2606:4700::6810:1"]
+            assert resolver.cache.entries["cdn.discordapp.com"][0] == 1000 + MIN_TTL  # TTL 30 поднят до минимума
+            assert resolver.cache.addresses("missing.discord.test") == []
+
+            # До истечения TTL сеть не трогаем
+            assert await resolver.refresh(domains) == 0 and server.queries == 12
+
+            # Через 2 минуты устарели только discord.gg, cdn.discordapp.com (TTL 60) и отложенный
+            # после испорченного ответа broken.discord.test
+            clock[0] += 120
+            assert await resolver.refresh(domains) == 3 and server.queries == 18
+
+            networks = resolver.networks(domains)
+            assert "162.159.134.232/31" in networks and "2606:4700::6810:1/128" in networks, networks
+            return resolver
+        finally:
+            transport.close()
+
+    with tempfile.TemporaryDirectory(prefix="aether-resolver-") as workdir:
+        resolver = asyncio.run(run())
+        print(f"Подставной DNS: запросов {resolver.queries}, подсети: {', '.join(resolver.networks(domains))}")
+
+        hostlist = os.path.join(workdir, "list-general.txt")
+        ipset = os.path.join(workdir, "ipset-hostlist.txt")
+        with open(hostlist, "w", encoding="utf-8") as f:
+            f.write("\n".join(domains) + "\n")
+        cache = resolver.cache
+        resolver = HostlistResolver(SystemDnsBackend(), cache, clock=lambda: clock[0])
+        assert resolver.update(hostlist, ipset) == 6 and resolver.queries == 0  # все ответы из кэша
+
+        strategy = Strategy("test", ["--wf-tcp=443"], [
+            Section(0, ["--filter-tcp=443", f"--hostlist={hostlist}", "--dpi-desync=fake"]),
+            Section(1, ["--filter-tcp=443", "--ipset=other.txt", "--dpi-desync=fake"]),
+        ])
+        extended = add_resolved_ipset(strategy, ipset, hostlist)
+        assert [s.args[1] for s in extended.sections] == [f"--ipset={ipset}", f"--hostlist={hostlist}", "--ipset=other.txt"]
+    print("Самопроверка пройдена")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Адреса доменов hostlist в ipset")
+    parser.add_argument("--list", default=STATIC_LIST)
+    parser.add_argument("--output", help="ipset (по умолчанию в папке данных Aether)")
+    parser.add_argument("--dns-server", default="", help="DNS сервер (по умолчанию системный резолвер)")
+    parser.add_argument("--selftest", action="store_true")
+    args = parser.parse_args(argv)
+    if args.selftest:
+        return selftest()
+    resolver = HostlistResolver(dns_backend(args.dns_server))
+    resolver.update(args.list, args.output or resolved_ipset_path())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,37 @@
 import sys
-import subprocess
 import os
-import time
 import ctypes
 import webbrowser
-import psutil
+
+# Повторный запуск передает команды уже работающему Aether и завершается, не загружая GUI
+if __name__ == "__main__":
+    from single_instance import forward_to_running_instance
+    if forward_to_running_instance(sys.argv[1:]):
+        sys.exit(0)
+
 from PySide6.QtWidgets import QApplication, QMessageBox
-from PySide6.QtGui import QIcon
-from PySide6.QtCore import QTimer, QThread, Signal
+from PySide6.QtCore import Qt, QTimer
 from design import CustomWindow
+import assets
+from session import BypassSession, WorkerThread
+from activity import ActivityManager
+from tray import TrayController
+from broker import BrokerBackend
+from single_instance import InstanceGuard, parse_commands, forward_to_running_instance
 
 def is_admin():
+    if os.name != "nt":
+        return os.geteuid() == 0
     try:
         return ctypes.windll.shell32.IsUserAnAdmin()
     except:
         return False
 
-class WorkerThread(QThread):
-    """Поток для выполнения тяжелых операций в фоне"""
-    finished = Signal()
-    error = Signal(str)
-    
-    def __init__(self, operation, *args, **kwargs):
-        super().__init__()
-        self.operation = operation
-        self.args = args
-        self.kwargs = kwargs
-    
-    def run(self):
-        try:
-            self.operation(*self.args, **self.kwargs)
-            self.finished.emit()
-        except Exception as e:
-            self.error.emit(str(e))
-
 def run_as_admin():
+    if os.name != "nt":
+        # nfqws и nftables требуют root, а повысить права GUI на Linux нечем
+        print("Запустите Aether от root (sudo), чтобы управлять nfqws и nftables")
+        sys.exit(1)
     try:
         script = os.path.abspath(sys.argv[0])
         params = ' '.join([script] + sys.argv[1:])
@@ -62,13 +59,22 @@ def run_as_admin():
 
 class MainWindow(CustomWindow):
     
-    def __init__(self):
+    def __init__(self, session=None, backend=None):
         super().__init__()
         
-        self.process = None
+        # Процессы и выбранная стратегия живут в сессии: окно можно пересоздать без остановки обхода
+        self.session = session or BypassSession(backend)
+        self.backend = self.session.backend
+        
         self.worker_thread = None
         self.is_switch_locked = False
         
+        # Смена стратегии во время другой операции выполняется после нее
+        self.swap_pending = False
+        
+        # При закрытии окна в режиме трея обход продолжает работать
+        self.close_to_tray = False
+        
         self.main_switch.toggled.connect(self.on_main_switch_toggled)
         self.github_button.clicked.connect(self.open_github)
         self.telegram_button.clicked.connect(self.open_telegram)
@@ -81,24 +87,60 @@ class MainWindow(CustomWindow):
         self.process_check_timer = QTimer(self)
         self.process_check_timer.timeout.connect(self.check_winws_process)
         self.process_check_timer.start(1000)  # Проверка каждую секунду
+        
+        # Свернутое или скрытое окно проверяет процесс раз в 10 секунд и не играет анимации
+        self.activity = ActivityManager(self, catch_up=self.check_winws_process)
+        self.activity.add_timer(self.process_check_timer, background_interval=10000)
+        traffic = self.session.traffic
+        if traffic is not None:
+            self.activity.add_timer(traffic.timer, traffic.background_interval, traffic.interval)
+        self.activity.add_animation(self.main_switch.animation)
+        self.activity.add_animation(self.theme_switch.animation)
+        
+        # Список стратегий берется из реестра и обновляется при изменениях в папке general
+        strategies = self.session.strategies
+        self.set_bat_files(strategies.alternatives())
+        strategies.strategy_added.connect(self.insert_bat_file)
+        strategies.strategy_removed.connect(self.remove_bat_file)
+        
+        # Только выбор пользователя (не удаление файла из списка) переключает запущенный обход
+        self.bat_dropdown.textActivated.connect(self.on_bat_file_activated)
+        
+        # Восстанавливаем стратегию и состояние переключателя из сессии
+        self.sync_from_session()
+    
+    def sync_from_session(self):
+        """Приводит окно в соответствие с сессией (после пересоздания или действий из трея)"""
+        if self.session.is_alternative_mode:
+            self.bat_dropdown.setCurrentText(self.session.selected_bat_file)
+            self.switch_to_alt_method()
+        else:
+            self.switch_to_main_method()
+        
+        is_running = self.session.is_winws_running()
+        if self.main_switch.is_checked() != is_running:
+            self.main_switch.blockSignals(True)
+            self.main_switch.set_checked(is_running)
+            self.main_switch.blockSignals(False)
+        self.main_switch.set_process_running(is_running)
     
     def check_winws_process(self):
         """Проверяет запущен ли процесс winws.exe и меняет иконку"""
+        # Перезапускаем упавшие шарды, если сейчас не идет запуск или остановка
+        self.session.supervise()
+        
         is_running = self.is_winws_running()
         
         # Меняем иконку в ползунке
         self.main_switch.set_process_running(is_running)
+        
+        # Скорость Discord видна в подсказке переключателя
+        if self.session.traffic is not None:
+            self.main_switch.setToolTip(self.session.traffic.summary())
     
     def is_winws_running(self):
         """Проверяет запущен ли процесс winws.exe"""
-        try:
-            for proc in psutil.process_iter(['name']):
-                if proc.info['name'].lower() == 'winws.exe':
-                    return True
-            return False
-        except Exception as e:
-            print(f"Ошибка при проверке процесса: {e}")
-            return False
+        return self.session.is_winws_running()
     
     def open_github(self):
         webbrowser.open("https://github.com/redjex")
@@ -106,60 +148,68 @@ class MainWindow(CustomWindow):
     def open_telegram(self):
         webbrowser.open("https://t.me/aether_discord")
 
-    def kill_discord_processes(self):
-        discord_processes = ['discord.exe', 'Discord.exe', 'DiscordPTB.exe', 'DiscordCanary.exe']
-        
-        print("Завершаю процессы Discord...")
-        
-        for process_name in discord_processes:
-            try:
-                result = subprocess.run(
-                    f'taskkill /F /IM {process_name}',
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    print(f"Процесс {process_name} успешно завершен")
-                
-            except Exception as e:
-                print(f"Ошибка при завершении {process_name}: {e}")
-        
-        time.sleep(2)
-        print("Все процессы Discord завершены")
-    
     def on_main_method_selected(self):
         """Обработчик выбора основного метода"""
         print("Выбран основной метод")
         
-        # Останавливаем все процессы
-        self.kill_all_processes()
-        
-        # Переключаем switch в OFF
-        self.main_switch.blockSignals(True)
-        self.main_switch.set_checked(False)
-        self.main_switch.blockSignals(False)
-        
         # Вызываем родительский метод для обновления UI
         self.switch_to_main_method()
+        self.session.is_alternative_mode = False
+        self.apply_strategy_change()
     
     def on_alt_method_selected(self):
         """Обработчик выбора альтернативного метода"""
         print("Выбран альтернативный метод")
         
-        # Останавливаем все процессы
-        self.kill_all_processes()
+        # Вызываем родительский метод для обновления UI
+        self.switch_to_alt_method()
+        self.session.is_alternative_mode = True
+        self.apply_strategy_change()
+    
+    def apply_strategy_change(self):
+        """Запущенный обход переключается на выбранную стратегию, остановленный только запоминает выбор"""
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            self.swap_pending = True
+            return
         
-        # Переключаем switch в OFF
+        if self.session.is_winws_running():
+            self.hot_swap()
+            return
+        
+        # Обход не запущен: останавливаем остатки и переключаем switch в OFF
+        self.kill_all_processes()
         self.main_switch.blockSignals(True)
         self.main_switch.set_checked(False)
         self.main_switch.blockSignals(False)
-        
-        # Вызываем родительский метод для обновления UI
-        self.switch_to_alt_method()
+    
+    def hot_swap(self):
+        """Переключает запущенный обход на выбранную стратегию в фоне (Discord не перезапускается)"""
+        self.swap_pending = False
+        self.is_switch_locked = True
+        self.main_switch.setEnabled(False)
+        print("Смена стратегии без остановки обхода...")
+        self.worker_thread = WorkerThread(self.session.hot_swap)
+        self.worker_thread.succeeded.connect(self.on_swap_finished)
+        self.worker_thread.error.connect(self.on_operation_error)
+        self.worker_thread.error.connect(self.on_swap_failed)
+        self.worker_thread.start()
+    
+    def on_swap_finished(self):
+        """Вызывается когда смена стратегии успешно завершена"""
+        self.unlock_switch()
+        self.sync_from_session()
+        self.run_pending_swap()
+    
+    def on_swap_failed(self, error_msg):
+        """Смена стратегии не удалась: отложенная смена не применяется"""
+        self.unlock_switch()
+        self.sync_from_session()
+    
+    def run_pending_swap(self):
+        """Применяет смену стратегии, отложенную из-за другой операции"""
+        if self.swap_pending:
+            self.swap_pending = False
+            self.apply_strategy_change()
     
     def on_main_switch_toggled(self, checked):
         if self.is_switch_locked:
@@ -184,13 +234,13 @@ class MainWindow(CustomWindow):
         if checked:
             print("Переключатель включен, запускаю последовательность в фоне...")
             self.worker_thread = WorkerThread(self._start_processes_background)
-            self.worker_thread.finished.connect(self.on_start_finished)
+            self.worker_thread.succeeded.connect(self.on_start_finished)
             self.worker_thread.error.connect(self.on_operation_error)
             self.worker_thread.start()
         else:
             print("Главный переключатель: ВЫКЛЮЧЕН (OFF)")
             self.worker_thread = WorkerThread(self._stop_processes_background)
-            self.worker_thread.finished.connect(self.on_stop_finished)
+            self.worker_thread.succeeded.connect(self.on_stop_finished)
             self.worker_thread.error.connect(self.on_operation_error)
             self.worker_thread.start()
         
@@ -198,48 +248,12 @@ class MainWindow(CustomWindow):
     
     def _start_processes_background(self):
         """Запускаем процессы в фоновом потоке"""
-        self.kill_discord_processes()
-        
-        # Определяем какой bat файл запускать
-        if self.is_alternative_mode:
-            # Альтернативный режим - используем выбранный из dropdown
-            bat_file = self.selected_bat_file
-        else:
-            # Основной режим - всегда general (ALT).bat
-            bat_file = "general (ALT).bat"
-        
-        bat_path = os.path.abspath(f"general/{bat_file}")
-        
-        if os.path.exists(bat_path):
-            try:
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-                
-                self.process = subprocess.Popen(
-                    ['cmd', '/c', bat_path],
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    creationflags=subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP,
-                    startupinfo=startupinfo,
-                    cwd=os.path.dirname(bat_path)
-                )
-                
-                print(f"Запущен файл: {bat_path} (PID: {self.process.pid})")
-                time.sleep(2)
-                
-            except Exception as e:
-                print(f"Ошибка при запуске файла: {e}")
-                raise e
-        else:
-            error_msg = f"Файл не найден: {bat_path}"
-            print(error_msg)
-            raise FileNotFoundError(error_msg)
+        self.session.start()
     
     def on_start_finished(self):
         """Вызывается когда запуск завершен"""
         print("Процессы успешно запущены")
+        self.run_pending_swap()
     
     def unlock_switch(self):
         """Разблокирует переключатель после задержки"""
@@ -249,93 +263,142 @@ class MainWindow(CustomWindow):
     
     def _stop_processes_background(self):
         """Останавливаем процессы в фоновом потоке"""
-        self.kill_all_processes()
+        self.session.stop()
     
     def on_stop_finished(self):
         """Вызывается когда остановка завершена"""
         print("Процессы успешно остановлены")
+        self.swap_pending = False
     
     def on_operation_error(self, error_msg):
         """Вызывается при ошибке в фоновом потоке"""
         print(f"Ошибка в фоновом потоке: {error_msg}")
+        # Смена стратегии, отложенная до конца неудавшейся операции, отменяется
+        self.swap_pending = False
         QMessageBox.critical(self, "Ошибка", f"Произошла ошибка:\n{error_msg}")
     
     def kill_all_processes(self):
         """Завершает все запущенные процессы"""
-        try:
-            print("Завершаю все фоновые процессы...")
-            
-            # Завершаем все процессы winws.exe
-            result = subprocess.run(
-                'taskkill /F /IM winws.exe',
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                print("✓ Все процессы winws.exe успешно завершены")
-            else:
-                print("✓ Процессы winws.exe не найдены")
-            
-            # Завершаем все процессы cmd.exe связанные с bat файлами
-            subprocess.run(
-                'taskkill /F /FI "WINDOWTITLE eq zapret*"',
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                text=True
-            )
-            print("✓ Процессы cmd.exe завершены")
-            
-            # Завершаем процесс BAT если он есть
-            if self.process is not None:
-                try:
-                    pid = self.process.pid
-                    subprocess.run(
-                        f'taskkill /F /T /PID {pid}',
-                        shell=True,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        creationflags=subprocess.CREATE_NO_WINDOW
-                    )
-                    print(f"✓ Завершен процесс BAT с PID: {pid}")
-                except:
-                    pass
-                
-                self.process = None
-            
-            print("✅ Все фоновые процессы успешно завершены")
-            
-        except Exception as e:
-            print(f"Ошибка при завершении процесса: {e}")
+        self.session.kill_all_processes()
+    
+    def on_bat_file_changed(self, filename):
+        """Обработчик изменения выбранного bat файла"""
+        super().on_bat_file_changed(filename)
+        self.session.selected_bat_file = filename
+    
+    def select_strategy(self, alternative, bat_file):
+        """Выбор стратегии извне (повторный запуск с --strategy)"""
+        self.session.is_alternative_mode = alternative
+        if alternative:
+            self.session.selected_bat_file = bat_file
+        self.sync_from_session()
+        self.apply_strategy_change()
+    
+    def show_from_background(self):
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+    
+    def on_bat_file_activated(self, filename):
+        """Пользователь выбрал bat файл в списке"""
+        if self.session.is_alternative_mode:
+            self.apply_strategy_change()
     
     def closeEvent(self, event):
         """Обработчик закрытия приложения"""
-        print("Закрытие приложения...")
         self.process_check_timer.stop()
-        self.kill_all_processes()
+        if self.close_to_tray:
+            # Окно уничтожается целиком, обход продолжает работать из трея
+            if self.worker_thread is not None:
+                self.worker_thread.wait()
+            print("Окно закрыто, Aether работает в трее")
+            self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        else:
+            print("Закрытие приложения...")
+            self.session.shutdown()
         event.accept()
 
+def create_window(session):
+    window = MainWindow(session)
+    window.setWindowTitle("Aether")
+    
+    window.setWindowIcon(assets.icon("app"))
+    return window
+
+def resolve_strategy(session, name):
+    """(альтернативный метод, bat файл) по имени стратегии или None"""
+    names = session.strategies.names()
+    for candidate in (name, f"{name}.bat"):
+        if candidate in names:
+            return candidate != session.strategies.main_file, candidate
+    return None
+
+def handle_commands(commands, session, tray=None, window=None):
+    """Команды из командной строки: своей или повторного запуска"""
+    for command in commands:
+        action = command["action"]
+        if tray is not None:
+            window = tray.window
+        if action == "strategy":
+            selected = resolve_strategy(session, command["strategy"])
+            if selected is None:
+                print(f"Стратегия не найдена: {command['strategy']}")
+                continue
+            print(f"Стратегия из командной строки: {selected[1]}")
+            if tray is not None:
+                tray.select_strategy(*selected)
+            else:
+                window.select_strategy(*selected)
+        elif action == "show":
+            if tray is not None:
+                tray.show_window()
+            else:
+                window.show_from_background()
+        elif tray is not None:
+            tray.start() if action == "start" else tray.stop()
+        elif window.main_switch.is_checked() != (action == "start"):
+            window.main_switch.set_checked(action == "start")
+
 def main():
+    backend = None
     if not is_admin():
-        run_as_admin()
+        # Права администратора нужны только брокеру процессов, окно работает без повышения
+        backend = BrokerBackend.connect_or_start() if os.name == "nt" else None
+        if backend is None:
+            run_as_admin()
     
     app = QApplication(sys.argv)
     
-    window = MainWindow()
-    window.setWindowTitle("Aether")
+    # Второй экземпляр, запущенный одновременно с нами, успел взять блокировку первым
+    guard = InstanceGuard()
+    if not guard.acquire():
+        forward_to_running_instance(sys.argv[1:], wait=5.0)
+        sys.exit(0)
+    app.aboutToQuit.connect(guard.release)
+    
+    try:
+        session = BypassSession(backend)
+    except RuntimeError as e:
+        # Нет способа запускать стратегии на этой системе — сообщаем сразу, а не при включении
+        QMessageBox.critical(None, "Aether", str(e))
+        sys.exit(1)
+    tray = window = None
     
-    icon_path = "img/aether.ico"
-    if os.path.exists(icon_path):
-        window.setWindowIcon(QIcon(icon_path))
+    # Режим трея: --tray или настройка tray/enabled
+    tray_mode = "--tray" in sys.argv or session.settings.value("tray/enabled", False, type=bool)
+    if tray_mode and TrayController.is_available():
+        app.setQuitOnLastWindowClosed(False)
+        tray = TrayController(app, session, create_window)
+        if "--tray" not in sys.argv:
+            tray.show_window()
+    else:
+        window = create_window(session)
+        window.show()
     
-    window.show()
+    guard.commands_received.connect(lambda commands: handle_commands(commands, session, tray, window))
+    handle_commands([c for c in parse_commands(sys.argv[1:]) if c["action"] != "show"], session, tray, window)
     
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""Отслеживание смены сети (Wi-Fi, VPN, адаптеры)
+
+Источник событий зависит от платформы: на Linux — netlink сокет (через
+QSocketNotifier), на Windows — блокирующие NotifyAddrChange/NotifyRouteChange
+в фоновых потоках. Если ни один недоступен, снимок интерфейсов сравнивается
+по редкому таймеру. События сглаживаются: после последнего события
+выжидается пауза, затем снимок интерфейсов, адресов и маршрута по
+умолчанию сравнивается с прежним, и сигнал отправляется только при
+реальных изменениях.
+
+    python network_monitor.py            # выводить изменения сети
+    python network_monitor.py --selftest # проверка на имитированных снимках
+"""
+
+import os
+import sys
+import socket
+import argparse
+import threading
+import psutil
+
+from PySide6.QtCore import QObject, QTimer, QSocketNotifier, Signal
+
+# Группы рассылки NETLINK_ROUTE: интерфейсы, адреса IPv4/IPv6, маршруты IPv4/IPv6
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+NETLINK_GROUPS = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_IFADDR | RTMGRP_IPV6_ROUTE
+
+
+def default_route():
+    """Интерфейс маршрута по умолчанию (и шлюз на Linux) или None"""
+    if sys.platform.startswith("linux"):
+        best = None
+        try:
+            with open("/proc/net/route", "r") as f:
+                next(f, None)
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 7 or fields[1] != "00000000":
+                        continue
+                    metric = int(fields[6])
+                    if best is None or metric < best[0]:
+                        gateway = socket.inet_ntoa(int(fields[2], 16).to_bytes(4, "little"))
+                        best = (metric, f"{fields[0]} via {gateway}")
+        except (OSError, ValueError):
+            return None
+        return best and best[1]
+    if os.name == "nt":
+        import ctypes
+        index = ctypes.c_ulong()
+        # Интерфейс, через который уходит трафик на внешний адрес
+        destination = int.from_bytes(socket.inet_aton("1.1.1.1"), "little")
+        if ctypes.windll.iphlpapi.GetBestInterface(destination, ctypes.byref(index)) == 0:
+            return f"if{index.value}"
+    return None
+
+
+def capture_snapshot():
+    """Снимок сети: включенные интерфейсы с адресами и маршрут по умолчанию"""
+    stats = psutil.net_if_stats()
+    interfaces = {}
+    for name, addresses in psutil.net_if_addrs().items():
+        stat = stats.get(name)
+        if stat is None or not stat.isup:
+            continue
+        ips = sorted(f"{a.address}/{a.netmask}" if a.netmask else a.address
+                     for a in addresses if a.family in (socket.AF_INET, socket.AF_INET6))
+        if ips and not all(ip.startswith(("127.", "::1")) for ip in ips):
+            interfaces[name] = ips
+    return {"interfaces": interfaces, "route": default_route()}
+
+
+def diff_snapshots(old, new):
+    """Список изменений между двумя снимками (пустой, если сеть та же)"""
+    changes = []
+    old_interfaces, new_interfaces = old["interfaces"], new["interfaces"]
+    for name in sorted(new_interfaces.keys() - old_interfaces.keys()):
+        changes.append(f"подключен {name}")
+    for name in sorted(old_interfaces.keys() - new_interfaces.keys()):
+        changes.append(f"отключен {name}")
+    for name in sorted(old_interfaces.keys() & new_interfaces.keys()):
+        added = sorted(set(new_interfaces[name]) - set(old_interfaces[name]))
+        removed = sorted(set(old_interfaces[name]) - set(new_interfaces[name]))
+        if added or removed:
+            parts = [f"+{a}" for a in added] + [f"-{r}" for r in removed]
+            changes.append(f"адреса {name}: {' '.join(parts)}")
+    if old["route"] != new["route"]:
+        changes.append(f"маршрут по умолчанию: {old['route'] or 'нет'} -> {new['route'] or 'нет'}")
+    return changes
+
+
+class NetworkMonitor(QObject):
+    """Сигнал network_changed(list) со списком изменений после смены сети"""
+    network_changed = Signal(list)
+    _event = Signal()
+
+    def __init__(self, parent=None, debounce=2000, poll_interval=10000, capture=capture_snapshot):
+        super().__init__(parent)
+        self.capture = capture
+        self.poll_interval = poll_interval
+        self.snapshot = None
+        self.source = None
+        self.events = 0
+        self.checks = 0
+
+        self._socket = None
+        self._notifier = None
+        self._poll_timer = None
+        self._threads = []
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(debounce)
+        self._debounce.timeout.connect(self.check)
+        # События из потоков Windows доставляются в поток Qt через очередь сигналов
+        self._event.connect(self.notify)
+
+    def start(self, source="auto"):
+        """source: auto, netlink, windows, poll или manual (только notify())"""
+        self.snapshot = self.capture()
+        if source in ("auto", "netlink") and sys.platform.startswith("linux") and self._start_netlink():
+            self.source = "netlink"
+        elif source in ("auto", "windows") and os.name == "nt":
+            self._start_windows()
+            self.source = "windows"
+        elif source == "manual":
+            self.source = "manual"
+        else:
+            self._poll_timer = QTimer(self)
+            self._poll_timer.timeout.connect(self.check)
+            self._poll_timer.start(self.poll_interval)
+            self.source = "poll"
+        print(f"Отслеживание сети: {self.source}")
+
+    def stop(self):
+        self._debounce.stop()
+        if self._notifier is not None:
+            self._notifier.setEnabled(False)
+            self._notifier = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._poll_timer is not None:
+            self._poll_timer.stop()
+            self._poll_timer = None
+
+    def _start_netlink(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK, 0)
+            sock.bind((0, NETLINK_GROUPS))
+        except (AttributeError, OSError) as e:
+            print(f"netlink недоступен: {e}")
+            return False
+        self._socket = sock
+        self._notifier = QSocketNotifier(sock.fileno(), QSocketNotifier.Type.Read, self)
+        self._notifier.activated.connect(self._read_netlink)
+        return True
+
+    def _read_netlink(self):
+        # Содержимое сообщений не важно: что изменилось, покажет сравнение снимков
+        try:
+            while self._socket.recv(65536):
+                pass
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            # ENOBUFS: сообщения потеряны, но снимок все равно будет сравнен целиком
+            print(f"Ошибка чтения netlink: {e}")
+        self.notify()
+
+    def _start_windows(self):
+        import ctypes
+        iphlpapi = ctypes.windll.iphlpapi
+        # Без OVERLAPPED функции блокируются до следующего изменения: поток спит, а не опрашивает
+        for wait_change in (iphlpapi.NotifyAddrChange, iphlpapi.NotifyRouteChange):
+            thread = threading.Thread(target=self._wait_windows, args=(wait_change,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _wait_windows(self, wait_change):
+        while wait_change(None, None) == 0:
+            self._event.emit()
+
+    def notify(self):
+        """Событие от источника: проверка откладывается до затишья"""
+        self.events += 1
+        self._debounce.start()
+
+    def check(self):
+        """Сравнивает снимок сети с прежним и сообщает об изменениях"""
+        self.checks += 1
+        snapshot = self.capture()
+        changes = diff_snapshots(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        if changes:
+            self.network_changed.emit(changes)
+        return changes
+
+
+def selftest():
+    """Сравнение имитированных снимков и сглаживание серии событий"""
+    from PySide6.QtCore import QCoreApplication, QEventLoop
+
+    home = {"interfaces": {"wlan0": ["192.168.1.10/255.255.255.0"]}, "route": "wlan0 via 192.168.1.1"}
+    vpn = {"interfaces": {"wlan0": ["192.168.1.10/255.255.255.0"], "wg0": ["10.8.0.2/255.255.255.0"]},
+           "route": "wg0 via 10.8.0.1"}
+    roaming = {"interfaces": {"wlan0": ["172.20.4.7/255.255.0.0"]}, "route": "wlan0 via 172.20.0.1"}
+
+    assert diff_snapshots(home, home) == []
+    assert diff_snapshots(home, vpn) == ["подключен wg0", "маршрут по умолчанию: wlan0 via 192.168.1.1 -> wg0 via 10.8.0.1"]
+    assert diff_snapshots(vpn, home)[0] == "отключен wg0"
+    assert diff_snapshots(home, roaming)[0] == "адреса wlan0: +172.20.4.7/255.255.0.0 -192.168.1.10/255.255.255.0"
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    snapshots = iter([home, vpn, vpn, roaming])
+    monitor = NetworkMonitor(debounce=50, capture=lambda: next(snapshots))
+    received = []
+    monitor.network_changed.connect(received.append)
+    monitor.start("manual")
+
+    def settle():
+        loop = QEventLoop()
+        QTimer.singleShot(150, loop.quit)
+        loop.exec()
+
+    # Подключение VPN дает серию событий netlink — проверка одна
+    for _ in range(20):
+        monitor.notify()
+    settle()
+    assert monitor.checks == 1 and len(received) == 1, (monitor.checks, received)
+
+    # Событие без реальных изменений сигнал не отправляет
+    monitor.notify()
+    settle()
+    assert monitor.checks == 2 and len(received) == 1
+
+    monitor.notify()
+    settle()
+    assert len(received) == 2 and received[1][:2] == ["отключен wg0", "адреса wlan0: +172.20.4.7/255.255.0.0 -192.168.1.10/255.255.255.0"]
+    print(f"Самопроверка пройдена: событий {monitor.events}, проверок {monitor.checks}, изменений {len(received)}")
+    for changes in received:
+        print("  " + "; ".join(changes))
+
+    # Настоящий источник событий на этой машине
+    live = NetworkMonitor()
+    live.start()
+    live.stop()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отслеживание смены сети")
+    parser.add_argument("--selftest", action="store_true")
+    parser.add_argument("--source", default="auto", choices=("auto", "netlink", "windows", "poll"))
+    args = parser.parse_args(argv)
+    if args.selftest:
+        return selftest()
+
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication(sys.argv)
+    monitor = NetworkMonitor()
+    monitor.network_changed.connect(lambda changes: print("Сеть изменилась: " + "; ".join(changes)))
+    monitor.start(args.source)
+    print(f"Текущая сеть: {monitor.snapshot}")
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""Linux: те же стратегии через nfqws и nftables
+
+Стратегия из general/*.bat разбирается общим парсером. Секции почти без
+изменений становятся аргументами nfqws (опции секций у winws и nfqws
+общие), а --wf-tcp/--wf-udp, которые у winws задают фильтр WinDivert,
+превращаются в правила nftables: первые пакеты соединений на эти порты
+отправляются в очередь NFQUEUE, которую слушает nfqws. Таблица nftables
+своя (inet aether) и удаляется целиком при остановке.
+
+Команды выполняет исполнитель: CommandRunner на настоящей системе (нужен
+root) или DryRunRunner, который только печатает команды и вместо nfqws
+запускает fake_winws.py — так правила и весь цикл запуска проверяются без
+root.
+
+Эталонные команды DryRunRunner для каждой стратегии из general лежат в
+golden/nfqws; selftest сравнивает с ними перевод, golden --update обновляет
+их после намеренного изменения правил.
+
+    python nfqws_backend.py dry-run "general (ALT2).bat"
+    python nfqws_backend.py start "general (ALT2).bat" --dry-run
+    python nfqws_backend.py golden [--update]
+    python nfqws_backend.py selftest
+"""
+
+import os
+import sys
+import shlex
+import shutil
+import difflib
+import argparse
+import subprocess
+
+from strategy import Strategy, split_args, split_option, parse_bat
+from strategy_registry import StrategyRegistry, GENERAL_DIR
+from platform_backend import ProcessBackend, FAKE_WINWS_SCRIPT
+from readiness import OutputReader, ReadinessDetector
+
+NFT_TABLE = "aether"
+FIRST_QUEUE = 200
+
+# Метка, которой nfqws помечает свои пакеты, чтобы они не попадали в очередь повторно
+DESYNC_MARK = 0x40000000
+
+# Сколько первых пакетов соединения отправлять в nfqws (как в стандартных правилах zapret)
+TCP_PACKETS = 9
+TCP_REPLY_PACKETS = 3
+UDP_PACKETS = 6
+
+# Опции winws, которых нет у nfqws: фильтр WinDivert и привязка к сетям Windows
+WINWS_ONLY_PREFIXES = ("--wf-", "--ssid-filter", "--nlm-filter")
+
+NFQWS_CANDIDATES = ("/opt/zapret/nfq/nfqws", "/usr/local/bin/nfqws", "/usr/bin/nfqws")
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "nfqws")
+
+
+def find_nfqws():
+    """Путь к nfqws или None"""
+    found = shutil.which("nfqws")
+    if found:
+        return found
+    return next((path for path in NFQWS_CANDIDATES if os.access(path, os.X_OK)), None)
+
+
+def nft_ports(ports):
+    return "{ " + ", ".join(str(ports).split(",")) + " }"
+
+
+def nfqws_argv(strategy, qnum):
+    """Аргументы nfqws для стратегии и список отброшенных опций winws"""
+    argv = [f"--qnum={qnum}", f"--dpi-desync-fwmark={DESYNC_MARK:#x}"]
+    dropped = []
+    for i, section_args in enumerate([strategy.global_args] + [s.args for s in strategy.sections]):
+        if i > 1:
+            argv.append("--new")
+        for arg in section_args:
+            if split_option(arg)[0].startswith(WINWS_ONLY_PREFIXES):
+                dropped.append(arg)
+            else:
+                argv.append(arg)
+    return argv, dropped
+
+
+def nft_ruleset(strategy, qnum, table=NFT_TABLE):
+    """Скрипт для nft -f: очередь qnum для портов из --wf-tcp/--wf-udp стратегии
+
+    Таблица и цепочки создаются через add, поэтому скрипты нескольких
+    процессов nfqws (шардов) можно применять по очереди.
+    """
+    not_ours = f"meta mark and {DESYNC_MARK:#x} == 0"
+    lines = [
+        f"add table inet {table}",
+        f"add chain inet {table} postrouting {{ type filter hook postrouting priority mangle; policy accept; }}",
+        f"add chain inet {table} prerouting {{ type filter hook prerouting priority filter; policy accept; }}",
+    ]
+    tcp = strategy.divert("tcp")
+    if tcp:
+        lines.append(f"add rule inet {table} postrouting {not_ours} tcp dport {nft_ports(tcp)} "
+                     f"ct original packets 1-{TCP_PACKETS} queue num {qnum} bypass")
+        # Ответы сервера нужны nfqws для autottl и определения успешного обхода
+        lines.append(f"add rule inet {table} prerouting tcp sport {nft_ports(tcp)} "
+                     f"ct reply packets 1-{TCP_REPLY_PACKETS} queue num {qnum} bypass")
+    udp = strategy.divert("udp")
+    if udp:
+        lines.append(f"add rule inet {table} postrouting {not_ours} udp dport {nft_ports(udp)} "
+                     f"ct original packets 1-{UDP_PACKETS} queue num {qnum} bypass")
+    return "\n".join(lines) + "\n"
+
+
+class CommandRunner:
+    """Выполняет nft и запускает nfqws на настоящей системе"""
+
+    def run(self, argv, input=None):
+        result = subprocess.run(argv, input=input, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        return result.returncode, result.stdout
+
+    def spawn(self, argv):
+        return subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+
+class DryRunRunner(CommandRunner):
+    """Печатает и запоминает команды вместо выполнения; вместо nfqws запускает fake_winws.py"""
+
+    def __init__(self, startup_delay=0.1, echo=True):
+        self.startup_delay = startup_delay
+        self.echo = echo
+        self.commands = []
+
+    def run(self, argv, input=None):
+        self.commands.append((list(argv), input))
+        if self.echo:
+            print("$ " + shlex.join(argv))
+            if input:
+                print(input, end="")
+        return 0, ""
+
+    def spawn(self, argv):
+        self.commands.append((list(argv), None))
+        if self.echo:
+            print("$ " + shlex.join(argv))
+        return subprocess.Popen(
+            [sys.executable, "-u", FAKE_WINWS_SCRIPT, "--startup-delay", str(self.startup_delay)] + list(argv[1:]),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT
+        )
+
+
+class NfqwsBackend(ProcessBackend):
+    """Запуск стратегий через nfqws и очереди nftables (нужен root)
+
+    Каждый процесс nfqws (в том числе шард) получает свою очередь и свои
+    правила. Остановка по имени winws_name завершает nfqws и удаляет
+    таблицу целиком.
+    """
+
+    winws_name = "nfqws"
+
+    def __init__(self, nfqws_path=None, runner=None, table=NFT_TABLE):
+        super().__init__()
+        self.nfqws_path = nfqws_path or find_nfqws() or "nfqws"
+        self.runner = runner or CommandRunner()
+        self.table = table
+        self.next_queue = FIRST_QUEUE
+        self._spawned = set()
+
+    def process_matches(self, proc, name):
+        # Свои процессы узнаем по PID: при пробном запуске вместо nfqws работает fake_winws.py
+        if name.lower() == self.winws_name and proc.pid in self._spawned:
+            return True
+        return super().process_matches(proc, name)
+
+    def apply_rules(self, strategy, qnum):
+        code, output = self.runner.run(["nft", "-f", "-"], input=nft_ruleset(strategy, qnum, self.table))
+        if code != 0:
+            raise RuntimeError(f"nft не применил правила: {output.strip()}")
+
+    def remove_rules(self):
+        # Таблицы может не быть (ничего не запускалось) — это не ошибка
+        self.runner.run(["nft", "delete", "table", "inet", self.table])
+
+    def spawn_winws(self, winws_path, argv):
+        """Аргументы winws переводятся в nfqws, --wf-* — в правила nftables (winws_path не нужен)"""
+        global_args, sections = split_args(argv)
+        strategy = Strategy("nfqws", global_args, sections)
+        qnum = self.next_queue
+        self.next_queue += 1
+
+        nfqws_args, dropped = nfqws_argv(strategy, qnum)
+        if any(not arg.startswith("--wf-") for arg in dropped):
+            print(f"Опции winws без аналога в nfqws пропущены: {' '.join(dropped)}")
+        self.apply_rules(strategy, qnum)
+        try:
+            process = self.runner.spawn([self.nfqws_path] + nfqws_args)
+        except OSError:
+            self.remove_rules()
+            raise
+        self._spawned.add(process.pid)
+        return process
+
+    def spawn_strategy(self, bat_path, env):
+        strategy = parse_bat(bat_path, game_filter=env.get("GameFilter", "12"))
+        return self.spawn_winws(None, strategy.argv())
+
+    def kill_by_name(self, name):
+        killed = super().kill_by_name(name)
+        if name.lower() == self.winws_name:
+            self.remove_rules()
+            self._spawned.clear()
+            self.next_queue = FIRST_QUEUE
+        return killed
+
+
+def dry_run_transcript(bat_path, game_filter="12"):
+    """Команды DryRunRunner за запуск и остановку стратегии; пути — относительно ее папки"""
+    runner = DryRunRunner(echo=False)
+    backend = NfqwsBackend(nfqws_path=NFQWS_CANDIDATES[0], runner=runner)
+    process = backend.spawn_strategy(bat_path, {"GameFilter": game_filter})
+    backend.kill_by_name(backend.winws_name)
+    process.wait(timeout=5)
+
+    base = os.path.join(os.path.dirname(os.path.abspath(bat_path)), "")
+    lines = []
+    for argv, input in runner.commands:
+        argv = [arg.replace(base, "general/").replace(os.sep, "/") if base in arg else arg for arg in argv]
+        lines.append("$ " + shlex.join(argv))
+        if input:
+            lines.append(input.rstrip("\n"))
+    return "\n".join(lines) + "\n"
+
+
+def check_golden(registry, update=False, golden_dir=GOLDEN_DIR):
+    """Сравнивает перевод стратегий с эталонами; возвращает {стратегия: diff} расхождений"""
+    mismatches = {}
+    for name in registry.names():
+        path = os.path.join(golden_dir, os.path.splitext(name)[0] + ".txt")
+        actual = dry_run_transcript(registry.path(name))
+        if update:
+            os.makedirs(golden_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(actual)
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                expected = f.read()
+        except OSError:
+            expected = ""
+        if actual != expected:
+            mismatches[name] = "".join(difflib.unified_diff(
+                expected.splitlines(True), actual.splitlines(True), f"golden/{name}", f"actual/{name}"))
+    return mismatches
+
+
+def selftest():
+    """Перевод всех стратегий, сверка с эталонами и пробный цикл запуска/остановки без root"""
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    registry = StrategyRegistry(watch=False)
+    for name in registry.names():
+        strategy = registry.strategy(name, "12")
+        argv, dropped = nfqws_argv(strategy, FIRST_QUEUE)
+        assert not any(arg.startswith("--wf-") for arg in argv), name
+        assert argv.count("--new") == len(strategy.sections) - 1, name
+        assert [a for a in dropped if a.startswith("--wf-")] == [a for a in strategy.global_args if a.startswith("--wf-")]
+        rules = nft_ruleset(strategy, FIRST_QUEUE)
+        for protocol in ("tcp", "udp"):
+            ports = strategy.divert(protocol)
+            assert (f"{protocol} dport {nft_ports(ports)}" in rules) == bool(ports), (name, protocol)
+    print(f"Стратегий переведено: {len(registry.names())}")
+
+    mismatches = check_golden(registry)
+    for name, diff in mismatches.items():
+        print(diff or f"{name}: нет эталона")
+    assert not mismatches, f"перевод отличается от эталона: {', '.join(mismatches)}"
+    print(f"Совпадает с эталонами golden/nfqws: {len(registry.names())}")
+
+    runner = DryRunRunner(echo=False)
+    backend = NfqwsBackend(nfqws_path="/opt/zapret/nfq/nfqws", runner=runner)
+    process = backend.spawn_strategy(registry.path("general (ALT2).bat"), {"GameFilter": "12"})
+    readiness = ReadinessDetector(OutputReader(process.stdout), lambda: process.poll() is None).wait()
+    assert readiness.ready and backend.is_running(backend.winws_name), readiness
+    assert backend.kill_by_name(backend.winws_name)
+    process.wait(timeout=5)
+    assert not backend.is_running(backend.winws_name)
+    commands = [shlex.join(argv) for argv, _ in runner.commands]
+    assert commands[0] == "nft -f -" and commands[1].startswith("/opt/zapret/nfq/nfqws --qnum=200 ")
+    assert commands[-1] == f"nft delete table inet {NFT_TABLE}"
+    print(f"Пробный запуск: {readiness}, команд {len(commands)}")
+    print("Самопроверка пройдена")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Стратегии Aether через nfqws и nftables")
+    parser.add_argument("command", choices=("dry-run", "start", "stop", "golden", "selftest"))
+    parser.add_argument("bat", nargs="?", default="general.bat", help="имя bat файла в папке general или путь к нему")
+    parser.add_argument("--game-filter", default="12")
+    parser.add_argument("--nfqws", help="путь к nfqws")
+    parser.add_argument("--dry-run", action="store_true", help="не выполнять команды (для start/stop)")
+    parser.add_argument("--update", action="store_true", help="перезаписать эталоны (для golden)")
+    args = parser.parse_args(argv)
+
+    if args.command == "selftest":
+        return selftest()
+    if args.command == "golden":
+        from PySide6.QtCore import QCoreApplication
+        app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+        registry = StrategyRegistry(watch=False)
+        mismatches = check_golden(registry, update=args.update)
+        for name, diff in mismatches.items():
+            print(diff or f"{name}: нет эталона")
+        print(f"Эталоны {'обновлены' if args.update else 'совпадают'}: {len(registry.names()) - len(mismatches)}"
+              f" из {len(registry.names())}")
+        return 1 if mismatches else 0
+
+    path = args.bat if os.path.exists(args.bat) else os.path.join(GENERAL_DIR, args.bat)
+    if args.command == "dry-run":
+        strategy = parse_bat(path, game_filter=args.game_filter)
+        argv, dropped = nfqws_argv(strategy, FIRST_QUEUE)
+        print("# nft -f -")
+        print(nft_ruleset(strategy, FIRST_QUEUE), end="")
+        print(f"# {strategy.name}: {len(strategy.sections)} секций, из winws не перенесено: {' '.join(dropped)}")
+        print(shlex.join([args.nfqws or find_nfqws() or "nfqws"] + argv))
+        return 0
+
+    runner = DryRunRunner() if args.dry_run else CommandRunner()
+    backend = NfqwsBackend(args.nfqws, runner)
+    if args.command == "stop":
+        backend.kill_by_name(backend.winws_name)
+        return 0
+
+    process = backend.spawn_strategy(path, {"GameFilter": args.game_filter})
+    reader = OutputReader(process.stdout)
+    print(ReadinessDetector(reader, lambda: process.poll() is None).wait())
+    try:
+        process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.kill_by_name(backend.winws_name)
+    print("\n".join(reader.lines))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
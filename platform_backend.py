@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import subprocess
+from abc import ABC, abstractmethod
+import psutil
+
+from preconditions import probe_service_state, probe_tcp_timestamps, enable_tcp_timestamps
+
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+CREATE_NEW_PROCESS_GROUP = getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
+
+FAKE_WINWS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_winws.py")
+
+
+class ProcessBackend(ABC):
+    """Операции с процессами, которые нужны MainWindow
+
+    Общая часть построена на psutil (на Linux/macOS ее достаточно); запуск
+    стратегии наследники обязаны реализовать под конкретную платформу.
+    """
+
+    winws_name = "winws.exe"
+
+    def __init__(self):
+        # Последний найденный PID по имени: проверка одного PID дешевле обхода всех процессов
+        self._known_pids = {}
+
+    def process_matches(self, proc, name):
+        return (proc.info.get("name") or "").lower() == name.lower()
+
+    def find_processes(self, name):
+        found = []
+        for proc in psutil.process_iter(["name", "cmdline"]):
+            try:
+                if self.process_matches(proc, name):
+                    found.append(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return found
+
+    def is_running(self, name):
+        pid = self._known_pids.get(name)
+        if pid is not None:
+            try:
+                proc = psutil.Process(pid)
+                proc.info = proc.as_dict(["name", "cmdline"])
+                if self.process_matches(proc, name):
+                    return True
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+            self._known_pids.pop(name, None)
+
+        for proc in psutil.process_iter(["name", "cmdline"]):
+            try:
+                if self.process_matches(proc, name):
+                    self._known_pids[name] = proc.pid
+                    return True
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return False
+
+    def describe(self, pid):
+        """PID, время создания и командная строка процесса winws (None если это не winws)"""
+        try:
+            proc = psutil.Process(pid)
+            proc.info = proc.as_dict(["name", "cmdline"])
+            if not self.process_matches(proc, self.winws_name):
+                return None
+            return {"pid": pid, "create_time": proc.create_time(), "cmdline": proc.info["cmdline"] or []}
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+    def running_winws(self):
+        """Описания всех запущенных процессов winws"""
+        described = (self.describe(proc.pid) for proc in self.find_processes(self.winws_name))
+        return [d for d in described if d is not None]
+
+    def kill_by_name(self, name):
+        """Завершает все процессы с таким именем, True если что-то было завершено"""
+        killed = False
+        for proc in self.find_processes(name):
+            try:
+                proc.kill()
+                killed = True
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return killed
+
+    def kill_tree(self, pid):
+        """Завершает процесс вместе с дочерними"""
+        try:
+            parent = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return False
+        for proc in parent.children(recursive=True) + [parent]:
+            try:
+                proc.kill()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return True
+
+    def kill_launchers(self):
+        """Завершает окна-запускатели стратегий (если платформа их создает)"""
+
+    @abstractmethod
+    def spawn_strategy(self, bat_path, env):
+        """Запускает стратегию из bat файла, возвращает Popen"""
+
+    def query_service(self, name):
+        """Состояние службы Windows или None"""
+        return probe_service_state(name)
+
+    def tcp_timestamps(self):
+        return probe_tcp_timestamps()
+
+    def enable_tcp_timestamps(self):
+        enable_tcp_timestamps()
+
+    def spawn_winws(self, winws_path, argv):
+        """Запускает winws напрямую с готовыми аргументами (вывод читается через stdout)"""
+        return subprocess.Popen(
+            [winws_path] + list(argv),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            creationflags=CREATE_NO_WINDOW,
+            cwd=os.path.dirname(winws_path)
+        )
+
+
+class WindowsBackend(ProcessBackend):
+    """Windows: cmd + bat файл, taskkill"""
+
+    def _taskkill(self, args):
+        result = subprocess.run(
+            f'taskkill /F {args}',
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=CREATE_NO_WINDOW,
+            text=True
+        )
+        return result.returncode == 0
+
+    def kill_by_name(self, name):
+        return self._taskkill(f'/IM {name}')
+
+    def kill_tree(self, pid):
+        return self._taskkill(f'/T /PID {pid}')
+
+    def kill_launchers(self):
+        self._taskkill('/FI "WINDOWTITLE eq zapret*"')
+
+    def spawn_strategy(self, bat_path, env):
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+
+        return subprocess.Popen(
+            ['cmd', '/c', bat_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            creationflags=CREATE_NO_WINDOW | CREATE_NEW_PROCESS_GROUP,
+            startupinfo=startupinfo,
+            cwd=os.path.dirname(bat_path),
+            env=env
+        )
+
+
+class FakeWinwsBackend(ProcessBackend):
+    """Запускает fake_winws.py вместо bat файла — для замеров и отладки без Windows
+
+    Поведение задается параметрами: задержка до готовности, аварийное
+    завершение и т.д. (см. fake_winws.py).
+    """
+
+    def __init__(self, startup_delay=0.1, fail=False, extra_args=()):
+        super().__init__()
+        self.startup_delay = startup_delay
+        self.fail = fail
+        self.extra_args = list(extra_args)
+
+    def process_matches(self, proc, name):
+        if name.lower() == self.winws_name:
+            cmdline = proc.info.get("cmdline") or []
+            return any(arg.endswith("fake_winws.py") for arg in cmdline)
+        return super().process_matches(proc, name)
+
+    def spawn_winws(self, winws_path, argv):
+        args = [sys.executable, "-u", FAKE_WINWS_SCRIPT, "--startup-delay", str(self.startup_delay)]
+        if self.fail:
+            args.append("--fail")
+        return subprocess.Popen(
+            args + self.extra_args + list(argv),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT
+        )
+
+    def spawn_strategy(self, bat_path, env):
+        args = [sys.executable, "-u", FAKE_WINWS_SCRIPT, bat_path,
+                "--startup-delay", str(self.startup_delay)] + self.extra_args
+        if self.fail:
+            args.append("--fail")
+        return subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env
+        )
+
+
+def default_backend():
+    """Backend для этой системы; RuntimeError, если стратегии запускать нечем"""
+    if os.name == "nt":
+        return WindowsBackend()
+    if sys.platform.startswith("linux"):
+        # На Linux-шлюзах стратегии запускаются через nfqws, если он установлен
+        from nfqws_backend import NfqwsBackend, find_nfqws, NFQWS_CANDIDATES
+        if find_nfqws():
+            return NfqwsBackend()
+        raise RuntimeError("nfqws не найден: установите zapret (nfqws в PATH или "
+                           f"{', '.join(NFQWS_CANDIDATES)}), чтобы запускать стратегии на Linux")
+    raise RuntimeError(f"Запуск стратегий не поддерживается на {sys.platform}: нужен Windows "
+                       "или Linux с nfqws")
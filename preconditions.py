@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import threading
+import subprocess
+
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+GAME_FILTER_FLAG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "general", "bin", "game_filter.enabled")
+GAME_FILTER_ENABLED = "1024-65535"
+GAME_FILTER_DISABLED = "12"
+
+DEFAULT_TTL = 5 * 60
+
+
+def _run(argv):
+    """Запускает консольную команду без окна и без shell, возвращает (код, stdout)"""
+    result = subprocess.run(
+        argv,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        creationflags=CREATE_NO_WINDOW,
+        text=True,
+        errors="ignore"
+    )
+    return result.returncode, result.stdout
+
+
+def probe_service_state(name="zapret"):
+    """Состояние службы Windows (RUNNING, STOPPED, ...) или None если ее нет"""
+    if os.name != "nt":
+        return None
+    code, output = _run(["sc", "query", name])
+    if code != 0:
+        return None
+    match = re.search(r"STATE\s*:\s*\d+\s+(\w+)", output)
+    return match.group(1) if match else None
+
+
+def service_stamp(name="zapret"):
+    """Время изменения ключа службы в реестре или None, если службы нет
+
+    sc create/delete (установка и удаление службы через service.bat)
+    меняют этот ключ, поэтому по нему кэш замечает изменения без вызова sc.
+    """
+    if os.name != "nt":
+        return None
+    import winreg
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, rf"SYSTEM\CurrentControlSet\Services\{name}") as key:
+            return winreg.QueryInfoKey(key)[2]
+    except OSError:
+        return None
+
+
+def probe_tcp_timestamps():
+    """Включены ли TCP timestamps (аналог :tcp_enable в service.bat)"""
+    if os.name != "nt":
+        return True
+    code, output = _run(["netsh", "interface", "tcp", "show", "global"])
+    for line in output.splitlines():
+        if "timestamps" in line.lower():
+            return "enabled" in line.lower()
+    return False
+
+
+def enable_tcp_timestamps():
+    """Включает TCP timestamps (нужны права администратора)"""
+    if os.name == "nt":
+        _run(["netsh", "interface", "tcp", "set", "global", "timestamps=enabled"])
+
+
+def probe_game_filter(flag_path=GAME_FILTER_FLAG):
+    """Значение %GameFilter% (аналог :game_switch_status в service.bat)"""
+    return GAME_FILTER_ENABLED if os.path.exists(flag_path) else GAME_FILTER_DISABLED
+
+
+def _file_stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class PreconditionCache:
+    """Кэш системных предусловий запуска с TTL и инвалидацией по событиям
+
+    Каждая проба выполняется один раз и хранится до истечения TTL или до
+    явной инвалидации. Для пробы можно задать дешевую функцию "штампа":
+    если штамп изменился (например mtime файла), значение пересчитывается.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, backend=None):
+        self.ttl = ttl
+        # Пробы, требующие прав администратора, выполняются через backend (например, брокер)
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._probes = {}
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+        # Ключ службы в реестре читается без прав администратора: по нему установка
+        # и удаление службы сбрасывают кэш сразу, а не через TTL
+        if backend is not None:
+            self.register("zapret_service", lambda: backend.query_service("zapret"), stamp=service_stamp)
+            self.register("tcp_timestamps", backend.tcp_timestamps)
+        else:
+            self.register("zapret_service", probe_service_state, stamp=service_stamp)
+            self.register("tcp_timestamps", probe_tcp_timestamps)
+        self.register("game_filter", probe_game_filter,
+                      stamp=lambda: _file_stamp(GAME_FILTER_FLAG))
+
+    def register(self, name, probe, stamp=None, ttl=None):
+        with self._lock:
+            self._probes[name] = (probe, stamp, ttl)
+            self._entries.pop(name, None)
+
+    def get(self, name):
+        """Возвращает значение пробы, выполняя ее только при промахе кэша"""
+        probe, stamp, ttl = self._probes[name]
+        ttl = self.ttl if ttl is None else ttl
+        current_stamp = stamp() if stamp is not None else None
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                value, probed_at, entry_stamp = entry
+                if time.monotonic() - probed_at < ttl and entry_stamp == current_stamp:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            value = probe()
+            self._entries[name] = (value, time.monotonic(), current_stamp)
+            return value
+
+    def invalidate(self, *names):
+        """Сбрасывает указанные пробы (или все, если имена не переданы)"""
+        with self._lock:
+            if not names:
+                self._entries.clear()
+            for name in names:
+                self._entries.pop(name, None)
+
+    def on_service_changed(self):
+        """Служба zapret установлена или удалена"""
+        self.invalidate("zapret_service")
+
+    def on_timestamps_changed(self):
+        """Настройка TCP timestamps изменена"""
+        self.invalidate("tcp_timestamps")
+
+    def warm_up(self):
+        """Заполняет кэш в фоне, чтобы запуск не ждал проб"""
+        def run():
+            for name in list(self._probes):
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Ошибка пробы {name}: {e}")
+
+        thread = threading.Thread(target=run, name="aether-preconditions", daemon=True)
+        thread.start()
+        return thread
+
+    def ensure_tcp_timestamps(self):
+        """Включает TCP timestamps, если они выключены (только при промахе кэша идет в netsh)"""
+        if self.get("tcp_timestamps"):
+            return True
+        if self.backend is not None:
+            self.backend.enable_tcp_timestamps()
+        else:
+            enable_tcp_timestamps()
+        self.on_timestamps_changed()
+        return self.get("tcp_timestamps")
+
+    def launch_environment(self):
+        """Переменные окружения, которые bat файл раньше вычислял сам"""
+        return {"GameFilter": self.get("game_filter")}
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from collections import deque
+
+# Строки, которые winws печатает после успешного открытия WinDivert (и nfqws после привязки к очереди)
+READY_MARKERS = ("capture is started", "windivert initialized", "binding this socket to queue")
+# Строки, по которым понятно что запуск не удался
+ERROR_MARKERS = ("error", "could not", "cannot", "failed", "invalid")
+
+
+class ReadinessResult:
+    """Итог ожидания готовности winws"""
+
+    def __init__(self, ready, latency, reason, output):
+        self.ready = ready
+        self.latency = latency
+        self.reason = reason
+        self.output = output
+
+    def __repr__(self):
+        return (f"ReadinessResult(ready={self.ready}, latency={self.latency * 1000:.1f} мс, "
+                f"reason={self.reason!r})")
+
+
+class OutputReader:
+    """Читает вывод процесса в фоне и хранит последние строки
+
+    Заодно не дает переполниться pipe: без чтения stdout winws мог бы
+    заблокироваться на записи.
+    """
+
+    def __init__(self, stream, max_lines=200):
+        self.lines = deque(maxlen=max_lines)
+        self.ready_event = threading.Event()
+        self.error_event = threading.Event()
+        self.closed_event = threading.Event()
+        self._listeners = []
+        self._thread = None
+        if stream is not None:
+            self._thread = threading.Thread(target=self._read, args=(stream,),
+                                            name="aether-winws-output", daemon=True)
+            self._thread.start()
+        else:
+            self.closed_event.set()
+
+    def add_listener(self, callback):
+        """callback(line) вызывается для каждой новой строки из потока чтения"""
+        self._listeners.append(callback)
+
+    def _read(self, stream):
+        try:
+            for raw in iter(stream.readline, b""):
+                line = raw.decode("utf-8", errors="ignore").strip() if isinstance(raw, bytes) else raw.strip()
+                if not line:
+                    continue
+                self.lines.append(line)
+                lower = line.lower()
+                if any(marker in lower for marker in READY_MARKERS):
+                    self.ready_event.set()
+                elif any(marker in lower for marker in ERROR_MARKERS):
+                    self.error_event.set()
+                for callback in list(self._listeners):
+                    try:
+                        callback(line)
+                    except Exception as e:
+                        print(f"Ошибка обработчика вывода: {e}")
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.closed_event.set()
+
+
+class ReadinessDetector:
+    """Определяет момент, когда winws действительно перехватывает трафик
+
+    Готовность = процесс жив и в его выводе появился маркер запуска. Если
+    вывод буферизуется и маркер не приходит, процесс считается готовым после
+    settle секунд стабильной работы.
+    """
+
+    def __init__(self, reader, is_alive, timeout=5.0, settle=1.5, poll_interval=0.05):
+        self.reader = reader
+        self.is_alive = is_alive
+        self.timeout = timeout
+        self.settle = settle
+        self.poll_interval = poll_interval
+
+    def wait(self, started_at=None):
+        started_at = time.perf_counter() if started_at is None else started_at
+        alive_since = None
+
+        while True:
+            elapsed = time.perf_counter() - started_at
+            alive = self.is_alive()
+
+            if alive:
+                if alive_since is None:
+                    alive_since = elapsed
+                if self.reader.ready_event.is_set():
+                    return self._result(True, started_at, "маркер запуска")
+                if elapsed - alive_since >= self.settle:
+                    return self._result(True, started_at, "процесс стабилен")
+            else:
+                alive_since = None
+                if self.reader.error_event.is_set():
+                    return self._result(False, started_at, "ошибка в выводе")
+                if self.reader.closed_event.is_set() and elapsed > self.poll_interval * 4:
+                    return self._result(False, started_at, "процесс завершился")
+
+            if elapsed >= self.timeout:
+                return self._result(False, started_at, "таймаут")
+            time.sleep(self.poll_interval)
+
+    def _result(self, ready, started_at, reason):
+        return ReadinessResult(ready, time.perf_counter() - started_at, reason, list(self.reader.lines))
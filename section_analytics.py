@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Статистика совпадений по секциям стратегии
+
+winws запускается напрямую с --debug=1, его вывод разбирается построчно по
+мере поступления, а совпадения ("desync profile N matches") считаются по
+номерам секций. По итогам строится отчет о секциях без совпадений и
+стратегия без них, которую можно сохранить как отдельный bat файл (--output;
+папка general не изменяется, если не указать ее явно).
+
+    python section_analytics.py "general (ALT2).bat" --duration 120 --output "ALT2 (PRUNED).bat"
+    python section_analytics.py "general (ALT2).bat" --fake --hit-weights 5,0,1,0,3
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from array import array
+
+from strategy import PortSet, Strategy, split_option, parse_bat
+from readiness import OutputReader, ReadinessDetector
+from platform_backend import default_backend, FakeWinwsBackend
+
+GENERAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "general")
+
+PROFILE_MATCH_RE = re.compile(r"desync profile (\d+)(?: \([^)]*\))? matches")
+PROFILE_MISS_RE = re.compile(r"desync profile not found|no matching desync profile")
+
+
+class SectionCounters:
+    """Счетчики совпадений фиксированного размера (по одному на секцию)"""
+
+    def __init__(self, size):
+        self.hits = array("Q", bytes(8 * size))
+        self.unmatched = 0
+        self.unknown = 0
+
+    def __len__(self):
+        return len(self.hits)
+
+    def add(self, index):
+        if 0 <= index < len(self.hits):
+            self.hits[index] += 1
+        else:
+            self.unknown += 1
+
+    def total(self):
+        return sum(self.hits)
+
+
+class SectionHitParser:
+    """Разбирает строки отладочного вывода winws и обновляет счетчики
+
+    profile_base — номер, с которого winws нумерует профили (секции): 1,
+    профиль 0 — встроенный профиль по умолчанию для соединений, которым не
+    подошла ни одна секция.
+    """
+
+    def __init__(self, counters, profile_base=1):
+        self.counters = counters
+        self.profile_base = profile_base
+        self.lines = 0
+
+    def feed(self, line):
+        self.lines += 1
+        match = PROFILE_MATCH_RE.search(line)
+        if match and int(match.group(1)) >= self.profile_base:
+            self.counters.add(int(match.group(1)) - self.profile_base)
+        elif match or PROFILE_MISS_RE.search(line):
+            self.counters.unmatched += 1
+
+
+class SectionReport:
+    """Итог замера: совпадения по секциям и секции без совпадений"""
+
+    def __init__(self, strategy, counters, duration):
+        self.strategy = strategy
+        self.hits = list(counters.hits)
+        self.unmatched = counters.unmatched
+        self.unknown = counters.unknown
+        self.duration = duration
+
+    def dead_sections(self):
+        return [i for i, hits in enumerate(self.hits) if hits == 0]
+
+    def __str__(self):
+        total = sum(self.hits) or 1
+        lines = [f"Стратегия {self.strategy.name}: {sum(self.hits)} совпадений за {self.duration:.0f} с"]
+        for section, hits in zip(self.strategy.sections, self.hits):
+            filters = " ".join(f"{opt}={os.path.basename(value)}" if value else opt
+                               for opt, value in map(split_option, section.args)
+                               if opt.startswith(("--filter-", "--hostlist", "--ipset")))
+            mark = "  мертвая" if hits == 0 else ""
+            lines.append(f"  [{section.index:2d}] {hits:8d} {hits / total:6.1%}  {filters}{mark}")
+        if self.unmatched:
+            lines.append(f"  без подходящей секции: {self.unmatched}")
+        if self.unknown:
+            lines.append(f"  совпадения с неизвестными номерами секций: {self.unknown}")
+        dead = self.dead_sections()
+        lines.append(f"Мертвые секции: {', '.join(map(str, dead)) if dead else 'нет'}")
+        return "\n".join(lines)
+
+
+def prune_strategy(strategy, dead):
+    """Стратегия без секций dead; --wf-* сужаются до портов оставшихся секций
+
+    Хотя бы одна секция всегда остается. Порядок оставшихся секций
+    сохраняется: winws применяет первую подходящую.
+    """
+    dead = set(dead)
+    sections = [s for s in strategy.sections if s.index not in dead] or strategy.sections[:1]
+
+    global_args = []
+    for arg in strategy.global_args:
+        opt, value = split_option(arg)
+        protocol = opt[len("--wf-"):] if opt in ("--wf-tcp", "--wf-udp") else None
+        if protocol is None:
+            global_args.append(arg)
+            continue
+        divert = strategy.divert(protocol)
+        ports = PortSet()
+        for section in sections:
+            ports = ports | section.ports(protocol, divert)
+        if ports:
+            global_args.append(f"{opt}={ports}")
+    return Strategy(f"{strategy.name} (PRUNED)", global_args, sections, path=strategy.path)
+
+
+def _bat_arg(arg, bin_dir, lists_dir):
+    opt, value = split_option(arg)
+    if value is None:
+        return arg
+    replaced = value.replace(bin_dir, "%BIN%").replace(lists_dir, "%LISTS%")
+    if replaced != value or " " in value:
+        return f'{opt}="{replaced}"'
+    return arg
+
+
+def strategy_to_bat(strategy, game_filter, target=None):
+    """Текст bat файла в формате стратегий из папки general
+
+    Если bat файл сохраняется не рядом с исходной стратегией (target),
+    папка стратегии, bin и lists записываются абсолютными путями.
+    """
+    base = os.path.dirname(os.path.abspath(strategy.path))
+    bin_dir = os.path.join(base, "bin", "")
+    lists_dir = os.path.join(base, "lists", "")
+    beside = target is None or (os.path.normcase(os.path.dirname(os.path.abspath(target)))
+                                == os.path.normcase(base))
+    root = "%~dp0" if beside else os.path.join(base, "")
+
+    lines = [
+        "@echo off",
+        "chcp 65001 > nul",
+        ":: 65001 - UTF-8",
+        f":: Сгенерировано section_analytics.py из {os.path.basename(strategy.path)} (GameFilter={game_filter})",
+        "",
+        f'cd /d "{root}"',
+        "if not defined AETHER_LAUNCH call service.bat status_zapret",
+        "echo:",
+        "",
+        f'set "BIN={root}bin\\"',
+        f'set "LISTS={root}lists\\"',
+        "cd /d %BIN%",
+        "",
+    ]
+    head = " ".join(_bat_arg(a, bin_dir, lists_dir) for a in strategy.global_args)
+    body = [" ".join(_bat_arg(a, bin_dir, lists_dir) for a in s.args) for s in strategy.sections]
+    lines.append(f'start "zapret: %~n0" /min "%BIN%winws.exe" {head} ^')
+    lines.extend(f"{section} --new ^" for section in body[:-1])
+    lines.append(body[-1])
+    return "\r\n".join(lines) + "\r\n"
+
+
+def analyze(strategy, backend, winws_path, duration, profile_base=1, ready_timeout=10):
+    """Запускает winws с --debug=1 на duration секунд и возвращает SectionReport"""
+    argv = [a for a in strategy.global_args if not a.startswith("--debug")] + ["--debug=1"]
+    probe = Strategy(strategy.name, argv, strategy.sections, path=strategy.path)
+
+    counters = SectionCounters(len(strategy.sections))
+    parser = SectionHitParser(counters, profile_base)
+    process = backend.spawn_winws(winws_path, probe.argv())
+    reader = OutputReader(process.stdout, max_lines=50)
+    reader.add_listener(parser.feed)
+    try:
+        readiness = ReadinessDetector(reader, lambda: process.poll() is None, timeout=ready_timeout).wait()
+        if not readiness.ready:
+            tail = "\n".join(readiness.output[-5:])
+            raise RuntimeError(f"winws не запустился ({readiness.reason})\n{tail}".strip())
+        started = time.monotonic()
+        while time.monotonic() - started < duration and process.poll() is None:
+            time.sleep(0.1)
+        elapsed = time.monotonic() - started
+    finally:
+        process.kill()
+        process.wait()
+        reader.closed_event.wait(timeout=2)
+    print(f"Разобрано строк вывода: {parser.lines}")
+    return SectionReport(strategy, counters, elapsed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Совпадения по секциям стратегии и поиск мертвых секций")
+    parser.add_argument("bat", help="имя bat файла в папке general или путь к нему")
+    parser.add_argument("--duration", type=float, default=60, help="длительность замера, сек")
+    parser.add_argument("--game-filter", default="12")
+    parser.add_argument("--profile-base", type=int, default=1,
+                        help="номер первой секции в выводе winws (0 — профиль по умолчанию)")
+    parser.add_argument("--output", help="сохранить стратегию без мертвых секций в этот bat файл")
+    parser.add_argument("--fake", action="store_true", help="использовать fake_winws.py вместо winws.exe")
+    parser.add_argument("--hit-weights", help="веса совпадений секций для fake_winws.py")
+    args = parser.parse_args(argv)
+
+    path = args.bat if os.path.exists(args.bat) else os.path.join(GENERAL_DIR, args.bat)
+    strategy = parse_bat(path, game_filter=args.game_filter)
+    winws_path = os.path.join(os.path.dirname(os.path.abspath(path)), "bin", "winws.exe")
+    if args.fake:
+        extra = ["--hit-weights", args.hit_weights] if args.hit_weights else []
+        backend = FakeWinwsBackend(extra_args=extra)
+    else:
+        backend = default_backend()
+
+    report = analyze(strategy, backend, winws_path, args.duration, args.profile_base)
+    print(report)
+
+    dead = report.dead_sections()
+    if dead and args.output:
+        pruned = prune_strategy(strategy, dead)
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            f.write(strategy_to_bat(pruned, args.game_filter, args.output))
+        print(f"Стратегия без мертвых секций: {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
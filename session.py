@@ -0,0 +1,544 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import threading
+import psutil
+from PySide6.QtCore import QObject, QThread, QSettings, QTimer, Signal
+
+from updater import UpdateChecker, read_local_version
+from preconditions import PreconditionCache
+from timing import PhaseTimer
+from readiness import OutputReader, ReadinessDetector, ReadinessResult
+from strategy_registry import StrategyRegistry, MAIN_BAT_FILE
+from sharding import shard_strategy, validate_shards, ShardGroup
+from platform_backend import default_backend
+from discord_cache import clean_cache
+from discord_control import capture_discord_instances, discord_processes, relaunch_discord
+from autohostlist import AutoHostlist, merged_list_path, auto_list_path, replace_hostlist, add_hostlist_auto
+from session_journal import SessionJournal
+from network_monitor import NetworkMonitor
+from connectivity import check_connectivity, network_id
+from traffic import TrafficMonitor
+from hostlist_resolver import HostlistResolver, dns_backend, add_resolved_ipset, resolved_ipset_path
+from fake_payload import PayloadLibrary, load_payloads, apply_payloads
+from storage import app_data_path, load_json
+
+
+class WorkerThread(QThread):
+    """Поток для выполнения тяжелых операций в фоне
+
+    succeeded — операция завершилась без исключения, error — с ошибкой.
+    finished от QThread приходит в обоих случаях.
+    """
+    succeeded = Signal()
+    error = Signal(str)
+
+    def __init__(self, operation, *args, **kwargs):
+        super().__init__()
+        self.operation = operation
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            self.operation(*self.args, **self.kwargs)
+            self.succeeded.emit()
+        except Exception as e:
+            self.error.emit(str(e) or type(e).__name__)
+
+
+class BypassSession(QObject):
+    """Состояние обхода и операции запуска/остановки, не зависящие от окна
+
+    Окно (MainWindow) и значок в трее работают с одной сессией, поэтому окно
+    можно уничтожить и создать заново, не останавливая winws.
+    """
+    update_checked = Signal(object)
+
+    def __init__(self, backend=None):
+        super().__init__()
+
+        self.settings = QSettings("Aether", "AetherApp")
+
+        # Платформенные операции с процессами (запуск, завершение, поиск)
+        self.backend = backend or default_backend()
+
+        self.process = None
+        self.winws_output = None
+        self.shard_group = None
+        self.discord_instances = []
+        self.last_swap = None
+
+        # Запуск и остановка не должны выполняться одновременно (окно и трей)
+        self._operation_lock = threading.Lock()
+
+        # Выбранная стратегия: основной метод или bat файл из списка
+        self.is_alternative_mode = False
+        self.selected_bat_file = MAIN_BAT_FILE
+
+        # bat стратегии из папки general (отслеживаются, разбираются по запросу)
+        self.strategies = StrategyRegistry()
+
+        # Журнал запущенного обхода: после перезапуска Aether winws принимается без перезапуска
+        self.journal = SessionJournal()
+        self.adopted = False
+        # Стратегия запущенного winws (None — неизвестна или обход остановлен)
+        self.active_strategy = None
+        self.adopt()
+        # Итог последней очистки кэша Discord (clean_discord_cache)
+        self.cache_report = None
+
+        # Системные предусловия запуска проверяем заранее и держим в памяти
+        self.preconditions = PreconditionCache(backend=self.backend)
+        self.preconditions.warm_up()
+
+        # Выученные домены собираются вместе с list-general.txt в папке данных (настройка hostlist/auto)
+        self.auto_hostlist = None
+        if self.settings.value("hostlist/auto", False, type=bool):
+            self.auto_hostlist = AutoHostlist(
+                max_entries=self.settings.value("hostlist/max_entries", 1000, type=int))
+            self.hostlist_timer = QTimer(self)
+            self.hostlist_timer.timeout.connect(self.refresh_hostlist)
+            self.hostlist_timer.start(10 * 60 * 1000)
+
+        # Адреса доменов hostlist для сопоставления по IP (hostlist/resolve, hostlist/dns_server)
+        self.resolver = None
+        if self.settings.value("hostlist/resolve", False, type=bool):
+            self.resolver = HostlistResolver(dns_backend(self.settings.value("hostlist/dns_server", "", type=str)))
+            self.resolve_timer = QTimer(self)
+            self.resolve_timer.timeout.connect(self.refresh_resolved_ipset)
+            self.resolve_timer.start(10 * 60 * 1000)
+            self.refresh_resolved_ipset()
+
+        # Фейки из библиотеки general/bin/payloads вместо файлов из bat (payload/tls, payload/quic)
+        self.fake_payloads = load_payloads(
+            self.settings, PayloadLibrary(os.path.join(self.strategies.directory, "bin", "payloads")))
+
+        # Смена сети (Wi-Fi, VPN, адаптер) запускает проверку обхода (настройка network/monitor)
+        self._health_checking = False
+        self.network_monitor = None
+        if self.settings.value("network/monitor", True, type=bool):
+            self.network_monitor = NetworkMonitor(self)
+            self.network_monitor.network_changed.connect(self.on_network_changed)
+            self.network_monitor.start()
+
+        # Учет трафика Discord в буферах фиксированного размера (включается настройкой traffic/enabled;
+        # traffic/interval и traffic/background_interval в мс)
+        self.traffic = None
+        if self.settings.value("traffic/enabled", False, type=bool):
+            self.traffic = TrafficMonitor(self, self.settings.value("traffic/interval", 1000, type=int),
+                                          background_interval=self.settings.value(
+                                              "traffic/background_interval", 60000, type=int))
+
+        # Проверка обновлений в фоне (не чаще раза в TTL), запуск ее не ждет
+        self.update_checker = UpdateChecker(read_local_version())
+        self.update_checked.connect(self.on_update_checked)
+        self.update_checker.check_async(self.update_checked.emit)
+
+    def on_update_checked(self, result):
+        """Вызывается в GUI потоке по завершении фоновой проверки обновлений"""
+        if result.error:
+            print(f"Не удалось проверить обновления: {result.error}")
+        elif result.update_available:
+            print(f"Доступна новая версия: {result.remote_version} ({result.release_url})")
+        else:
+            print(f"Установлена последняя версия: {result.local_version}")
+
+    def adopt(self):
+        """Принимает winws, оставшийся от прошлого запуска Aether, если он совпадает с журналом"""
+        started = time.perf_counter()
+        try:
+            state = self.journal.verify(self.backend)
+        except Exception as e:
+            print(f"Не удалось проверить журнал сессии: {e}")
+            state = None
+        if state is None:
+            if self.journal.load() is not None:
+                print("Процессы из журнала сессии не найдены или изменились, журнал очищен")
+                self.journal.clear()
+            return False
+
+        self.is_alternative_mode = state["alternative"]
+        if self.is_alternative_mode:
+            self.selected_bat_file = state["strategy"]
+        self.adopted = True
+        self.active_strategy = state["strategy"]
+        pids = ", ".join(str(p["pid"]) for p in state["processes"])
+        print(f"Принят запущенный обход: {state['strategy']} (PID: {pids}), "
+              f"проверка {(time.perf_counter() - started) * 1000:.1f} мс")
+        if state.get("shards", 1) > 1:
+            print("Шарды приняты без перезапуска упавших: перезапустите обход, чтобы включить контроль")
+        return True
+
+    def record_journal(self, shards):
+        """Записывает в журнал запущенные процессы winws"""
+        try:
+            processes = self.backend.running_winws()
+            if processes:
+                self.journal.record(processes, self.current_bat_file(), self.is_alternative_mode, shards)
+        except Exception as e:
+            print(f"Не удалось записать журнал сессии: {e}")
+
+    def shutdown(self):
+        """Завершение Aether: обход останавливается, если не включена настройка session/keep_running"""
+        if self.settings.value("session/keep_running", False, type=bool) and self.is_winws_running():
+            print("Обход оставлен работать, он будет принят при следующем запуске Aether")
+            return
+        self.kill_all_processes()
+
+    def static_hostlist(self):
+        return os.path.join(self.strategies.directory, "lists", "list-general.txt")
+
+    def hostlist_path(self):
+        """hostlist стратегий: собранный с выученными доменами или статический list-general.txt"""
+        if self.auto_hostlist is not None and os.path.exists(merged_list_path()):
+            return merged_list_path()
+        return self.static_hostlist()
+
+    def refresh_hostlist(self):
+        """Собирает list-general.txt в папке данных из статического списка и auto-hostlist winws"""
+        if self.auto_hostlist is None:
+            return
+        try:
+            self.auto_hostlist.refresh(self.static_hostlist(), merged_list_path(), [auto_list_path()])
+        except OSError as e:
+            print(f"Не удалось обновить auto-hostlist: {e}")
+
+    def on_network_changed(self, changes):
+        """Сеть изменилась: проверяем обход в фоне, при настройке network/restart перезапускаем"""
+        print("Сеть изменилась: " + "; ".join(changes))
+        found = load_json(app_data_path("strategy_search.json"), {}).get(network_id())
+        if found:
+            print(f"Для этой сети поиск нашел стратегию на основе {found['template']} (оценка {found['score']:.2f})")
+        if self.active_strategy is None or self._health_checking:
+            return
+        self._health_checking = True
+        restart = self.settings.value("network/restart", False, type=bool)
+        threading.Thread(target=self.check_health, args=(restart,), daemon=True).start()
+
+    def check_health(self, restart=False):
+        """Жив ли winws и доступен ли Discord через обход (вызывается в фоновом потоке)"""
+        try:
+            started = time.perf_counter()
+            running = self.is_winws_running()
+            healthy = running and check_connectivity()
+            print(f"Проверка обхода после смены сети: {'в порядке' if healthy else 'не работает'} "
+                  f"(winws {'запущен' if running else 'не запущен'}, {(time.perf_counter() - started) * 1000:.0f} мс)")
+            if not healthy and restart and self.active_strategy is not None:
+                print("Перезапуск обхода после смены сети")
+                self.restart()
+            return healthy
+        except Exception as e:
+            print(f"Ошибка проверки обхода: {e}")
+            return False
+        finally:
+            self._health_checking = False
+
+    def refresh_resolved_ipset(self):
+        """Разрешает устаревшие домены hostlist и обновляет ipset-hostlist.txt в фоне"""
+        hostlist = self.hostlist_path()
+
+        def run():
+            try:
+                self.resolver.update(hostlist, resolved_ipset_path())
+            except Exception as e:
+                print(f"Не удалось обновить адреса hostlist: {e}")
+
+        threading.Thread(target=run, name="aether-resolver", daemon=True).start()
+
+    def launch_strategy(self, name, game_filter):
+        """Стратегия для прямого запуска winws
+
+        С hostlist/auto list-general.txt заменяется собранным списком из папки
+        данных, а секции с ним получают --hostlist-auto; с hostlist/resolve
+        секции hostlist дополняются ipset, с payload/tls и payload/quic
+        фейки-файлы заменяются фейками из библиотеки.
+        """
+        strategy = self.strategies.strategy(name, game_filter)
+        hostlist = self.hostlist_path()
+        if hostlist != self.static_hostlist():
+            strategy = replace_hostlist(strategy, self.static_hostlist(), hostlist)
+        if self.fake_payloads:
+            strategy = apply_payloads(strategy, self.fake_payloads)
+        if self.resolver is not None:
+            strategy = add_resolved_ipset(strategy, resolved_ipset_path(), hostlist)
+        if self.auto_hostlist is not None:
+            # После ipset: копии секций с --ipset не должны учиться доменам
+            strategy = add_hostlist_auto(
+                strategy, hostlist, auto_list_path(),
+                self.settings.value("hostlist/auto_fail_threshold", 3, type=int),
+                self.settings.value("hostlist/auto_fail_time", 60, type=int))
+        return strategy
+
+    def current_bat_file(self):
+        """bat файл, который будет запущен"""
+        # Основной режим - всегда general (ALT).bat
+        return self.selected_bat_file if self.is_alternative_mode else MAIN_BAT_FILE
+
+    def is_winws_running(self):
+        """Проверяет запущен ли процесс winws.exe"""
+        try:
+            return self.backend.is_running(self.backend.winws_name)
+        except Exception as e:
+            print(f"Ошибка при проверке процесса: {e}")
+            return False
+
+    def supervise(self):
+        """Перезапускает упавшие шарды, если сейчас не идет запуск или остановка"""
+        if self.shard_group is None or not self._operation_lock.acquire(blocking=False):
+            return
+        try:
+            if self.shard_group is not None:
+                self.shard_group.supervise()
+        finally:
+            self._operation_lock.release()
+
+    def kill_discord_processes(self, timeout=5.0):
+        # Запоминаем запущенные клиенты, чтобы вернуть их после запуска обхода
+        self.discord_instances = capture_discord_instances()
+        processes = discord_processes()
+        if not processes:
+            return
+
+        print("Завершаю процессы Discord...")
+
+        for process_name in sorted({proc.info["name"] for proc in processes}):
+            try:
+                if self.backend.kill_by_name(process_name):
+                    print(f"Процесс {process_name} успешно завершен")
+
+            except Exception as e:
+                print(f"Ошибка при завершении {process_name}: {e}")
+
+        # Ждем фактического завершения процессов вместо фиксированной паузы
+        _, alive = psutil.wait_procs(processes, timeout=timeout)
+        if alive:
+            print(f"Не завершились за {timeout:.0f} с: {', '.join(str(proc.pid) for proc in alive)}")
+        else:
+            print("Все процессы Discord завершены")
+
+    def clean_discord_cache(self):
+        """Очищает кэш Discord (вызывается в фоновом потоке), итог — в cache_report
+
+        discord/cache_max_age_days и discord/cache_max_mb включают щадящий режим:
+        удаляются только давно не использованные файлы и лишнее сверх лимита.
+        """
+        max_age_days = self.settings.value("discord/cache_max_age_days", 0, type=float)
+        max_mb = self.settings.value("discord/cache_max_mb", 0, type=float)
+        self.cache_report = clean_cache(max_age=max_age_days * 86400 or None,
+                                        max_bytes=int(max_mb * 1024 * 1024) or None)
+        print(f"Кэш Discord: {self.cache_report}")
+
+    def start(self):
+        """Запускает выбранную стратегию (вызывается в фоновом потоке)"""
+        with self._operation_lock:
+            self._start()
+
+    def _start(self):
+        timer = PhaseTimer("Запуск")
+
+        with timer.phase("kill_discord"):
+            self.kill_discord_processes()
+
+        # Предусловия берем из кэша вместо status_zapret/tcp_enable/load_game_filter в bat файле
+        hits_before, misses_before = self.preconditions.hits, self.preconditions.misses
+        with timer.phase("preconditions"):
+            service_state = self.preconditions.get("zapret_service")
+            if service_state == "RUNNING":
+                # Перед отказом проверяем службу заново: ее могли только что остановить
+                self.preconditions.on_service_changed()
+                service_state = self.preconditions.get("zapret_service")
+            if service_state == "RUNNING":
+                raise RuntimeError("Служба zapret уже запущена. Удалите ее через service.bat "
+                                   "(Remove Services), чтобы запускать bat файлы отдельно")
+            self.preconditions.ensure_tcp_timestamps()
+            launch_env = self.preconditions.launch_environment()
+        print(f"Предусловия: из кэша {self.preconditions.hits - hits_before}, "
+              f"проб {self.preconditions.misses - misses_before} "
+              f"(bat файл пропускает status_zapret, tcp_enable и load_game_filter)")
+
+        with timer.phase("hostlist"):
+            self.refresh_hostlist()
+
+        bat_path = self.strategies.path(self.current_bat_file())
+
+        if os.path.exists(bat_path):
+            try:
+                # Несколько процессов winws делят секции стратегии по портам (настройка winws/shards)
+                shard_count = self.settings.value("winws/shards", 1, type=int)
+                # Собранный hostlist, адреса hostlist и фейки из библиотеки подставляются
+                # в разобранную стратегию, поэтому bat файл не используется
+                if (shard_count > 1 or self.auto_hostlist is not None or self.resolver is not None
+                        or self.fake_payloads):
+                    readiness = self._spawn_sharded(bat_path, launch_env, shard_count, timer)
+                else:
+                    # AETHER_LAUNCH отключает в bat файле проверки, которые Aether уже сделал сам
+                    env = dict(os.environ, AETHER_LAUNCH="1", **launch_env)
+
+                    with timer.phase("spawn"):
+                        self.process = self.backend.spawn_strategy(bat_path, env)
+
+                    print(f"Запущен файл: {bat_path} (PID: {self.process.pid})")
+
+                    # Ждем реальной готовности winws вместо фиксированной паузы
+                    self.winws_output = OutputReader(self.process.stdout)
+                    with timer.phase("readiness"):
+                        readiness = ReadinessDetector(self.winws_output, self.is_winws_running).wait()
+                print(f"Готовность winws: {readiness}")
+
+                if self.discord_instances and self.settings.value("discord/relaunch", True, type=bool):
+                    if readiness.ready:
+                        with timer.phase("relaunch_discord"):
+                            relaunch_discord(self.discord_instances)
+                        print(f"Простой Discord: {timer.total() * 1000:.0f} мс")
+                    else:
+                        print("Discord не перезапущен: обход не запустился")
+                timer.report()
+
+                if not readiness.ready:
+                    tail = "\n".join(readiness.output[-5:])
+                    raise RuntimeError(f"winws не запустился ({readiness.reason})\n{tail}".strip())
+                self.record_journal(shard_count)
+                self.active_strategy = self.current_bat_file()
+
+            except Exception as e:
+                print(f"Ошибка при запуске файла: {e}")
+                # Частая причина — служба zapret, установленная в обход Aether: следующий запуск проверит ее заново
+                self.preconditions.on_service_changed()
+                raise e
+        else:
+            error_msg = f"Файл не найден: {bat_path}"
+            print(error_msg)
+            raise FileNotFoundError(error_msg)
+
+    def _spawn_sharded(self, bat_path, launch_env, shard_count, timer):
+        """Запускает стратегию несколькими процессами winws с непересекающимися --wf-*"""
+        strategy = self.launch_strategy(os.path.basename(bat_path), launch_env["GameFilter"])
+        shards = shard_strategy(strategy, shard_count)
+        errors = validate_shards(strategy, shards)
+        if errors:
+            raise RuntimeError("Некорректное разбиение стратегии:\n" + "\n".join(errors))
+
+        winws_path = os.path.join(os.path.dirname(bat_path), "bin", "winws.exe")
+        self.shard_group = ShardGroup(shards, winws_path, self.backend)
+        with timer.phase("spawn"):
+            self.shard_group.start()
+        with timer.phase("readiness"):
+            results = self.shard_group.wait_ready()
+
+        print(f"Стратегия {strategy.name}: процессов winws — {len(shards)}")
+        return ReadinessResult(
+            all(r.ready for r in results),
+            max(r.latency for r in results),
+            ", ".join(r.reason for r in results),
+            [line for r in results for line in r.output]
+        )
+
+    def hot_swap(self):
+        """Переключает запущенный обход на текущую стратегию с минимальным разрывом
+
+        Аргументы новой стратегии готовятся до остановки старой, winws
+        запускается напрямую (без cmd и bat файла), окна-запускатели
+        закрываются уже после запуска, Discord не перезапускается. Если обход
+        не запущен, ничего не делает. Вызывается в фоновом потоке.
+        """
+        with self._operation_lock:
+            if not self.is_winws_running():
+                return None
+            if self.active_strategy == self.current_bat_file():
+                print(f"Стратегия {self.active_strategy} уже запущена")
+                return None
+            timer = PhaseTimer("Смена стратегии")
+
+            with timer.phase("prepare"):
+                launch_env = self.preconditions.launch_environment()
+                strategy = self.launch_strategy(self.current_bat_file(), launch_env["GameFilter"])
+                shard_count = self.settings.value("winws/shards", 1, type=int)
+                shards = shard_strategy(strategy, shard_count)
+                errors = validate_shards(strategy, shards)
+                if errors:
+                    raise RuntimeError("Некорректное разбиение стратегии:\n" + "\n".join(errors))
+                winws_path = os.path.join(self.strategies.directory, "bin", "winws.exe")
+                group = ShardGroup(shards, winws_path, self.backend)
+
+            # Разрыв обхода: от остановки старого winws до готовности нового
+            gap_started = time.perf_counter()
+            with timer.phase("stop"):
+                if self.shard_group is not None:
+                    self.shard_group.stop()
+                    self.shard_group = None
+                self.backend.kill_by_name(self.backend.winws_name)
+            with timer.phase("spawn"):
+                group.start()
+                self.shard_group = group
+            with timer.phase("readiness"):
+                results = group.wait_ready()
+            gap = time.perf_counter() - gap_started
+
+            with timer.phase("cleanup"):
+                self.backend.kill_launchers()
+                if self.process is not None:
+                    self.backend.kill_tree(self.process.pid)
+                    self.process = None
+            timer.report()
+
+            self.last_swap = {"gap": gap, "phases": timer.as_dict(), "strategy": strategy.name}
+            print(f"Разрыв обхода при смене стратегии: {gap * 1000:.0f} мс")
+            if not all(r.ready for r in results):
+                reasons = ", ".join(r.reason for r in results)
+                raise RuntimeError(f"winws не запустился после смены стратегии ({reasons})")
+            self.record_journal(len(shards))
+            self.active_strategy = self.current_bat_file()
+            return gap
+
+    def stop(self):
+        """Останавливает обход (вызывается в фоновом потоке)"""
+        with self._operation_lock:
+            self.kill_all_processes()
+
+    def restart(self):
+        """Перезапускает обход с текущей стратегией (вызывается в фоновом потоке)"""
+        with self._operation_lock:
+            self.kill_all_processes()
+            self._start()
+
+    def kill_all_processes(self):
+        """Завершает все запущенные процессы"""
+        try:
+            print("Завершаю все фоновые процессы...")
+            self.journal.clear()
+            self.adopted = False
+            self.active_strategy = None
+
+            # Завершаем все процессы winws.exe
+            if self.backend.kill_by_name(self.backend.winws_name):
+                print("✓ Все процессы winws.exe успешно завершены")
+            else:
+                print("✓ Процессы winws.exe не найдены")
+
+            # Завершаем все процессы cmd.exe связанные с bat файлами
+            self.backend.kill_launchers()
+            print("✓ Процессы cmd.exe завершены")
+
+            # Останавливаем шарды, если стратегия была разделена
+            if self.shard_group is not None:
+                self.shard_group.stop()
+                self.shard_group = None
+                print("✓ Шарды winws остановлены")
+
+            # Завершаем процесс BAT если он есть
+            if self.process is not None:
+                try:
+                    pid = self.process.pid
+                    self.backend.kill_tree(pid)
+                    print(f"✓ Завершен процесс BAT с PID: {pid}")
+                except:
+                    pass
+
+                self.process = None
+
+            print("✅ Все фоновые процессы успешно завершены")
+
+        except Exception as e:
+            print(f"Ошибка при завершении процесса: {e}")
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import hashlib
+
+from storage import app_data_path, load_json, atomic_write_json
+
+JOURNAL_VERSION = 1
+
+# psutil отдает время создания как float; при повторном чтении оно может отличаться на доли мс
+CREATE_TIME_TOLERANCE = 0.01
+
+
+def argv_hash(cmdline):
+    return hashlib.sha256("\0".join(cmdline).encode("utf-8")).hexdigest()
+
+
+class SessionJournal:
+    """Журнал запущенного обхода: процессы winws и стратегия
+
+    Записывается атомарно после успешного запуска и удаляется при
+    остановке. Если Aether перезапустился, а winws из журнала еще работает
+    (тот же PID, время создания и командная строка), обход можно принять
+    как уже запущенный, не перезапуская winws и Discord.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or app_data_path("session.json")
+
+    def load(self):
+        data = load_json(self.path)
+        if not isinstance(data, dict) or data.get("version") != JOURNAL_VERSION:
+            return None
+        return data
+
+    def record(self, processes, strategy, alternative, shards=1):
+        """processes — описания winws от backend.describe()"""
+        atomic_write_json(self.path, {
+            "version": JOURNAL_VERSION,
+            "strategy": strategy,
+            "alternative": alternative,
+            "shards": shards,
+            "started_at": time.time(),
+            "processes": [{
+                "pid": p["pid"],
+                "create_time": p["create_time"],
+                "argv_hash": argv_hash(p["cmdline"]),
+            } for p in processes],
+        })
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def verify(self, backend):
+        """Запись журнала, если все ее процессы winws живы и совпадают, иначе None"""
+        data = self.load()
+        if not data or not data.get("processes"):
+            return None
+        for entry in data["processes"]:
+            current = backend.describe(entry["pid"])
+            if current is None:
+                return None
+            if abs(current["create_time"] - entry["create_time"]) > CREATE_TIME_TOLERANCE:
+                return None
+            if argv_hash(current["cmdline"]) != entry["argv_hash"]:
+                return None
+        return data
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+from PySide6.QtCore import Qt, QRect, QRectF
+from PySide6.QtGui import QColor, QImage, QPainter, QPainterPath, QPixmap
+from PySide6.QtWidgets import QGraphicsScene, QGraphicsPathItem, QGraphicsBlurEffect
+
+# Готовые тени: (размер окна, прямоугольник, параметры) -> QPixmap
+_shadow_cache = {}
+# Размытые заготовки для 9-slice: (радиус, размытие, цвет) -> QImage
+_tile_cache = {}
+
+
+def shadow_tile(radius, blur, color):
+    """Размытая тень скругленного квадрата — заготовка для 9-slice
+
+    Размытие через QGraphicsBlurEffect выполняется один раз на набор
+    параметров, дальше тень любого размера собирается из кусков заготовки.
+    """
+    key = (radius, blur, color.rgba())
+    tile = _tile_cache.get(key)
+    if tile is not None:
+        return tile
+
+    side = 2 * (blur + radius) + 1
+    path = QPainterPath()
+    path.addRoundedRect(QRectF(blur, blur, 2 * radius + 1, 2 * radius + 1), radius, radius)
+
+    scene = QGraphicsScene(0, 0, side, side)
+    item = QGraphicsPathItem(path)
+    item.setPen(Qt.PenStyle.NoPen)
+    item.setBrush(color)
+    effect = QGraphicsBlurEffect()
+    effect.setBlurRadius(blur)
+    effect.setBlurHints(QGraphicsBlurEffect.BlurHint.QualityHint)
+    item.setGraphicsEffect(effect)
+    scene.addItem(item)
+
+    tile = QImage(side, side, QImage.Format.Format_ARGB32_Premultiplied)
+    tile.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(tile)
+    scene.render(painter, QRectF(0, 0, side, side), QRectF(0, 0, side, side))
+    painter.end()
+
+    _tile_cache[key] = tile
+    return tile
+
+
+def shadow_pixmap(size, rect, radius=25, blur=20, offset=(0, 5), color=QColor(0, 0, 0, 60)):
+    """Тень под прямоугольником rect на прозрачном холсте размера size (кэшируется)"""
+    key = (size.width(), size.height(), rect.getRect(), radius, blur, offset, color.rgba())
+    pixmap = _shadow_cache.get(key)
+    if pixmap is not None:
+        return pixmap
+
+    tile = shadow_tile(radius, blur, color)
+    corner = blur + radius
+    side = tile.width()
+
+    target = QRect(rect).translated(*offset).adjusted(-blur, -blur, blur, blur)
+    left, top = target.left(), target.top()
+    width, height = target.width(), target.height()
+    middle_w = max(0, width - 2 * corner)
+    middle_h = max(0, height - 2 * corner)
+
+    # 9 кусков: углы без масштабирования, края и центр растягиваются
+    xs = [(left, 0, corner, corner), (left + corner, corner, middle_w, 1),
+          (left + corner + middle_w, side - corner, corner, corner)]
+    ys = [(top, 0, corner, corner), (top + corner, corner, middle_h, 1),
+          (top + corner + middle_h, side - corner, corner, corner)]
+
+    pixmap = QPixmap(size)
+    pixmap.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+    for dx, sx, dw, sw in xs:
+        for dy, sy, dh, sh in ys:
+            if dw and dh:
+                painter.drawImage(QRect(dx, dy, dw, dh), tile, QRect(sx, sy, sw, sh))
+    painter.end()
+
+    _shadow_cache[key] = pixmap
+    return pixmap
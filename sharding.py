@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+
+from strategy import PortSet, Strategy, Section, split_option
+from readiness import OutputReader, ReadinessDetector
+from platform_backend import default_backend
+
+PROTOCOLS = ("tcp", "udp")
+
+
+def _section_groups(strategy):
+    """Группирует секции, которые могут поймать один и тот же пакет
+
+    winws применяет первую подходящую секцию, поэтому секции с общими
+    портами должны оставаться в одном процессе и в исходном порядке.
+    """
+    divert = {p: strategy.divert(p) for p in PROTOCOLS}
+    ports = [{p: s.ports(p, divert[p]) for p in PROTOCOLS} for s in strategy.sections]
+
+    parent = list(range(len(strategy.sections)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(ports)):
+        for j in range(i + 1, len(ports)):
+            if any(ports[i][p] & ports[j][p] for p in PROTOCOLS):
+                parent[find(j)] = find(i)
+
+    groups = {}
+    for i in range(len(ports)):
+        group = groups.setdefault(find(i), {"sections": [], "tcp": PortSet(), "udp": PortSet()})
+        group["sections"].append(i)
+        for p in PROTOCOLS:
+            group[p] = group[p] | ports[i][p]
+    return list(groups.values()), divert
+
+
+def shard_strategy(strategy, count):
+    """Делит стратегию на не более чем count шардов с непересекающимися --wf-*
+
+    Порты из --wf-*, которые не ловит ни одна секция, достаются первому
+    шарду, чтобы объединение шардов совпадало с исходным перехватом.
+    """
+    groups, divert = _section_groups(strategy)
+    count = max(1, min(count, len(groups)))
+
+    # Самые тяжелые группы раскладываем первыми в наименее загруженный шард
+    shards = [{"sections": [], "tcp": PortSet(), "udp": PortSet()} for _ in range(count)]
+    for group in sorted(groups, key=lambda g: len(g["sections"]), reverse=True):
+        target = min(shards, key=lambda s: len(s["sections"]))
+        target["sections"].extend(group["sections"])
+        for p in PROTOCOLS:
+            target[p] = target[p] | group[p]
+
+    for p in PROTOCOLS:
+        covered = PortSet()
+        for shard in shards:
+            covered = covered | shard[p]
+        shards[0][p] = shards[0][p] | (divert[p] - covered)
+
+    other_globals = [a for a in strategy.global_args
+                     if split_option(a)[0] not in ("--wf-tcp", "--wf-udp")]
+    result = []
+    for i, shard in enumerate(shards):
+        global_args = [f"--wf-{p}={shard[p]}" for p in PROTOCOLS if shard[p]] + other_globals
+        sections = [Section(idx, strategy.sections[idx].args) for idx in sorted(shard["sections"])]
+        result.append(Strategy(f"{strategy.name} [{i + 1}/{count}]", global_args, sections,
+                               path=strategy.path))
+    return result
+
+
+def validate_shards(strategy, shards):
+    """Проверяет шардирование, возвращает список ошибок (пустой — все верно)
+
+    - наборы --wf-* шардов попарно не пересекаются;
+    - их объединение равно исходному --wf-*;
+    - каждая секция попала ровно в один шард и ловит только порты своего шарда.
+    """
+    errors = []
+    for p in PROTOCOLS:
+        union = PortSet()
+        for i, a in enumerate(shards):
+            for j in range(i + 1, len(shards)):
+                overlap = a.divert(p) & shards[j].divert(p)
+                if overlap:
+                    errors.append(f"{p}: шарды {i + 1} и {j + 1} пересекаются по {overlap}")
+            union = union | a.divert(p)
+        if union != strategy.divert(p):
+            errors.append(f"{p}: объединение шардов {union} не равно исходному {strategy.divert(p)}")
+
+    seen = {}
+    for i, shard in enumerate(shards):
+        for section in shard.sections:
+            if section.index in seen:
+                errors.append(f"секция {section.index} есть в шардах {seen[section.index] + 1} и {i + 1}")
+            seen[section.index] = i
+            original = strategy.sections[section.index]
+            for p in PROTOCOLS:
+                wanted = original.ports(p, strategy.divert(p))
+                if not wanted.issubset(shard.divert(p)):
+                    errors.append(f"секция {section.index}: {p} {wanted - shard.divert(p)} "
+                                  f"вне перехвата шарда {i + 1}")
+    missing = set(range(len(strategy.sections))) - set(seen)
+    if missing:
+        errors.append(f"секции без шарда: {sorted(missing)}")
+    return errors
+
+
+class ShardProcess:
+    """Один процесс winws внутри группы шардов"""
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.process = None
+        self.reader = None
+        self.restarts = 0
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+
+class ShardGroup:
+    """Несколько процессов winws, которые запускаются и останавливаются вместе"""
+
+    def __init__(self, shards, winws_path, backend=None, max_restarts=3):
+        self.shards = [ShardProcess(s) for s in shards]
+        self.winws_path = winws_path
+        self.backend = backend or default_backend()
+        self.max_restarts = max_restarts
+
+    def _spawn(self, shard):
+        shard.process = self.backend.spawn_winws(self.winws_path, shard.strategy.argv())
+        shard.reader = OutputReader(shard.process.stdout)
+        print(f"Запущен шард {shard.strategy.name} (PID: {shard.process.pid})")
+
+    def start(self):
+        for shard in self.shards:
+            self._spawn(shard)
+
+    def wait_ready(self, **kwargs):
+        """Ждет готовности всех шардов (они стартуют параллельно)"""
+        return [ReadinessDetector(s.reader, s.is_alive, **kwargs).wait() for s in self.shards]
+
+    def stop(self):
+        for shard in self.shards:
+            if shard.is_alive():
+                shard.process.kill()
+        for shard in self.shards:
+            if shard.process is not None:
+                try:
+                    shard.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    pass
+            shard.process = None
+
+    def status(self):
+        """"running" — живы все шарды, "degraded" — часть, "stopped" — ни одного"""
+        alive = sum(1 for s in self.shards if s.is_alive())
+        if alive == len(self.shards):
+            return "running"
+        return "degraded" if alive else "stopped"
+
+    def supervise(self):
+        """Перезапускает упавшие шарды (не больше max_restarts раз каждый)"""
+        for shard in self.shards:
+            if shard.process is not None and not shard.is_alive() and shard.restarts < self.max_restarts:
+                shard.restarts += 1
+                print(f"Шард {shard.strategy.name} завершился, перезапуск #{shard.restarts}")
+                self._spawn(shard)
+        return self.status()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Один экземпляр Aether на пользователя
+
+Первый запуск держит QLockFile и слушает QLocalServer. Повторный запуск
+подключается к нему, передает команды из своей командной строки (показать
+окно, запустить, остановить, выбрать стратегию) и завершается, не создавая
+GUI, не запрашивая права и не трогая winws.
+
+    python main.py --strategy "general (ALT2).bat" --start
+    python main.py --stop
+"""
+
+import json
+import time
+import hashlib
+
+from PySide6.QtCore import QObject, QLockFile, Signal
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from storage import app_data_dir, app_data_path
+
+CONNECT_TIMEOUT = 300  # мс
+REPLY_TIMEOUT = 1000   # мс
+
+ACTIONS = ("show", "start", "stop")
+
+
+def server_name():
+    """Имя локального сервера: свое для каждого пользователя (каталога данных Aether)"""
+    return "aether-" + hashlib.sha1(app_data_dir().encode("utf-8")).hexdigest()[:12]
+
+
+def parse_commands(argv):
+    """Команды из аргументов: --show, --start, --stop, --strategy ИМЯ
+
+    Выбор стратегии всегда выполняется первым, чтобы --start запускал уже ее.
+    """
+    commands = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--strategy":
+            name = next(args, None)
+            if name:
+                commands.append({"action": "strategy", "strategy": name})
+        elif arg.startswith("--strategy="):
+            commands.append({"action": "strategy", "strategy": arg.split("=", 1)[1]})
+        elif arg[2:] in ACTIONS and arg.startswith("--"):
+            commands.append({"action": arg[2:]})
+    commands.sort(key=lambda command: command["action"] != "strategy")
+    return commands
+
+
+def describe_commands(commands):
+    return ", ".join(f"{c['action']} {c['strategy']}" if c["action"] == "strategy" else c["action"]
+                     for c in commands)
+
+
+def send_commands(commands, timeout=CONNECT_TIMEOUT):
+    """Передает команды запущенному экземпляру; True если он их принял"""
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    if not socket.waitForConnected(timeout):
+        return False
+    try:
+        socket.write((json.dumps(commands) + "\n").encode("utf-8"))
+        socket.waitForBytesWritten(timeout)
+        if not socket.waitForReadyRead(REPLY_TIMEOUT):
+            return False
+        return bytes(socket.readLine().data()).strip() == b"ok"
+    finally:
+        socket.disconnectFromServer()
+
+
+def forward_to_running_instance(argv, wait=0.0):
+    """Вызывается до загрузки GUI: True если Aether уже запущен и принял команды
+
+    wait — сколько секунд повторять попытки (экземпляр, который только
+    запускается, начинает слушать не сразу).
+    """
+    started = time.perf_counter()
+    commands = parse_commands(argv) or [{"action": "show"}]
+    while not send_commands(commands):
+        if time.perf_counter() - started >= wait:
+            return False
+        time.sleep(0.1)
+
+    # process_time — процессорное время с запуска процесса, включая импорт модулей
+    print(f"Aether уже запущен, переданы команды: {describe_commands(commands)} "
+          f"({(time.perf_counter() - started) * 1000:.1f} мс, процессорное время запуска "
+          f"{time.process_time() * 1000:.0f} мс)")
+    return True
+
+
+class InstanceGuard(QObject):
+    """Блокировка первого экземпляра и прием команд от повторных запусков"""
+    commands_received = Signal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lock = QLockFile(app_data_path("instance.lock"))
+        # Блокировка считается устаревшей только если ее процесс завершился
+        self.lock.setStaleLockTime(0)
+        self.server = None
+
+    def acquire(self):
+        """True если это первый экземпляр; тогда начинает принимать команды"""
+        if not self.lock.tryLock(0):
+            return False
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+        # Блокировка у нас, значит сокет с этим именем остался от аварийно завершенного экземпляра
+        QLocalServer.removeServer(server_name())
+        if not self.server.listen(server_name()):
+            print(f"Не удалось принять команды повторных запусков: {self.server.errorString()}")
+        return True
+
+    def release(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        self.lock.unlock()
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.read_commands(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def read_commands(self, socket):
+        if not socket.canReadLine():
+            return
+        try:
+            commands = json.loads(bytes(socket.readLine().data()).decode("utf-8"))
+        except ValueError:
+            commands = None
+        valid = isinstance(commands, list) and all(
+            isinstance(c, dict) and (c.get("action") in ACTIONS or
+                                     c.get("action") == "strategy" and isinstance(c.get("strategy"), str))
+            for c in commands)
+        socket.write(b"ok\n" if valid else b"error\n")
+        socket.flush()
+        if valid:
+            self.commands_received.emit(commands)
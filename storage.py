@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import tempfile
+
+
+def app_data_dir():
+    """Возвращает каталог для служебных файлов Aether (создает при необходимости)"""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+    path = os.path.join(base, "Aether")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def app_data_path(name):
+    """Полный путь к служебному файлу в каталоге Aether"""
+    return os.path.join(app_data_dir(), name)
+
+
+def load_json(path, default=None):
+    """Читает JSON файл, при любой ошибке возвращает default"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _atomic_write(path, data, mode, **kwargs):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path, text, newline=None):
+    """Атомарно записывает текст: во временный файл рядом, затем os.replace"""
+    _atomic_write(path, text, "w", encoding="utf-8", newline=newline)
+
+
+def atomic_write_bytes(path, data):
+    """Атомарно записывает двоичные данные (см. atomic_write_text)"""
+    _atomic_write(path, data, "wb")
+
+
+def atomic_write_json(path, data):
+    """Атомарно записывает JSON (см. atomic_write_text)"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False))
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shlex
+
+# Опции winws, которые относятся ко всему процессу, а не к секции --new
+GLOBAL_OPTION_PREFIXES = ("--wf-", "--debug", "--ctrack-", "--ipcache-")
+
+PORT_MIN = 0
+PORT_MAX = 65535
+
+
+class PortSet:
+    """Множество портов в виде отсортированных непересекающихся диапазонов"""
+
+    __slots__ = ("ranges",)
+
+    def __init__(self, ranges=()):
+        merged = []
+        for lo, hi in sorted((int(lo), int(hi)) for lo, hi in ranges):
+            if lo > hi:
+                continue
+            if merged and lo <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+            else:
+                merged.append((lo, hi))
+        self.ranges = tuple(merged)
+
+    @classmethod
+    def parse(cls, text):
+        """Разбирает строку вида "80,443,1024-65535" """
+        ranges = []
+        for part in str(text).split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                lo, hi = part.split("-", 1)
+            else:
+                lo = hi = part
+            ranges.append((int(lo), int(hi)))
+        return cls(ranges)
+
+    @classmethod
+    def all(cls):
+        return cls([(PORT_MIN, PORT_MAX)])
+
+    def __or__(self, other):
+        return PortSet(self.ranges + other.ranges)
+
+    def __and__(self, other):
+        result = []
+        i = j = 0
+        a, b = self.ranges, other.ranges
+        while i < len(a) and j < len(b):
+            lo = max(a[i][0], b[j][0])
+            hi = min(a[i][1], b[j][1])
+            if lo <= hi:
+                result.append((lo, hi))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return PortSet(result)
+
+    def __sub__(self, other):
+        result = []
+        for lo, hi in self.ranges:
+            start = lo
+            for olo, ohi in other.ranges:
+                if ohi < start or olo > hi:
+                    continue
+                if olo > start:
+                    result.append((start, olo - 1))
+                start = max(start, ohi + 1)
+                if start > hi:
+                    break
+            if start <= hi:
+                result.append((start, hi))
+        return PortSet(result)
+
+    def __eq__(self, other):
+        return isinstance(other, PortSet) and self.ranges == other.ranges
+
+    def __hash__(self):
+        return hash(self.ranges)
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def __contains__(self, port):
+        return any(lo <= port <= hi for lo, hi in self.ranges)
+
+    def issubset(self, other):
+        return not (self - other)
+
+    def count(self):
+        return sum(hi - lo + 1 for lo, hi in self.ranges)
+
+    def __str__(self):
+        return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in self.ranges)
+
+    def __repr__(self):
+        return f"PortSet({str(self)!r})"
+
+
+def split_option(arg):
+    """"--name=value" -> ("--name", "value"); "--name" -> ("--name", None)"""
+    if "=" in arg:
+        name, value = arg.split("=", 1)
+        return name, value
+    return arg, None
+
+
+class Section:
+    """Одна секция стратегии (между --new)"""
+
+    def __init__(self, index, args):
+        self.index = index
+        self.args = list(args)
+
+    def options(self, name):
+        return [value for opt, value in map(split_option, self.args) if opt == name]
+
+    def option(self, name, default=None):
+        values = self.options(name)
+        return values[0] if values else default
+
+    def has_option(self, name):
+        return any(split_option(arg)[0] == name for arg in self.args)
+
+    def ports(self, protocol, divert):
+        """Порты протокола ("tcp"/"udp"), которые может поймать эта секция
+
+        Без --filter-tcp и --filter-udp секция ловит весь перехваченный
+        трафик; если задан фильтр только другого протокола — ничего.
+        """
+        own = self.option(f"--filter-{protocol}")
+        if own is not None:
+            return PortSet.parse(own) & divert
+        other = "udp" if protocol == "tcp" else "tcp"
+        if self.option(f"--filter-{other}") is not None:
+            return PortSet()
+        return divert
+
+    def __repr__(self):
+        return f"Section({self.index}, {' '.join(self.args)!r})"
+
+
+class Strategy:
+    """Разобранная стратегия winws: глобальные опции и секции"""
+
+    def __init__(self, name, global_args, sections, path=None):
+        self.name = name
+        self.global_args = list(global_args)
+        self.sections = list(sections)
+        self.path = path
+
+    def divert(self, protocol):
+        """Множество портов из --wf-tcp / --wf-udp"""
+        for arg in self.global_args:
+            opt, value = split_option(arg)
+            if opt == f"--wf-{protocol}" and value:
+                return PortSet.parse(value)
+        return PortSet()
+
+    def argv(self):
+        """Аргументы командной строки winws"""
+        args = list(self.global_args)
+        for i, section in enumerate(self.sections):
+            if i:
+                args.append("--new")
+            args.extend(section.args)
+        return args
+
+    def __repr__(self):
+        return f"Strategy({self.name!r}, {len(self.sections)} секций)"
+
+
+def _logical_lines(text):
+    """Склеивает строки bat файла, разделенные ^ в конце"""
+    lines = []
+    current = ""
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if line.endswith("^"):
+            current += line[:-1] + " "
+        else:
+            lines.append(current + line)
+            current = ""
+    if current:
+        lines.append(current)
+    return lines
+
+
+def split_args(args):
+    """Делит плоский список аргументов winws на глобальные опции и секции"""
+    global_args = []
+    sections = [[]]
+    for arg in args:
+        if arg == "--new":
+            sections.append([])
+        elif arg.startswith(GLOBAL_OPTION_PREFIXES):
+            global_args.append(arg)
+        else:
+            sections[-1].append(arg)
+    return global_args, [Section(i, s) for i, s in enumerate(sections)]
+
+
+def parse_bat(path, game_filter="12", bin_dir=None, lists_dir=None):
+    """Разбирает general*.bat в Strategy
+
+    %BIN%, %LISTS% и %GameFilter% подставляются так же, как это делает сам
+    bat файл при запуске.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    bin_dir = os.path.join(bin_dir or os.path.join(base, "bin"), "")
+    lists_dir = os.path.join(lists_dir or os.path.join(base, "lists"), "")
+
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+
+    for line in _logical_lines(text):
+        marker = line.find('winws.exe"')
+        if marker == -1 or "start " not in line.lower():
+            continue
+
+        lexer = shlex.shlex(line[marker + len('winws.exe"'):], posix=True)
+        lexer.whitespace_split = True
+        lexer.escape = ""
+        args = []
+        for token in lexer:
+            token = (token.replace("^!", "!")
+                          .replace("%BIN%", bin_dir)
+                          .replace("%LISTS%", lists_dir)
+                          .replace("%GameFilter%", game_filter))
+            args.append(token)
+
+        global_args, sections = split_args(args)
+        name = os.path.splitext(os.path.basename(path))[0]
+        return Strategy(name, global_args, sections, path=path)
+
+    raise ValueError(f"В файле {path} не найден запуск winws.exe")
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+from PySide6.QtCore import QObject, QTimer, QFileSystemWatcher, Signal
+
+from strategy import parse_bat
+
+MAIN_BAT_FILE = "general (ALT).bat"
+GENERAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "general")
+
+
+def is_strategy_file(name):
+    """bat стратегия, а не служебный файл (как в service.bat :service_install)"""
+    lower = name.lower()
+    return lower.endswith(".bat") and not lower.startswith("service")
+
+
+def strategy_sort_key(name):
+    """Порядок в списке: по варианту в скобках (ALT2 < ALT10), general.bat в конце"""
+    match = re.search(r"\((.*)\)", name)
+    variant = match.group(1) if match else ""
+    parts = [int(p) if p.isdigit() else p.lower() for p in re.split(r"(\d+)", variant)]
+    return (variant == "", parts)
+
+
+class StrategyRegistry(QObject):
+    """Найденные bat стратегии в папке general и их разобранные версии
+
+    Папка отслеживается через QFileSystemWatcher (если он недоступен —
+    опросом по таймеру). При изменениях пересканируется только список
+    файлов: сигналы отправляются лишь для добавленных, удаленных и
+    измененных файлов, а разбор стратегии выполняется при первом запросе.
+    """
+    strategy_added = Signal(str, int)  # имя, позиция среди альтернативных
+    strategy_removed = Signal(str)
+    strategy_changed = Signal(str)
+
+    def __init__(self, directory=GENERAL_DIR, main_file=MAIN_BAT_FILE, watch=True,
+                 poll_interval=2000, debounce=200):
+        super().__init__()
+        self.directory = os.path.abspath(directory)
+        self.main_file = main_file
+        self.version = 0
+        self._stamps = {}   # имя -> (mtime_ns, size)
+        self._parsed = {}   # (имя, GameFilter) -> (отметка, Strategy)
+        self.parse_count = 0
+
+        # Несколько событий подряд (сохранение в редакторе) схлопываются в одно сканирование
+        self._rescan_timer = QTimer(self)
+        self._rescan_timer.setSingleShot(True)
+        self._rescan_timer.setInterval(debounce)
+        self._rescan_timer.timeout.connect(self.rescan)
+
+        self.watcher = None
+        self.poll_timer = None
+        self._stamps = self._scan()
+
+        if watch:
+            self.watcher = QFileSystemWatcher(self)
+            if self.watcher.addPath(self.directory):
+                self.watcher.directoryChanged.connect(self.schedule_rescan)
+                self.watcher.fileChanged.connect(self.schedule_rescan)
+                self._watch_files()
+            else:
+                self.watcher = None
+        if self.watcher is None and poll_interval:
+            if watch:
+                print(f"Отслеживание {self.directory} недоступно, опрос раз в {poll_interval} мс")
+            self.poll_timer = QTimer(self)
+            self.poll_timer.timeout.connect(self.rescan)
+            self.poll_timer.start(poll_interval)
+
+    def names(self):
+        """Все стратегии, включая основную"""
+        return sorted(self._stamps, key=strategy_sort_key)
+
+    def alternatives(self):
+        """Стратегии для альтернативного метода (без основной)"""
+        return [name for name in self.names() if name != self.main_file]
+
+    def __contains__(self, name):
+        return name in self._stamps
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def schedule_rescan(self, *args):
+        self._rescan_timer.start()
+
+    def _scan(self):
+        stamps = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if is_strategy_file(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        stamps[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            print(f"Не удалось прочитать {self.directory}: {e}")
+        return stamps
+
+    def _watch_files(self):
+        # Редакторы часто заменяют файл целиком, и он выпадает из наблюдения
+        if self.watcher is None:
+            return
+        watched = set(self.watcher.files())
+        missing = [self.path(name) for name in self._stamps if self.path(name) not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def rescan(self):
+        """Сравнивает папку с известным состоянием и сообщает только об отличиях"""
+        stamps = self._scan()
+        removed = [name for name in self._stamps if name not in stamps]
+        added = [name for name in stamps if name not in self._stamps]
+        changed = [name for name in stamps
+                   if name in self._stamps and stamps[name] != self._stamps[name]]
+        if not (removed or added or changed):
+            return
+
+        self._stamps = stamps
+        self.version += 1
+        for key in [key for key in self._parsed if key[0] in removed or key[0] in changed]:
+            del self._parsed[key]
+        self._watch_files()
+
+        alternatives = self.alternatives()
+        for name in removed:
+            print(f"Стратегия удалена: {name}")
+            self.strategy_removed.emit(name)
+        for name in sorted(added, key=strategy_sort_key):
+            print(f"Найдена стратегия: {name}")
+            self.strategy_added.emit(name, alternatives.index(name) if name in alternatives else -1)
+        for name in changed:
+            print(f"Стратегия изменена: {name}")
+            self.strategy_changed.emit(name)
+
+    def strategy(self, name, game_filter="12"):
+        """Разобранная стратегия (разбирается при первом обращении и после изменения файла)"""
+        stamp = self._stamps.get(name)
+        if stamp is None:
+            raise FileNotFoundError(f"Стратегия не найдена: {name}")
+        cached = self._parsed.get((name, game_filter))
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        strategy = parse_bat(self.path(name), game_filter=game_filter)
+        self.parse_count += 1
+        self._parsed[(name, game_filter)] = (stamp, strategy)
+        return strategy
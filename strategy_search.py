@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""Поиск новых стратегий по параметрам desync
+
+Из готовых стратегий собирается грамматика: для каждого вида секции
+(одинаковые фильтры, hostlist/ipset) — какие значения --dpi-desync* в ней
+встречались. Кандидаты получаются заменой этих значений в секциях
+стратегии-шаблона. Оценка выполняется подключаемой пробой, а слабые
+кандидаты отсеиваются последовательным делением (successive halving)
+внутри простого эволюционного поиска. Лучший результат сохраняется
+отдельно для каждой сети; --output дополнительно сохраняет его как bat
+файл (папка general не изменяется).
+
+    python strategy_search.py --fake --seed 1               # детерминированная имитация сети
+    python strategy_search.py --template "general (ALT2).bat" --output "ALT2 (SEARCH).bat"
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+
+from strategy import Strategy, Section, split_option
+from connectivity import ConnectivityProbe, network_id
+from strategy_registry import StrategyRegistry
+from storage import app_data_path, load_json, atomic_write_json
+
+DESYNC_PREFIX = "--dpi-desync"
+SPLIT_PREFIX = "--dpi-desync-split-"
+FAKE_PREFIX = "--dpi-desync-fake-"
+
+
+def section_protocol(section):
+    return "udp" if section.has_option("--filter-udp") else "tcp"
+
+
+def section_slot(section):
+    """Вид секции: все ее аргументы, кроме параметров desync"""
+    return tuple(a for a in section.args if not a.startswith(DESYNC_PREFIX))
+
+
+def section_knobs(section):
+    """Параметры desync секции: {опция: значение}"""
+    return dict(split_option(a) for a in section.args if a.startswith(DESYNC_PREFIX))
+
+
+def is_relevant(option, mode):
+    """Опции split-* и fake-* имеют смысл только для соответствующего режима"""
+    mode = mode or ""
+    if option.startswith(SPLIT_PREFIX):
+        return "split" in mode
+    if option.startswith(FAKE_PREFIX):
+        return "fake" in mode
+    return True
+
+
+class ParameterGrammar:
+    """Допустимые значения параметров desync по видам секций и протоколам"""
+
+    def __init__(self):
+        self.slots = {}        # вид секции -> {опция: [значения]}
+        self.by_protocol = {}  # протокол -> {опция: [значения]}
+
+    @classmethod
+    def from_strategies(cls, strategies):
+        grammar = cls()
+        for strategy in strategies:
+            for section in strategy.sections:
+                knobs = section_knobs(section)
+                for table in (grammar.slots.setdefault(section_slot(section), {}),
+                              grammar.by_protocol.setdefault(section_protocol(section), {})):
+                    for option, value in knobs.items():
+                        values = table.setdefault(option, [])
+                        if value not in values:
+                            values.append(value)
+        # None — опция не задана; без нее обходятся и многие исходные стратегии
+        for table in list(grammar.slots.values()) + list(grammar.by_protocol.values()):
+            for option, values in table.items():
+                if option != DESYNC_PREFIX and None not in values:
+                    values.append(None)
+        return grammar
+
+    def choices(self, section):
+        return self.slots.get(section_slot(section)) or self.by_protocol.get(section_protocol(section), {})
+
+    def size(self, template):
+        """Число возможных кандидатов для шаблона (без учета зависимостей опций)"""
+        total = 1
+        for section in template.sections:
+            for values in self.choices(section).values():
+                total *= len(values)
+        return total
+
+    def random_candidate(self, template, rng):
+        knobs = []
+        for section in template.sections:
+            choices = self.choices(section)
+            knobs.append({option: rng.choice(values) for option, values in choices.items()})
+        return Candidate(template, knobs)
+
+    def mutate(self, candidate, rng, rate=0.3):
+        knobs = [dict(k) for k in candidate.knobs]
+        for section, section_knobs_ in zip(candidate.template.sections, knobs):
+            choices = self.choices(section)
+            if choices and rng.random() < rate:
+                option = rng.choice(sorted(choices))
+                section_knobs_[option] = rng.choice(choices[option])
+        return Candidate(candidate.template, knobs)
+
+    @staticmethod
+    def crossover(a, b, rng):
+        return Candidate(a.template, [dict(rng.choice((x, y))) for x, y in zip(a.knobs, b.knobs)])
+
+
+class Candidate:
+    """Стратегия-шаблон с замененными параметрами desync в каждой секции"""
+
+    def __init__(self, template, knobs):
+        self.template = template
+        self.knobs = knobs
+        self._key = None
+
+    @classmethod
+    def from_strategy(cls, strategy):
+        return cls(strategy, [section_knobs(s) for s in strategy.sections])
+
+    def section_args(self, section, knobs):
+        mode = knobs.get(DESYNC_PREFIX)
+        args = list(section_slot(section))
+        for option in sorted(knobs, key=lambda o: (o != DESYNC_PREFIX, o)):
+            value = knobs[option]
+            if value is not None and is_relevant(option, mode):
+                args.append(f"{option}={value}")
+        return args
+
+    def strategy(self, name=None):
+        sections = [Section(s.index, self.section_args(s, k))
+                    for s, k in zip(self.template.sections, self.knobs)]
+        if name is None:
+            name = f"{self.template.name} [{self.key()[:8]}]"
+        return Strategy(name, self.template.global_args, sections, path=self.template.path)
+
+    def key(self):
+        if self._key is None:
+            argv = json.dumps(self.strategy("").argv())
+            self._key = hashlib.sha1(argv.encode("utf-8")).hexdigest()
+        return self._key
+
+
+class Evaluator:
+    """Оценка кандидатов пробой с кэшем результатов отдельных попыток
+
+    При увеличении бюджета в successive halving выполняются только новые
+    попытки, уже сделанные не повторяются.
+    """
+
+    def __init__(self, probe):
+        self.probe = probe
+        self.results = {}  # ключ кандидата -> [результаты попыток]
+        self.trials = 0
+
+    def score(self, candidate, trials):
+        results = self.results.setdefault(candidate.key(), [])
+        if len(results) < trials:
+            strategy = candidate.strategy()
+            for trial in range(len(results), trials):
+                results.append(self.probe.run(strategy, trial))
+                self.trials += 1
+        return sum(results[:trials]) / trials
+
+
+def successive_halving(candidates, evaluator, min_trials=2, eta=2, max_trials=16):
+    """Ранжирует кандидатов: каждый раунд оставляет 1/eta лучших и увеличивает число попыток"""
+    pool = list(candidates)
+    eliminated = []
+    trials = min_trials
+    while True:
+        ranked = sorted(pool, key=lambda c: evaluator.score(c, trials), reverse=True)
+        if len(ranked) <= 1 or trials >= max_trials:
+            return ranked + eliminated
+        keep = max(1, len(ranked) // eta)
+        eliminated = ranked[keep:] + eliminated
+        pool = ranked[:keep]
+        trials = min(max_trials, trials * eta)
+
+
+def evolve(grammar, template, evaluator, population=16, generations=5, survivors=4, seed=0,
+           min_trials=2, max_trials=16):
+    """Эволюционный поиск; возвращает (лучший кандидат, оценка)"""
+    rng = random.Random(seed)
+    pool = [Candidate.from_strategy(template)]
+    while len(pool) < population:
+        pool.append(grammar.random_candidate(template, rng))
+
+    for generation in range(generations):
+        ranked = successive_halving(pool, evaluator, min_trials, max_trials=max_trials)
+        best = ranked[0]
+        print(f"Поколение {generation + 1}: лучший {best.key()[:8]} "
+              f"{evaluator.score(best, max_trials):.2f}, попыток всего {evaluator.trials}")
+
+        elite = ranked[:survivors]
+        pool = list(elite)
+        seen = {c.key() for c in pool}
+        attempts = 0
+        while len(pool) < population and attempts < population * 10:
+            attempts += 1
+            a, b = rng.sample(elite, 2) if len(elite) > 1 else (elite[0], elite[0])
+            child = grammar.mutate(grammar.crossover(a, b, rng), rng)
+            if child.key() not in seen:
+                seen.add(child.key())
+                pool.append(child)
+
+    ranked = successive_halving(pool, evaluator, min_trials, max_trials=max_trials)
+    return ranked[0], evaluator.score(ranked[0], max_trials)
+
+
+class FakeNetwork:
+    """Детерминированная имитация сети с DPI для проверки и замеров поиска без сети
+
+    Для каждого протокола из грамматики выбираются «нужные» значения
+    параметров. Секция срабатывает с вероятностью, которая падает с каждым
+    несовпадением, а исход каждой попытки зависит только от seed, кандидата
+    и номера попытки.
+    """
+
+    def __init__(self, grammar, seed=0, base=0.95, penalty=0.7):
+        rng = random.Random(seed)
+        self.seed = seed
+        self.base = base
+        self.penalty = penalty
+        self.wanted = {}
+        for protocol, table in sorted(grammar.by_protocol.items()):
+            self.wanted[protocol] = {option: rng.choice(values) for option, values in sorted(table.items())}
+
+    def success_probability(self, section):
+        knobs = section_knobs(section)
+        probability = self.base
+        mode = knobs.get(DESYNC_PREFIX)
+        for option, value in self.wanted.get(section_protocol(section), {}).items():
+            if is_relevant(option, mode) and knobs.get(option) != value:
+                probability *= self.penalty
+        return probability
+
+    def expected(self, strategy):
+        """Точная ожидаемая оценка без случайности (для сравнения результатов поиска)"""
+        return sum(self.success_probability(s) for s in strategy.sections) / len(strategy.sections)
+
+    def run(self, strategy, trial):
+        argv = json.dumps(strategy.argv())
+        rng = random.Random(f"{self.seed}:{argv}:{trial}")
+        sections = strategy.sections
+        return sum(rng.random() < self.success_probability(s) for s in sections) / len(sections)
+
+
+def save_best(network, strategy, score, path=None):
+    """Запоминает лучшую найденную стратегию для сети (если она лучше прежней)"""
+    path = path or app_data_path("strategy_search.json")
+    data = load_json(path, {})
+    previous = data.get(network)
+    if previous is not None and previous["score"] >= score:
+        return False
+    data[network] = {
+        "template": strategy.path and os.path.basename(strategy.path),
+        "argv": strategy.argv(),
+        "score": score,
+        "found_at": time.time(),
+    }
+    atomic_write_json(path, data)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск стратегии по параметрам desync")
+    parser.add_argument("--template", default="general (ALT2).bat", help="стратегия-шаблон из папки general")
+    parser.add_argument("--game-filter", default="12")
+    parser.add_argument("--population", type=int, default=16)
+    parser.add_argument("--generations", type=int, default=10)
+    parser.add_argument("--max-trials", type=int, default=16, help="попыток на кандидата в финале")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fake", action="store_true", help="оценивать на имитации сети (FakeNetwork)")
+    parser.add_argument("--output", help="сохранить лучшую стратегию в этот bat файл")
+    args = parser.parse_args(argv)
+
+    registry = StrategyRegistry(watch=False, poll_interval=0)
+    strategies = [registry.strategy(name, args.game_filter) for name in registry.names()]
+    grammar = ParameterGrammar.from_strategies(strategies)
+    template = registry.strategy(args.template, args.game_filter)
+    print(f"Грамматика: видов секций {len(grammar.slots)}, вариантов шаблона ~{grammar.size(template):.2e}")
+
+    if args.fake:
+        probe = FakeNetwork(grammar, seed=args.seed)
+    else:
+        from platform_backend import default_backend
+        probe = ConnectivityProbe(default_backend(), os.path.join(registry.directory, "bin", "winws.exe"))
+
+    evaluator = Evaluator(probe)
+    started = time.perf_counter()
+    try:
+        baseline = evaluator.score(Candidate.from_strategy(template), args.max_trials)
+        best, score = evolve(grammar, template, evaluator, args.population, args.generations,
+                             seed=args.seed, max_trials=args.max_trials)
+    finally:
+        if not args.fake:
+            probe.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"Шаблон: {baseline:.2f}, лучший кандидат: {score:.2f}")
+    if args.fake:
+        print(f"Ожидаемая оценка: шаблон {probe.expected(template):.2f}, "
+              f"лучший {probe.expected(best.strategy()):.2f}")
+    print(f"Кандидатов оценено: {len(evaluator.results)}, попыток: {evaluator.trials}, "
+          f"время: {elapsed * 1000:.0f} мс")
+
+    strategy = best.strategy(f"{template.name} (SEARCH)")
+    network = "fake" if args.fake else network_id()
+    if save_best(network, strategy, score):
+        print(f"Сохранено как лучшее для сети {network}")
+    if args.output:
+        from section_analytics import strategy_to_bat
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            f.write(strategy_to_bat(strategy, args.game_filter, args.output))
+        print(f"Стратегия: {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """Замер длительности фаз операции (запуск, остановка и т.д.)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = []
+        self.started_at = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def add(self, name, seconds):
+        """Добавляет фазу, измеренную отдельно"""
+        self.phases.append((name, seconds))
+
+    def total(self):
+        return time.perf_counter() - self.started_at
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "total_ms": round(self.total() * 1000, 1),
+            "phases": [{"name": n, "ms": round(s * 1000, 1)} for n, s in self.phases],
+        }
+
+    def report(self):
+        """Печатает сводку по фазам"""
+        parts = ", ".join(f"{n}: {s * 1000:.1f} мс" for n, s in self.phases)
+        print(f"⏱ {self.name}: {self.total() * 1000:.1f} мс ({parts})")
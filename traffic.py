@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Учет трафика Discord
+
+Раз в интервал считываются счетчики ввода-вывода процессов Discord и
+общий сетевой трафик системы; соединения (обход системной таблицы сокетов)
+считаются реже, раз в sockets_every выборок. Без окна выборка идет с
+фоновым интервалом. Скорости хранятся в кольцевых
+буферах фиксированного размера (array): секундные точки за 5 минут и их
+усреднения по минутам за сутки и по часам за 30 дней. Память не растет со
+временем работы.
+
+На Windows сетевой обмен процесса учитывается в основном в other_bytes
+(операции сокетов идут через DeviceIoControl), на Linux io_counters
+показывают только дисковый ввод-вывод.
+
+    python traffic.py --duration 30
+    python traffic.py --duration 10 --process python --json
+"""
+
+import sys
+import json
+import time
+import argparse
+from array import array
+import psutil
+
+from PySide6.QtCore import QObject, QTimer
+
+from discord_control import DISCORD_VARIANTS
+
+FIELDS = ("discord_sockets", "discord_read", "discord_write", "discord_other", "net_recv", "net_sent")
+
+# Период точки (с) и число точек: 5 минут, сутки, 30 дней
+TIERS = ((1, 300), (60, 1440), (3600, 720))
+
+DISCORD_NAMES = set(DISCORD_VARIANTS) | {name[:-len(".exe")] for name in DISCORD_VARIANTS}
+
+
+def format_rate(value):
+    for unit, size in (("МБ/с", 1 << 20), ("КБ/с", 1 << 10)):
+        if value >= size:
+            return f"{value / size:.1f} {unit}"
+    return f"{value:.0f} Б/с"
+
+
+class RingSeries:
+    """Кольцевой буфер точек (время и значения полей) фиксированного размера"""
+
+    def __init__(self, capacity, width):
+        self.capacity = capacity
+        self.width = width
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity * width))
+        self.head = 0  # куда будет записана следующая точка
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return (len(self.times) + len(self.values)) * self.times.itemsize
+
+    def append(self, t, values):
+        self.times[self.head] = t
+        base = self.head * self.width
+        self.values[base:base + self.width] = array("d", values)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def points(self, last=None):
+        """Точки от старых к новым: [(время, (значения...))]"""
+        n = self.count if last is None else min(last, self.count)
+        start = (self.head - n) % self.capacity
+        result = []
+        for i in range(n):
+            index = (start + i) % self.capacity
+            base = index * self.width
+            result.append((self.times[index], tuple(self.values[base:base + self.width])))
+        return result
+
+    def mean(self, last=None):
+        """Средние значения полей по последним точкам или None, если точек нет"""
+        points = self.points(last)
+        if not points:
+            return None
+        return tuple(sum(column) / len(points) for column in zip(*(values for _, values in points)))
+
+
+class TieredSeries:
+    """Секундный ряд и его усреднения по более крупным периодам"""
+
+    def __init__(self, fields=FIELDS, tiers=TIERS):
+        self.fields = fields
+        self.tiers = [(period, RingSeries(capacity, len(fields))) for period, capacity in tiers]
+        # Накопители текущего (незавершенного) периода для каждого крупного уровня
+        self._sums = [array("d", bytes(8 * len(fields))) for _ in tiers[1:]]
+        self._counts = [0] * (len(tiers) - 1)
+        self._buckets = [None] * (len(tiers) - 1)
+
+    @property
+    def nbytes(self):
+        return sum(series.nbytes for _, series in self.tiers) + sum(len(s) * s.itemsize for s in self._sums)
+
+    def add(self, t, values):
+        self.tiers[0][1].append(t, values)
+        for i, (period, series) in enumerate(self.tiers[1:]):
+            bucket = t - t % period
+            if bucket != self._buckets[i] and self._counts[i]:
+                series.append(self._buckets[i], [total / self._counts[i] for total in self._sums[i]])
+                self._sums[i] = array("d", bytes(8 * len(self.fields)))
+                self._counts[i] = 0
+            self._buckets[i] = bucket
+            sums = self._sums[i]
+            for j, value in enumerate(values):
+                sums[j] += value
+            self._counts[i] += 1
+
+    def series(self, period):
+        for tier_period, series in self.tiers:
+            if tier_period == period:
+                return series
+        raise KeyError(period)
+
+    def latest(self, seconds=10):
+        """Средние скорости за последние seconds секунд: {поле: значение}"""
+        mean = self.tiers[0][1].mean(max(1, seconds // self.tiers[0][0]))
+        return dict(zip(self.fields, mean)) if mean is not None else None
+
+
+class DiscordTrafficSampler:
+    """Считывает счетчики процессов Discord и системы, возвращает скорости"""
+
+    def __init__(self, names=DISCORD_NAMES, rescan_every=10, sockets_every=30):
+        self.names = {name.lower() for name in names}
+        self.rescan_every = rescan_every
+        self.sockets_every = sockets_every
+        self.sockets = 0
+        self.processes = {}  # pid -> psutil.Process
+        self.io = {}         # pid -> (read, write, other) на прошлой выборке
+        self.net = None
+        self.last_time = None
+        self.samples = 0
+        self.cost = 0.0
+
+    def _rescan(self):
+        # Полный обход процессов дорогой: делаем его раз в rescan_every выборок
+        for proc in psutil.process_iter(["name"]):
+            if (proc.info["name"] or "").lower() in self.names and proc.pid not in self.processes:
+                self.processes[proc.pid] = proc
+
+    def sample(self, now=None):
+        """Скорости по полям FIELDS с прошлой выборки (None на первой выборке)"""
+        started = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        if self.samples % self.rescan_every == 0:
+            self._rescan()
+        # Таблица соединений — обход всех сокетов системы: число соединений обновляем редко
+        count_sockets = self.samples % self.sockets_every == 0
+        self.samples += 1
+
+        read = write = other = 0
+        for pid, proc in list(self.processes.items()):
+            try:
+                io = proc.io_counters()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                del self.processes[pid]
+                self.io.pop(pid, None)
+                continue
+            current = (io.read_bytes, io.write_bytes, getattr(io, "other_bytes", 0))
+            previous = self.io.get(pid)
+            self.io[pid] = current
+            if previous is not None:
+                read += current[0] - previous[0]
+                write += current[1] - previous[1]
+                other += current[2] - previous[2]
+
+        if count_sockets:
+            # Одна системная таблица соединений дешевле запроса по каждому процессу
+            try:
+                self.sockets = sum(1 for c in psutil.net_connections("inet") if c.pid in self.processes)
+            except psutil.AccessDenied:
+                self.sockets = 0
+        net = psutil.net_io_counters()
+
+        rates = None
+        if self.last_time is not None and now > self.last_time:
+            elapsed = now - self.last_time
+            rates = (self.sockets, read / elapsed, write / elapsed, other / elapsed,
+                     (net.bytes_recv - self.net.bytes_recv) / elapsed,
+                     (net.bytes_sent - self.net.bytes_sent) / elapsed)
+        self.net = net
+        self.last_time = now
+        self.cost += time.perf_counter() - started
+        return rates
+
+
+class TrafficMonitor(QObject):
+    """Периодическая выборка трафика Discord в ряд фиксированного размера
+
+    interval — период выборки при открытом окне, background_interval — без
+    окна (окно регистрирует timer в ActivityManager, трей без окна вызывает
+    set_background).
+    """
+
+    def __init__(self, parent=None, interval=1000, sampler=None, background_interval=60000):
+        super().__init__(parent)
+        self.sampler = sampler or DiscordTrafficSampler()
+        self.series = TieredSeries()
+        self.interval = interval
+        self.background_interval = background_interval
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.sample)
+        self.timer.start(interval)
+
+    def set_background(self, background):
+        self.timer.start(self.background_interval if background else self.interval)
+
+    def sample(self):
+        try:
+            rates = self.sampler.sample()
+        except Exception as e:
+            print(f"Ошибка учета трафика: {e}")
+            return
+        if rates is not None:
+            self.series.add(time.time(), rates)
+
+    def summary(self, seconds=10):
+        """Строка для интерфейса: скорости Discord и системы за последние секунды"""
+        rates = self.series.latest(seconds)
+        if rates is None:
+            return "Трафик: нет данных"
+        discord = rates["discord_read"] + rates["discord_other"]
+        return (f"Discord: {format_rate(discord)}, соединений {rates['discord_sockets']:.0f}; "
+                f"сеть ↓ {format_rate(rates['net_recv'])} ↑ {format_rate(rates['net_sent'])}")
+
+    def as_dict(self):
+        """Средние по последней точке каждого уровня и размер буферов"""
+        tiers = {}
+        for period, series in self.series.tiers:
+            mean = series.mean(1)
+            tiers[f"{period}s"] = {"points": len(series),
+                                   "latest": dict(zip(self.series.fields, mean)) if mean else None}
+        return {
+            "tiers": tiers,
+            "buffer_bytes": self.series.nbytes,
+            "samples": self.sampler.samples,
+            "sample_cost_ms": round(self.sampler.cost / max(1, self.sampler.samples) * 1000, 3),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Учет трафика Discord")
+    parser.add_argument("--duration", type=float, default=30, help="длительность, сек")
+    parser.add_argument("--interval", type=int, default=1000, help="интервал выборки, мс")
+    parser.add_argument("--process", action="append", help="имя процесса вместо Discord (можно несколько)")
+    parser.add_argument("--json", action="store_true", help="вывести итог в JSON")
+    args = parser.parse_args(argv)
+
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication(sys.argv)
+    sampler = DiscordTrafficSampler(args.process) if args.process else None
+    monitor = TrafficMonitor(interval=args.interval, sampler=sampler)
+    report = QTimer()
+    report.timeout.connect(lambda: print(monitor.summary()))
+    report.start(5000)
+    QTimer.singleShot(int(args.duration * 1000), app.quit)
+    app.exec()
+
+    result = monitor.as_dict()
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(monitor.summary())
+        print(f"Выборок: {result['samples']}, в среднем {result['sample_cost_ms']} мс, "
+              f"буферы: {result['buffer_bytes'] / 1024:.0f} КБ")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
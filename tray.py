@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import time
+import psutil
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QAction, QActionGroup
+from PySide6.QtWidgets import QSystemTrayIcon, QMenu
+
+from session import MAIN_BAT_FILE, WorkerThread
+import assets
+
+
+def resident_memory_mb():
+    """Резидентная память текущего процесса в МБ"""
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class TrayController(QObject):
+    """Значок в трее: запуск/остановка, выбор стратегии и статус без окна
+
+    Окно при закрытии уничтожается полностью (pixmap, стили, тень), а по
+    запросу создается заново фабрикой window_factory(session). Обход при
+    этом продолжает работать — его состояние хранится в BypassSession.
+    """
+
+    def __init__(self, app, session, window_factory, supervise_interval=10000):
+        super().__init__()
+        self.app = app
+        self.session = session
+        self.window_factory = window_factory
+        self.window = None
+        self.worker_thread = None
+
+        self.tray_icon = QSystemTrayIcon(self)
+        self.tray_icon.setIcon(assets.icon("app"))
+        self.tray_icon.setToolTip("Aether")
+        self.tray_icon.activated.connect(self.on_activated)
+
+        self.menu = QMenu()
+        self.status_action = self.menu.addAction("")
+        self.status_action.setEnabled(False)
+        self.traffic_action = self.menu.addAction("")
+        self.traffic_action.setEnabled(False)
+        self.traffic_action.setVisible(session.traffic is not None)
+        self.menu.addSeparator()
+        self.start_action = self.menu.addAction("Запустить", self.start)
+        self.stop_action = self.menu.addAction("Остановить", self.stop)
+        self.strategy_menu = self.menu.addMenu("Стратегия")
+        self.strategy_group = QActionGroup(self)
+        self._strategies_version = None
+        self.rebuild_strategy_menu()
+        self.clean_cache_action = self.menu.addAction("Очистить кэш Discord", self.clean_discord_cache)
+        self.menu.addSeparator()
+        self.menu.addAction("Открыть окно", self.show_window)
+        self.menu.addAction("Выход", self.quit)
+        # Статус проверяем только при открытии меню, а не по таймеру
+        self.menu.aboutToShow.connect(self.refresh_menu)
+        self.tray_icon.setContextMenu(self.menu)
+
+        # Без окна трафик считается с фоновым интервалом (окно ускоряет его через ActivityManager)
+        if session.traffic is not None:
+            session.traffic.set_background(True)
+
+        # Пока окна нет, упавшие шарды перезапускает трей (редко)
+        self.supervise_timer = QTimer(self)
+        self.supervise_timer.timeout.connect(self.session.supervise)
+        self.supervise_timer.start(supervise_interval)
+
+        self.refresh_menu()
+        self.tray_icon.show()
+        print(f"Aether в трее, память: {resident_memory_mb():.1f} МБ")
+
+    @staticmethod
+    def is_available():
+        return QSystemTrayIcon.isSystemTrayAvailable()
+
+    def rebuild_strategy_menu(self):
+        """Пересобирает подменю стратегий, если список в реестре изменился"""
+        strategies = self.session.strategies
+        if self._strategies_version == strategies.version:
+            return
+        self._strategies_version = strategies.version
+        for action in self.strategy_group.actions():
+            self.strategy_group.removeAction(action)
+            action.deleteLater()
+        self.strategy_menu.clear()
+        self._add_strategy(MAIN_BAT_FILE, "Основной метод", alternative=False)
+        self.strategy_menu.addSeparator()
+        for bat_file in strategies.alternatives():
+            self._add_strategy(bat_file, bat_file, alternative=True)
+
+    def _add_strategy(self, bat_file, title, alternative):
+        action = QAction(title, self.strategy_group)
+        action.setCheckable(True)
+        action.setData((alternative, bat_file))
+        action.triggered.connect(lambda checked, a=action: self.select_strategy(*a.data()))
+        self.strategy_menu.addAction(action)
+
+    def is_busy(self):
+        return self.worker_thread is not None and self.worker_thread.isRunning()
+
+    def refresh_menu(self):
+        """Обновляет статус и отметку стратегии в меню"""
+        self.rebuild_strategy_menu()
+        is_running = self.session.is_winws_running()
+        strategy = self.session.current_bat_file()
+        self.status_action.setText(f"{'Работает' if is_running else 'Остановлен'}: {strategy}")
+        if self.session.traffic is not None:
+            self.traffic_action.setText(self.session.traffic.summary())
+        self.tray_icon.setToolTip(f"Aether — {'работает' if is_running else 'остановлен'}")
+        self.start_action.setEnabled(not is_running and not self.is_busy())
+        self.clean_cache_action.setEnabled(not self.is_busy())
+        self.stop_action.setEnabled(is_running and not self.is_busy())
+        for action in self.strategy_group.actions():
+            alternative, bat_file = action.data()
+            action.setChecked(alternative == self.session.is_alternative_mode
+                              and (not alternative or bat_file == self.session.selected_bat_file))
+
+    def run_operation(self, operation):
+        if self.is_busy():
+            print("⚠️ Дождитесь завершения текущей операции...")
+            return
+        self.worker_thread = WorkerThread(operation)
+        self.worker_thread.succeeded.connect(self.on_operation_finished)
+        self.worker_thread.error.connect(self.on_operation_error)
+        self.worker_thread.start()
+        return self.worker_thread
+
+    def start(self):
+        self.run_operation(self.session.start)
+
+    def stop(self):
+        self.run_operation(self.session.stop)
+
+    def clean_discord_cache(self):
+        """Очистка кэша в фоновом потоке: меню и окно не ждут удаления файлов"""
+        worker = self.run_operation(self.session.clean_discord_cache)
+        if worker is not None:
+            # Итог показывается только после успешной очистки; ошибку покажет on_operation_error
+            worker.succeeded.connect(lambda: self.tray_icon.showMessage(
+                "Aether", f"Кэш Discord: {self.session.cache_report.summary()}"))
+
+    def select_strategy(self, alternative, bat_file):
+        """Выбор стратегии из меню; запущенный обход переключается на новую стратегию без остановки Discord"""
+        was_running = self.session.is_winws_running()
+        self.session.is_alternative_mode = alternative
+        if alternative:
+            self.session.selected_bat_file = bat_file
+        print(f"Стратегия из трея: {self.session.current_bat_file()}")
+
+        if self.window is not None:
+            self.window.sync_from_session()
+        if was_running:
+            self.run_operation(self.session.hot_swap)
+
+    def on_operation_finished(self):
+        self.refresh_menu()
+        if self.window is not None:
+            self.window.sync_from_session()
+
+    def on_operation_error(self, error_msg):
+        print(f"Ошибка в фоновом потоке: {error_msg}")
+        self.tray_icon.showMessage("Aether", f"Произошла ошибка:\n{error_msg}",
+                                   QSystemTrayIcon.MessageIcon.Critical)
+        self.on_operation_finished()
+
+    def on_activated(self, reason):
+        if reason in (QSystemTrayIcon.ActivationReason.Trigger,
+                      QSystemTrayIcon.ActivationReason.DoubleClick):
+            self.show_window()
+
+    def show_window(self):
+        """Показывает окно, при необходимости создавая его заново"""
+        if self.window is None:
+            start = time.perf_counter()
+            self.window = self.window_factory(self.session)
+            self.window.close_to_tray = True
+            self.window.destroyed.connect(self.on_window_destroyed)
+            self.window.show()
+            print(f"Окно создано за {(time.perf_counter() - start) * 1000:.0f} мс")
+        else:
+            self.window.showNormal()
+        self.window.raise_()
+        self.window.activateWindow()
+
+    def on_window_destroyed(self):
+        self.window = None
+        gc.collect()
+        print(f"Окно уничтожено, память в трее: {resident_memory_mb():.1f} МБ")
+
+    def quit(self):
+        """Останавливает обход и завершает приложение"""
+        if self.window is not None:
+            self.window.close_to_tray = False
+            self.window.close()
+        else:
+            self.session.shutdown()
+        self.tray_icon.hide()
+        self.app.quit()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Фоновая проверка обновлений zapret-discord-youtube
+
+    python updater.py              # проверить сейчас (без учета TTL)
+    python updater.py --selftest   # новая версия, 304 и таймаут на локальном HTTP сервере
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+
+from storage import app_data_path, load_json, atomic_write_json
+
+GITHUB_VERSION_URL = "https://raw.githubusercontent.com/Flowseal/zapret-discord-youtube/main/.service/version.txt"
+GITHUB_RELEASE_URL = "https://github.com/Flowseal/zapret-discord-youtube/releases/tag/"
+
+DEFAULT_TTL = 6 * 60 * 60   # Проверяем не чаще раза в 6 часов
+DEFAULT_TIMEOUT = 5
+
+SERVICE_BAT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "general", "service.bat")
+
+
+def read_local_version(service_bat=SERVICE_BAT):
+    """Читает LOCAL_VERSION из service.bat, чтобы версия хранилась в одном месте"""
+    try:
+        with open(service_bat, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                match = re.search(r'set\s+"LOCAL_VERSION=([^"]+)"', line, re.IGNORECASE)
+                if match:
+                    return match.group(1).strip()
+    except OSError:
+        pass
+    return None
+
+
+class UpdateResult:
+    """Результат проверки обновлений"""
+
+    def __init__(self, local_version, remote_version, from_cache=False, error=None):
+        self.local_version = local_version
+        self.remote_version = remote_version
+        self.from_cache = from_cache
+        self.error = error
+
+    @property
+    def update_available(self):
+        return bool(self.remote_version) and self.remote_version != self.local_version
+
+    @property
+    def release_url(self):
+        return f"{GITHUB_RELEASE_URL}{self.remote_version}" if self.remote_version else None
+
+    def __repr__(self):
+        return (f"UpdateResult(local={self.local_version!r}, remote={self.remote_version!r}, "
+                f"from_cache={self.from_cache}, error={self.error!r})")
+
+
+class UpdateChecker:
+    """Фоновая проверка обновлений с TTL и ETag
+
+    Состояние (версия, ETag, время проверки) хранится в JSON файле, поэтому
+    повторные запуски в пределах TTL вообще не ходят в сеть, а после TTL
+    отправляют условный запрос и обычно получают короткий ответ 304.
+    """
+
+    def __init__(self, local_version, url=GITHUB_VERSION_URL, state_path=None,
+                 ttl=DEFAULT_TTL, timeout=DEFAULT_TIMEOUT):
+        self.local_version = local_version
+        self.url = url
+        self.state_path = state_path or app_data_path("update_state.json")
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def load_state(self):
+        state = load_json(self.state_path, {})
+        return state if isinstance(state, dict) else {}
+
+    def is_due(self, now=None):
+        """Пора ли идти в сеть (истек TTL с последней проверки)"""
+        now = time.time() if now is None else now
+        checked_at = self.load_state().get("checked_at", 0)
+        return now - checked_at >= self.ttl
+
+    def cached_result(self):
+        """Последний сохраненный результат без обращения к сети"""
+        state = self.load_state()
+        return UpdateResult(self.local_version, state.get("remote_version"),
+                            from_cache=True, error=state.get("error"))
+
+    def check_now(self):
+        """Синхронная проверка (вызывается из фонового потока)"""
+        with self._lock:
+            state = self.load_state()
+            request = urllib.request.Request(self.url, headers={"Cache-Control": "no-cache"})
+            if state.get("etag") and state.get("remote_version"):
+                request.add_header("If-None-Match", state["etag"])
+
+            result = None
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    remote_version = response.read().decode("utf-8", errors="ignore").strip()
+                    state["etag"] = response.headers.get("ETag")
+                    state["remote_version"] = remote_version
+                    state["error"] = None
+                    result = UpdateResult(self.local_version, remote_version)
+            except urllib.error.HTTPError as e:
+                if e.code == 304:
+                    state["error"] = None
+                    result = UpdateResult(self.local_version, state.get("remote_version"),
+                                          from_cache=True)
+                else:
+                    state["error"] = f"HTTP {e.code}"
+            except Exception as e:
+                state["error"] = str(e) or e.__class__.__name__
+
+            if result is None:
+                result = UpdateResult(self.local_version, state.get("remote_version"),
+                                      from_cache=True, error=state["error"])
+
+            # Время проверки записываем и при ошибке — иначе каждый запуск снова ждал бы таймаут
+            state["checked_at"] = time.time()
+            try:
+                atomic_write_json(self.state_path, state)
+            except OSError as e:
+                print(f"Не удалось сохранить состояние обновлений: {e}")
+            return result
+
+    def check_async(self, callback=None, force=False):
+        """Запускает проверку в фоне, если истек TTL. Никогда не блокирует вызывающего
+
+        Возвращает поток проверки или None, если проверка не нужна.
+        """
+        if not force and not self.is_due():
+            return None
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            result = self.check_now()
+            if callback is not None:
+                callback(result)
+
+        self._thread = threading.Thread(target=run, name="aether-update-check", daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+def selftest():
+    """Новая версия, ответ 304 по ETag, таймаут и TTL на локальном HTTP сервере"""
+    import tempfile
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append((self.path, self.headers.get("If-None-Match")))
+            if self.path == "/slow":
+                time.sleep(1)  # клиент отключится по таймауту раньше, отвечать некому
+                return
+            if self.headers.get("If-None-Match") == '"v2"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = b"1.2.0\n"
+            self.send_response(200)
+            self.send_header("ETag", '"v2"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory(prefix="aether-updater-") as workdir:
+            state_path = os.path.join(workdir, "update_state.json")
+            checker = UpdateChecker("1.0.0", f"{base}/version.txt", state_path, ttl=3600)
+
+            result = checker.check_now()
+            assert result.update_available and result.remote_version == "1.2.0" and not result.from_cache, result
+            assert load_json(state_path)["etag"] == '"v2"'
+            print(f"Новая версия: {result}")
+
+            result = checker.check_now()
+            assert requests[-1] == ("/version.txt", '"v2"'), requests
+            assert result.from_cache and result.error is None and result.remote_version == "1.2.0", result
+            print(f"Ответ 304: {result}")
+
+            assert not checker.is_due() and checker.check_async() is None
+            assert checker.cached_result().remote_version == "1.2.0"
+            print("В пределах TTL проверка не запускается")
+
+            slow = UpdateChecker("1.0.0", f"{base}/slow", os.path.join(workdir, "slow.json"), timeout=0.3)
+            started = time.perf_counter()
+            thread = slow.check_async()
+            assert thread is not None and time.perf_counter() - started < 0.1  # не блокирует вызывающего
+            thread.join(timeout=5)
+            elapsed = time.perf_counter() - started
+            result = slow.cached_result()
+            assert result.error and elapsed < 1.5 and not slow.is_due(), (result, elapsed)
+            print(f"Таймаут: {result.error!r} за {elapsed * 1000:.0f} мс, повтор только после TTL")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    version = read_local_version()
+    assert version, "LOCAL_VERSION не найден в service.bat"
+    print(f"Локальная версия: {version}")
+    print("Самопроверка пройдена")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка обновлений zapret-discord-youtube")
+    parser.add_argument("--url", default=GITHUB_VERSION_URL)
+    parser.add_argument("--selftest", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.selftest:
+        return selftest()
+    print(UpdateChecker(read_local_version(), args.url).check_now())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())